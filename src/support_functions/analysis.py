@@ -1,26 +1,37 @@
 import pandas as pd
 from pathlib import Path
 
+from support_functions.attribution import ATTRIBUTION_COLS, account_attribution, stock_attribution
 from support_functions.data_loader import load_data
 from support_functions.flow_builders import (
-    build_stock_cash_flows, build_account_cash_flows, EntityCashFlows
+    build_all_stock_cash_flows, build_all_account_cash_flows
 )
-from support_functions.math_utils import calculate_metrics
+from support_functions.math_utils import calculate_metrics_batch
+from support_functions.rollup import account_groups, merge_cash_flows, roll_up
+
+
+# Ratio columns hold fractions (0.05 is 5%); formatting happens at render time
+RATIO_COLS = ['Total Return (%)', 'IRR', 'Investment Ratio']
+METRIC_COLS = ['Current Value', 'Total Invested', 'Total Return ($)', 'Holding Period (Y)'] + RATIO_COLS + ATTRIBUTION_COLS
+
+# Named groupings of analyze_group_performance
+GROUPINGS = ('Tax Treatment', 'Asset Type')
+
+
+def to_numeric_columns(results):
+    """Metric columns as float64, with unsolved IRRs as NaN."""
+    cols = [c for c in METRIC_COLS if c in results.columns]
+    return results.astype({c: float for c in cols})
 
 
 def analyze_total_performance(data):
     latest_date = data.latest_date
-    unique_accounts = data.unique_accounts
-    total_cash_flows = EntityCashFlows(latest_date=latest_date)
+    account_flows = build_all_account_cash_flows(data)
+    accounts = data.unique_accounts['Account Number']
+    total_cash_flows = merge_cash_flows((account_flows[num] for num in accounts), latest_date)
+    attribution = account_attribution(data, [account_flows[num] for num in accounts], accounts).sum()
 
-    for _, row in unique_accounts.iterrows():
-        account_num = row['Account Number']
-        entity_cash_flows = build_account_cash_flows(data, account_num)
-        total_cash_flows.cash_flows.extend(entity_cash_flows.cash_flows)
-        total_cash_flows.total_invested += entity_cash_flows.total_invested
-        total_cash_flows.current_value += entity_cash_flows.current_value
-
-    metrics = calculate_metrics(total_cash_flows)
+    metrics = calculate_metrics_batch([total_cash_flows], cache=data.metrics_cache)[0]
     current_value = total_cash_flows.current_value   
     total_invested = total_cash_flows.total_invested 
     total_return = metrics['Total Return ($)']
@@ -35,23 +46,25 @@ def analyze_total_performance(data):
         'Current Value': current_value,
         'Total Invested': total_invested,
         'Total Return ($)': total_return,
-        'Total Return (%)': f"{total_return_ratio:.2%}",
-        'IRR': f"{irr:.2%}" if irr is not None else "N/A",
-        'Investment Ratio': "100%",
-        'Holding Period (Y)': f"{holding_period:.2f}"
+        'Total Return (%)': total_return_ratio,
+        'IRR': irr,
+        'Investment Ratio': 1.0,
+        'Holding Period (Y)': holding_period,
+        **attribution
     }]
-    return pd.DataFrame(result)
+    return to_numeric_columns(pd.DataFrame(result))
     
 
 def analyze_account_performance(data):
     unique_accounts = data.unique_accounts
+    account_flows = build_all_account_cash_flows(data)
+    entities = [account_flows[num] for num in unique_accounts['Account Number']]
+    all_metrics = calculate_metrics_batch(entities, cache=data.metrics_cache)
     results = []
     
-    for _, row in unique_accounts.iterrows():
+    for (_, row), entity_cash_flows, metrics in zip(unique_accounts.iterrows(), entities, all_metrics):
         account_name = row['Account Name']
         account_num = row['Account Number']
-        entity_cash_flows = build_account_cash_flows(data, account_num)
-        metrics = calculate_metrics(entity_cash_flows)
 
         current_value = entity_cash_flows.current_value   
         total_invested = entity_cash_flows.total_invested 
@@ -70,65 +83,107 @@ def analyze_account_performance(data):
             'Current Value': current_value,
             'Total Invested': total_invested,
             'Total Return ($)': total_return,
-            'Total Return (%)': f"{total_return_ratio:.2%}",
-            'IRR': f"{irr:.2%}" if irr is not None else "N/A",
-            'Holding Period (Y)': f"{holding_period:.2f}"
+            'Total Return (%)': total_return_ratio,
+            'IRR': irr,
+            'Holding Period (Y)': holding_period
         })
     results = pd.DataFrame(results)
     ratio = results['Total Invested'] / results['Total Invested'].sum()
-    results['Investment Ratio'] = ratio.apply(lambda x: f"{x:.2%}")
-    return results.sort_values('Total Invested', ascending=False)
+    results['Investment Ratio'] = ratio
+    results = pd.concat(
+        [results, account_attribution(data, entities, unique_accounts['Account Number'])], axis=1
+    )
+    return to_numeric_columns(results).sort_values('Total Invested', ascending=False)
+
+def report_stock_positions(data):
+    """Positions reported as stocks: Stock holdings outside the rules' excluded accounts."""
+    positions = data.positions
+    excluded_accounts = data.rules.excluded_accounts
+    target_type = 'Stock'
+    return positions[
+        (~positions['Account Name'].isin(excluded_accounts)) &
+        (positions['Asset Type'] == target_type) &
+        (positions['Symbol'] != 'Pending activity')
+    ]
 
 def analyze_stock_performance(data):
     results = []
 
-    positions = data.positions
-    unique_accounts = data.unique_accounts
+    stock_flows = build_all_stock_cash_flows(data)
+    sub_positions = report_stock_positions(data)
 
-    for _, row in unique_accounts.iterrows():
-        
-        account_name = row['Account Name']
-        account_num = row['Account Number']
+    keys = list(zip(sub_positions['Account Number'], sub_positions['Symbol']))
+    entities = [stock_flows[key] for key in keys]
+    all_metrics = calculate_metrics_batch(entities, cache=data.metrics_cache)
 
-        if account_name in ['ERNST & YOUNG 401(K)', 'Cash Management (Individual)','Health Savings Account']:
-            continue
-        
-        target_type = 'Stock'
-        sub_positions = positions[
-            (positions['Account Name'] == account_name) &
-            (positions['Asset Type'] == target_type)
-        ]
-
-        for _, sub_row in sub_positions.iterrows():
-            symbol = sub_row['Symbol']
-            if symbol in ['Pending activity']:
-                continue
-        
-            entity_cash_flows = build_stock_cash_flows(data, account_num=account_num, symbol=symbol)
-            metrics = calculate_metrics(entity_cash_flows)
-            current_value = entity_cash_flows.current_value   
-            total_invested = entity_cash_flows.total_invested 
-            total_return = metrics['Total Return ($)']
-            total_return_ratio = metrics['ROI']
-            irr = metrics['IRR']
-            holding_period = metrics['Holding Period (Y)']
-                
-            results.append({
-                'Account Name': account_name,
-                'Account Number': account_num,
-                'Symbol': symbol,
-                'Asset Type': 'Stock',
-                'Current Value': current_value,
-                'Total Invested': total_invested,
-                'Total Return ($)': total_return,
-                'Total Return (%)': f"{total_return_ratio:.2%}",
-                'IRR': f"{irr:.2%}" if irr is not None else "N/A",
-                'Holding Period (Y)': f"{holding_period:.2f}"
-            })
+    for account_name, (account_num, symbol), entity_cash_flows, metrics in zip(
+        sub_positions['Account Name'], keys, entities, all_metrics
+    ):
+        current_value = entity_cash_flows.current_value   
+        total_invested = entity_cash_flows.total_invested 
+        total_return = metrics['Total Return ($)']
+        total_return_ratio = metrics['ROI']
+        irr = metrics['IRR']
+        holding_period = metrics['Holding Period (Y)']
+            
+        results.append({
+            'Account Name': account_name,
+            'Account Number': account_num,
+            'Symbol': symbol,
+            'Asset Type': 'Stock',
+            'Current Value': current_value,
+            'Total Invested': total_invested,
+            'Total Return ($)': total_return,
+            'Total Return (%)': total_return_ratio,
+            'IRR': irr,
+            'Holding Period (Y)': holding_period
+        })
+    results = pd.DataFrame(results)
+    ratio = results['Total Invested'] / results['Total Invested'].sum()
+    results['Investment Ratio'] = ratio
+    results = pd.concat([results, stock_attribution(data, entities, keys)], axis=1)
+    return to_numeric_columns(results).sort_values('Total Invested', ascending=False)
+
+def analyze_group_performance(data, grouping='Tax Treatment'):
+    """
+    Performance of groups rolled up from their members' cash flows.
+    grouping: 'Tax Treatment' (taxable vs retirement accounts), 'Asset Type'
+    (held securities by categorize_asset type), or a dict mapping account
+    number / name to a custom group name.
+    """
+    latest_date = data.latest_date
+    if grouping == 'Asset Type':
+        asset_types = data.positions['Asset Type'].to_numpy()
+        group_flows = roll_up(
+            build_all_stock_cash_flows(data),
+            lambda key: asset_types[data.position_entity_rows[key].start],
+            latest_date
+        )
+    else:
+        group_of = account_groups(data, grouping)
+        group_flows = roll_up(
+            build_all_account_cash_flows(data), lambda num: group_of.get(num, 'Other'), latest_date
+        )
+
+    groups = list(group_flows)
+    all_metrics = calculate_metrics_batch([group_flows[g] for g in groups], cache=data.metrics_cache)
+    results = []
+    for group, metrics in zip(groups, all_metrics):
+        entity_cash_flows = group_flows[group]
+        irr = metrics['IRR']
+        results.append({
+            'Group': group,
+            'Current Value': entity_cash_flows.current_value,
+            'Total Invested': entity_cash_flows.total_invested,
+            'Total Return ($)': metrics['Total Return ($)'],
+            'Total Return (%)': metrics['ROI'],
+            'IRR': irr,
+            'Holding Period (Y)': metrics['Holding Period (Y)']
+        })
     results = pd.DataFrame(results)
     ratio = results['Total Invested'] / results['Total Invested'].sum()
-    results['Investment Ratio'] = ratio.apply(lambda x: f"{x:.2%}")
-    return results.sort_values('Total Invested', ascending=False)
+    results['Investment Ratio'] = ratio
+    return to_numeric_columns(results).sort_values('Total Invested', ascending=False)
 
 if __name__ == "__main__":
     from support_functions.data_loader import load_data
@@ -147,3 +202,6 @@ if __name__ == "__main__":
 
     result = analyze_total_performance(data)
     print(result)
+
+    result = analyze_group_performance(data)
+    print(result)
@@ -0,0 +1,223 @@
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import inspect
+import json
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlparse
+import pandas as pd
+
+from support_functions.analysis import (
+    GROUPINGS, analyze_account_performance, analyze_group_performance,
+    analyze_stock_performance, analyze_total_performance
+)
+from support_functions.as_of import as_of_metrics
+from support_functions.data_loader import load_data
+from support_functions.tax_lots import LOT_METHODS, build_tax_lots
+from support_functions.valuation import build_daily_valuation
+
+
+## Local JSON API
+# PortfolioData is loaded once and shared by every request thread. Result
+# tables are memoized on the data (PortfolioData.cached), entity lookups use
+# its row-slice indexes, and solved metrics go through its MetricsCache.
+
+class APIError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class PortfolioAPI:
+    """Query methods behind the HTTP routes. Each returns JSON-ready data."""
+
+    def __init__(self, data):
+        self.data = data
+        self.routes = {
+            '/health': self.health,
+            '/total': self.total,
+            '/accounts': self.accounts,
+            '/symbols': self.symbols,
+            '/groups': self.groups,
+            '/lots': self.lots,
+            '/transactions': self.transactions,
+            '/as-of': self.as_of,
+        }
+
+    def handle(self, path, query):
+        """Dispatch '/route[/key]' with parsed query parameters."""
+        parts = [unquote(p) for p in path.split('/') if p]
+        if not parts:
+            return {'routes': sorted(self.routes)}
+        route = self.routes.get('/' + parts[0])
+        if route is None or len(parts) > 2:
+            raise APIError(404, f"Unknown route: {path}")
+        args, kwargs = parts[1:], {k: v[-1] for k, v in query.items()}
+        try:
+            inspect.signature(route).bind(*args, **kwargs)
+        except TypeError as e:
+            raise APIError(400, str(e))
+        return route(*args, **kwargs)
+
+    def health(self):
+        return {
+            'status': 'ok',
+            'latest_date': self.data.latest_date.strftime('%Y-%m-%d'),
+            'accounts': len(self.data.unique_accounts),
+            'transactions': len(self.data.transactions),
+        }
+
+    def total(self):
+        return records(self.data.cached('api_total', analyze_total_performance))[0]
+
+    def accounts(self, account_num=None):
+        table = self.data.cached('api_accounts', analyze_account_performance)
+        if account_num is None:
+            return records(table)
+        row = table[table['Account Number'] == account_num]
+        if row.empty:
+            raise APIError(404, f"Unknown account: {account_num}")
+        return {
+            **records(row)[0],
+            'positions': records(self.data.account_positions(account_num)),
+        }
+
+    def symbols(self, symbol=None, account=None):
+        table = self.data.cached('api_symbols', analyze_stock_performance)
+        if account is not None:
+            table = table[table['Account Number'] == account]
+        if symbol is not None:
+            table = table[table['Symbol'] == symbol]
+            if table.empty:
+                raise APIError(404, f"Unknown symbol: {symbol}")
+        return records(table)
+
+    def groups(self, grouping='Tax Treatment'):
+        if grouping not in GROUPINGS:
+            raise APIError(400, f"grouping must be one of {GROUPINGS}")
+        return records(self.data.cached(
+            f'api_groups_{grouping}', lambda data: analyze_group_performance(data, grouping)
+        ))
+
+    def lots(self, account=None, symbol=None, method='FIFO', open_only='false'):
+        method = method.upper()
+        if method not in LOT_METHODS:
+            raise APIError(400, f"method must be one of {LOT_METHODS}")
+        lots_df, _ = self.data.cached(f'tax_lots_{method}', lambda data: build_tax_lots(data, method))
+        if account is not None:
+            lots_df = lots_df[lots_df['Account Number'] == account]
+        if symbol is not None:
+            lots_df = lots_df[lots_df['Symbol'] == symbol]
+        if open_only.lower() == 'true':
+            lots_df = lots_df[lots_df['Remaining Quantity'] > 0]
+        return records(lots_df)
+
+    def transactions(self, account=None, symbol=None, start=None, end=None, limit='1000'):
+        limit = parse_limit(limit)
+        data = self.data
+        if account is not None and symbol is not None:
+            rows = data.stock_transactions(account, symbol)
+        elif account is not None:
+            rows = data.account_transactions(account)
+        else:
+            rows = data.transactions
+        if symbol is not None and account is None:
+            rows = rows[rows['Symbol'] == symbol]
+        if start is not None:
+            rows = rows[rows['Run Date'] >= parse_date(start)]
+        if end is not None:
+            rows = rows[rows['Run Date'] <= parse_date(end)]
+        rows = rows.sort_values('Run Date', kind='stable')
+
+        net_by_category = rows.groupby('Action Category', observed=True)['Amount ($)'].sum()
+        return {
+            'count': len(rows),
+            'net_amount_by_category': {k: float(v) for k, v in net_by_category.items()},
+            'transactions': records(rows.drop(columns=['Fingerprint'], errors='ignore').head(limit)),
+        }
+
+    def as_of(self, date=None):
+        """Account and total metrics as of a past date, valued by the daily NAV."""
+        if date is None:
+            raise APIError(400, "date is required")
+        date = parse_date(date)
+        nav, _ = self.data.cached('daily_valuation', build_daily_valuation)
+        if date < nav.index[0] or date > nav.index[-1]:
+            raise APIError(400, f"date must be between {nav.index[0]:%Y-%m-%d} and {nav.index[-1]:%Y-%m-%d}")
+
+        table = as_of_metrics(self.data, [date], nav)
+        return {
+            'date': date.strftime('%Y-%m-%d'),
+            'accounts': records(table.drop(columns=['Date', 'Valued On'])),
+        }
+
+
+def records(df):
+    """DataFrame as a list of JSON-ready dicts (ISO dates, NaN as null)."""
+    return json.loads(df.to_json(orient='records', date_format='iso'))
+
+
+def parse_date(text):
+    try:
+        date = pd.Timestamp(text)
+    except ValueError:
+        date = pd.NaT
+    if pd.isna(date):  # e.g. an empty value
+        raise APIError(400, f"Invalid date: {text!r}")
+    return date
+
+
+def parse_limit(text):
+    try:
+        limit = int(text)
+    except ValueError:
+        limit = -1
+    if limit < 0:
+        raise APIError(400, f"limit must be a non-negative integer, got {text!r}")
+    return limit
+
+
+def make_handler(api):
+    class PortfolioRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            try:
+                status, body = 200, api.handle(url.path, parse_qs(url.query))
+            except APIError as e:
+                status, body = e.status, {'error': str(e)}
+            except Exception as e:
+                status, body = 500, {'error': f"{type(e).__name__}: {e}"}
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return PortfolioRequestHandler
+
+
+def serve(data, host='127.0.0.1', port=8765):
+    """Serve the API until interrupted. Requests are handled on threads."""
+    server = ThreadingHTTPServer((host, port), make_handler(PortfolioAPI(data)))
+    print(f"Serving portfolio API on http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local JSON API over the portfolio")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    project_path= Path.cwd()
+    data_dir = f'{project_path}/data'
+    serve(load_data(data_dir, cache_dir=f'{data_dir}/.cache'), args.host, args.port)
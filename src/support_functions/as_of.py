@@ -0,0 +1,162 @@
+import argparse
+from dataclasses import dataclass
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from support_functions.cache import ParsedFileCache
+from support_functions.cash_flows import EntityCashFlows, concat_cash_flows, to_days
+from support_functions.data_loader import get_position_files, load_data, load_position_file
+from support_functions.flow_builders import build_account_cash_flows, build_all_account_cash_flows
+from support_functions.math_utils import metrics_from_arrays
+
+
+## As-Of Analysis
+# Every positions export is kept as a dated snapshot, and each account's
+# funding flows are date-sorted, so the state at a past date D is two binary
+# searches: the latest valuation on or before D, and the flows up to it. A
+# series of dates (e.g. month-ends) is one searchsorted per entity and a
+# single batched solve, not one full recomputation per date.
+
+@dataclass
+class PositionHistory:
+    """
+    All positions snapshots, oldest first. values holds each account's total
+    Current Value per snapshot (one row per snapshot date, one column per
+    account), the same layout as the daily NAV from build_daily_valuation.
+    """
+    dates: pd.DatetimeIndex
+    snapshots: list
+    values: pd.DataFrame
+
+    def positions_at(self, date):
+        """Positions from the latest snapshot on or before date."""
+        i = self.dates.searchsorted(pd.Timestamp(date), side='right') - 1
+        if i < 0:
+            raise KeyError(f"No positions snapshot on or before {pd.Timestamp(date):%Y-%m-%d}")
+        return self.snapshots[i]
+
+
+def load_position_history(data_dir, cache=None):
+    """Load every Portfolio_Positions file in data_dir into a PositionHistory."""
+    files = get_position_files(data_dir)
+    dates = pd.DatetimeIndex([date for date, _ in files])
+    snapshots = [load_position_file(f, cache=cache) for _, f in files]
+    values = pd.concat(
+        [s.groupby('Account Number', observed=True)['Current Value'].sum() for s in snapshots],
+        axis=1, keys=dates
+    ).T.fillna(0.0)
+    values.columns = values.columns.astype(object)
+    return PositionHistory(dates, snapshots, values)
+
+
+def as_of_metrics(data, dates, values):
+    """
+    Account and Total metrics at each of dates.
+
+    values is a (dates x accounts) table of account values, e.g.
+    PositionHistory.values or the daily NAV. Each date is valued by the
+    latest row on or before it, with the funding flows up to that row's date.
+    Accounts closed since (in the values table or the history but not in
+    the latest positions) are included. Entities with no flows and no value
+    yet are left out.
+    Returns: DataFrame with Date, Valued On, Account Number, Current Value,
+    Total Invested and the metrics, one row per (date, entity).
+    """
+    dates = pd.DatetimeIndex(dates)
+    rows = values.index.searchsorted(dates, side='right') - 1
+    if (rows < 0).any():
+        raise ValueError(f"No valuation on or before {dates[rows < 0][0]:%Y-%m-%d}")
+    valued_on = values.index[rows]
+    valued_days = to_days(valued_on)
+    value_matrix = values.to_numpy(dtype=float)[rows]
+
+    account_flows = dict(build_all_account_cash_flows(data))
+    for account_num in [*values.columns, *data.account_rows]:
+        if account_num not in account_flows:
+            account_flows[account_num] = build_account_cash_flows(data, account_num)
+    # Funding flows only; the terminal value comes from the values table
+    series = {
+        account_num: EntityCashFlows(entity.days[:-1], entity.amounts[:-1])
+        for account_num, entity in account_flows.items()
+    }
+    series['Total'] = EntityCashFlows(*concat_cash_flows(series.values()))
+    account_cols = values.columns.get_indexer(list(account_flows))
+    account_values = np.where(account_cols >= 0, value_matrix[:, account_cols], 0.0)
+    entity_values = dict(zip(account_flows, account_values.T))
+    entity_values['Total'] = account_values.sum(axis=1)
+
+    keys, date_idx, cutoffs, current_values, total_invested = [], [], [], [], []
+    flow_days, flow_amounts = [], []
+    for key, entity in series.items():
+        days, amts = entity.days.astype(np.int64), entity.amounts
+        cut = np.searchsorted(days, valued_days, side='right')
+        keep = np.flatnonzero((cut > 0) | (entity_values[key] != 0))
+        keys.append(np.full(len(keep), key, dtype=object))
+        date_idx.append(keep)
+        cutoffs.append(cut[keep])
+        current_values.append(entity_values[key][keep])
+        total_invested.append(np.concatenate([[0.0], np.cumsum(-amts)])[cut[keep]])
+        flow_days.append(days)
+        flow_amounts.append(amts)
+    date_idx, cutoffs = np.concatenate(date_idx), np.concatenate(cutoffs)
+    current_values, total_invested = np.concatenate(current_values), np.concatenate(total_invested)
+    latest_days = valued_days[date_idx]
+
+    # Flatten every (entity, date) as its flow prefix followed by the terminal value,
+    # gathering prefixes from the concatenated per-entity flow arrays
+    series_start = np.cumsum([0] + [len(d) for d in flow_days])[:-1]
+    row_series_start = np.repeat(series_start, [len(k) for k in keys])
+    lengths = cutoffs + 1
+    flat_rows = np.repeat(np.arange(len(lengths)), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    is_terminal = offsets == cutoffs[flat_rows]
+    source = row_series_start[flat_rows[~is_terminal]] + offsets[~is_terminal]
+
+    day_numbers = latest_days[flat_rows]
+    day_numbers[~is_terminal] = np.concatenate(flow_days)[source]
+    amounts = current_values[flat_rows]
+    amounts[~is_terminal] = np.concatenate(flow_amounts)[source]
+
+    metrics = metrics_from_arrays(
+        flat_rows, day_numbers, amounts, lengths, latest_days,
+        total_invested, current_values, cache=data.metrics_cache
+    )
+    result = pd.DataFrame({
+        'Date': dates[date_idx],
+        'Valued On': valued_on[date_idx],
+        'Account Number': np.concatenate(keys),
+        'Current Value': current_values,
+        'Total Invested': total_invested,
+    })
+    result = pd.concat([result, pd.DataFrame(metrics)], axis=1)
+    return result.sort_values(['Date', 'Account Number'], kind='stable', ignore_index=True)
+
+
+def rolling_metrics(data, values, freq='ME', start=None, end=None):
+    """
+    as_of_metrics on a regular calendar (month-ends by default) from the
+    first valuation, or start, through end (default: the latest date).
+    """
+    start = pd.Timestamp(start) if start is not None else values.index[0]
+    end = pd.Timestamp(end) if end is not None else data.latest_date
+    return as_of_metrics(data, pd.date_range(start, end, freq=freq), values)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Portfolio performance as of past dates")
+    parser.add_argument('--date', default=None, help="Single as-of date (YYYY-MM-DD)")
+    parser.add_argument('--freq', default='ME', help="Rolling calendar frequency (default: month-ends)")
+    args = parser.parse_args()
+
+    project_path= Path.cwd()
+    data_dir = f'{project_path}/data'
+    data = load_data(data_dir)
+    history = load_position_history(data_dir, cache=ParsedFileCache(f'{data_dir}/.cache'))
+    print(f"Loaded {len(history.dates)} position snapshots")
+
+    if args.date:
+        print(as_of_metrics(data, [args.date], history.values).to_string(index=False))
+    else:
+        rolling = rolling_metrics(data, history.values, freq=args.freq)
+        print(rolling[rolling['Account Number'] == 'Total'].to_string(index=False))
@@ -0,0 +1,106 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from support_functions.data_loader import (
+    load_data, ACTION_DIVIDEND, ACTION_FEE, ACTION_INTEREST, ACTION_REINVESTMENT
+)
+
+
+## Return Attribution
+# Each entity's dollar gain (current value plus the sum of its cash flows) is
+# split into income and cost components read from the categorized history,
+# with price appreciation as the remainder, so the components add up to the
+# gain. Every transaction row is mapped to its components in one vectorized
+# pass and summed per (account, symbol) with a single groupby; account totals
+# are sums of those groups, so the cost is linear in the number of rows.
+
+# Dollar components; income is positive, commissions and fees negative
+INCOME_COLS = ['Dividends ($)', 'Reinvested Dividends ($)', 'Interest ($)', 'Commissions ($)', 'Fees ($)']
+ATTRIBUTION_COLS = ['Price Appreciation ($)'] + INCOME_COLS
+
+
+def transaction_components(data):
+    """
+    INCOME_COLS of every transaction row. Dividends are cash received less
+    the part reinvested (REINVESTMENT rows buy shares with it); interest
+    includes accrued interest on bond trades; fees include fee rows and the
+    Fees ($) column.
+    Returns: DataFrame with Account Number, Symbol and INCOME_COLS.
+    """
+    tx = data.transactions
+    flags = data.action_flags
+
+    def column(name):
+        if name not in tx.columns:
+            return np.zeros(len(tx))
+        return np.nan_to_num(tx[name].to_numpy(dtype=float))
+
+    amounts = column('Amount ($)')
+    dividends = np.where(flags & ACTION_DIVIDEND, amounts, 0.0)
+    reinvested = np.where(flags & ACTION_REINVESTMENT, -amounts, 0.0)
+    return pd.DataFrame({
+        'Account Number': tx['Account Number'],
+        'Symbol': tx['Symbol'],
+        'Dividends ($)': dividends - reinvested,
+        'Reinvested Dividends ($)': reinvested,
+        'Interest ($)': np.where(flags & ACTION_INTEREST, amounts, 0.0) + column('Accrued Interest ($)'),
+        'Commissions ($)': -column('Commission ($)'),
+        'Fees ($)': np.where(flags & ACTION_FEE, amounts, 0.0) - column('Fees ($)'),
+    })
+
+
+def build_income(data):
+    """
+    INCOME_COLS summed per (account, symbol) and per account. Memoized on data.
+    Returns: (account_income indexed by Account Number,
+              stock_income indexed by (Account Number, Symbol))
+    """
+    return data.cached('income', _build_income)
+
+
+def _build_income(data):
+    stock_income = (
+        transaction_components(data)
+        .groupby(['Account Number', 'Symbol'], sort=False, observed=True, dropna=False)
+        .sum()
+    )
+    account_income = stock_income.groupby(level='Account Number', sort=False, observed=True).sum()
+    return account_income, stock_income
+
+
+def attribute_returns(entities, income):
+    """
+    ATTRIBUTION_COLS for EntityCashFlows, given the INCOME_COLS of each
+    (one row per entity, in order). Price appreciation is the entity's gain,
+    current value plus its flows, less the income components.
+    Returns: DataFrame with ATTRIBUTION_COLS, one row per entity.
+    """
+    income = pd.DataFrame(np.nan_to_num(np.asarray(income, dtype=float)), columns=INCOME_COLS)
+    gains = np.array([e.amounts.sum() for e in entities], dtype=float)
+    income.insert(0, 'Price Appreciation ($)', gains - income.sum(axis=1).to_numpy())
+    return income
+
+
+def account_attribution(data, entities, account_nums):
+    account_income, _ = build_income(data)
+    return attribute_returns(entities, account_income.reindex(list(account_nums)))
+
+
+def stock_attribution(data, entities, keys):
+    _, stock_income = build_income(data)
+    return attribute_returns(entities, stock_income.reindex(pd.MultiIndex.from_tuples(keys)))
+
+
+if __name__ == "__main__":
+    from support_functions.flow_builders import build_all_account_cash_flows
+
+    project_path= Path.cwd()
+    data_dir = f'{project_path}/data'
+
+    data = load_data(data_dir)
+    account_flows = build_all_account_cash_flows(data)
+    accounts = list(data.unique_accounts['Account Number'])
+    attribution = account_attribution(data, [account_flows[num] for num in accounts], accounts)
+    attribution.insert(0, 'Account Number', accounts)
+    print(attribution.to_string(index=False))
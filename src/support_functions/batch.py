@@ -0,0 +1,228 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+import time
+import traceback
+import numpy as np
+import pandas as pd
+
+from support_functions.analysis import to_numeric_columns
+from support_functions.config import load_batch_config
+from support_functions.data_loader import load_data
+from support_functions.flow_builders import build_all_account_cash_flows
+from support_functions.instrumentation import peak_rss_mb, reset_trace, stage
+from support_functions.math_utils import calculate_metrics_batch
+from support_functions.metrics_cache import MetricsCache
+from support_functions.pipeline import report_portfolio, write_trace
+from support_functions.report_generator import format_table, write_table
+from support_functions.rollup import merge_cash_flows
+
+
+## Batch Processing
+# Reports every portfolio of a batch config (see config.load_batch_config) on
+# a process pool. Each portfolio keeps its own parsed-file cache and
+# transaction store, under the shared cache root when one is configured.
+# Solved metrics are shared: every worker starts from the batch's metrics
+# cache, sends back what it solved, and the merged cache is saved once.
+
+ANALYSIS_STAGES = ['total', 'account', 'stock', 'tax_lots', 'groups', 'benchmark']
+
+
+@dataclass
+class PortfolioResult:
+    name: str
+    outputs: list = field(default_factory=list)
+    total_flows: object = None   # EntityCashFlows of the whole portfolio
+    metrics: dict = field(default_factory=dict)
+    accounts: int = 0
+    transactions: int = 0
+    timings: dict = field(default_factory=dict)
+    new_metrics: dict = field(default_factory=dict)
+    error: str = None
+
+
+_WORKER_STATE = {}
+
+
+def _init_worker(metrics_entries):
+    metrics_cache = MetricsCache()
+    metrics_cache.entries.update(metrics_entries)
+    _WORKER_STATE['metrics_cache'] = metrics_cache
+    _WORKER_STATE['seen'] = set(metrics_entries)
+
+
+def run_portfolio(task):
+    """
+    Load and report one portfolio, logging its output to output_dir/batch.log.
+    Errors are caught and returned, so one bad portfolio does not stop the batch.
+    Returns: PortfolioResult
+    """
+    portfolio, cache_dir, report_args = task
+    metrics_cache = _WORKER_STATE['metrics_cache']
+    result = PortfolioResult(portfolio.name)
+    trace = reset_trace()
+    start = time.perf_counter()
+
+    portfolio.output_dir.mkdir(parents=True, exist_ok=True)
+    with open(portfolio.output_dir / 'batch.log', 'w') as log, redirect_stdout(log):
+        try:
+            with stage('load'):
+                data = load_data(
+                    portfolio.data_dir, cache_dir=cache_dir, metrics_cache=metrics_cache, rules=portfolio.rules
+                )
+            outputs = report_portfolio(data, report_args, portfolio.output_dir, quiet=True)
+            outputs.append(write_trace(data, portfolio.output_dir, quiet=True))
+
+            account_flows = build_all_account_cash_flows(data)
+            total_flows = merge_cash_flows(
+                (account_flows[num] for num in data.unique_accounts['Account Number']), data.latest_date
+            )
+            result.metrics = calculate_metrics_batch([total_flows], cache=metrics_cache)[0]
+            result.outputs = [str(path) for path in outputs]
+            result.total_flows = total_flows
+            result.accounts = len(data.unique_accounts)
+            result.transactions = len(data.transactions)
+        except Exception:
+            traceback.print_exc(file=log)
+            result.error = traceback.format_exc(limit=1).strip().splitlines()[-1]
+
+    wall = {s['stage']: s['wall_s'] for s in trace.stages if s['depth'] == 0}
+    result.timings = {
+        'Load (s)': wall.get('load', np.nan),
+        'Analysis (s)': sum(wall.get(name, 0.0) for name in ANALYSIS_STAGES),
+        'Report (s)': wall.get('report', 0.0) + wall.get('nav', 0.0),
+        'Wall (s)': time.perf_counter() - start,
+        'Peak RSS (MB)': peak_rss_mb(),
+    }
+    seen = _WORKER_STATE['seen']
+    result.new_metrics = {key: value for key, value in metrics_cache.entries.items() if key not in seen}
+    seen.update(result.new_metrics)
+    return result
+
+
+def run_batch(config, report_args, workers=None):
+    """
+    Report every portfolio in a BatchConfig, workers at a time (default:
+    config.workers), then write the consolidated summary to config.output_dir.
+    report_args carries the report options (format, lot_method, prices,
+    benchmark, benchmark_prices) used for every portfolio.
+    Returns: (summary DataFrame, list of PortfolioResult)
+    """
+    workers = workers or config.workers
+    metrics_cache = MetricsCache(config.cache_dir / 'metrics.json' if config.cache_dir else None)
+    tasks = [
+        (p, (config.cache_dir / p.name) if config.cache_dir else p.data_dir / '.cache', report_args)
+        for p in config.portfolios
+    ]
+    seed = dict(metrics_cache.entries)
+
+    start = time.perf_counter()
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(seed,)) as pool:
+            results = []
+            for result in pool.map(run_portfolio, tasks):
+                print_result(result)
+                results.append(result)
+    else:
+        _init_worker(seed)
+        results = []
+        for task in tasks:
+            results.append(run_portfolio(task))
+            print_result(results[-1])
+    elapsed = time.perf_counter() - start
+
+    for result in results:
+        for key, metrics in result.new_metrics.items():
+            metrics_cache.put(key, metrics)
+    metrics_cache.save()
+
+    summary = summarize_batch(results, metrics_cache)
+    print(f"\n{len(results)} portfolios in {elapsed:.2f}s on {min(workers, len(tasks))} worker(s)")
+    return summary, results
+
+
+def print_result(result):
+    status = f"failed: {result.error}" if result.error else f"{len(result.outputs)} files"
+    print(f"  {result.name:<24}{result.timings['Wall (s)']:>8.2f}s  {status}")
+
+
+def summarize_batch(results, metrics_cache=None):
+    """
+    One row per portfolio with its total metrics, size and timings, plus a
+    consolidated row whose metrics are solved over all portfolios' flows.
+    """
+    rows = []
+    for result in results:
+        flows = result.total_flows
+        rows.append({
+            'Portfolio': result.name,
+            'Accounts': result.accounts,
+            'Transactions': result.transactions,
+            'Current Value': flows.current_value if flows is not None else np.nan,
+            'Total Invested': flows.total_invested if flows is not None else np.nan,
+            'Total Return ($)': result.metrics.get('Total Return ($)', np.nan),
+            'Total Return (%)': result.metrics.get('ROI', np.nan),
+            'IRR': result.metrics.get('IRR', np.nan),
+            'Holding Period (Y)': result.metrics.get('Holding Period (Y)', np.nan),
+            **result.timings,
+            'Error': result.error,
+        })
+
+    succeeded = [r.total_flows for r in results if r.total_flows is not None]
+    if succeeded:
+        combined = merge_cash_flows(succeeded)
+        metrics = calculate_metrics_batch([combined], cache=metrics_cache)[0]
+        rows.append({
+            'Portfolio': 'All',
+            'Accounts': sum(r.accounts for r in results),
+            'Transactions': sum(r.transactions for r in results),
+            'Current Value': combined.current_value,
+            'Total Invested': combined.total_invested,
+            'Total Return ($)': metrics['Total Return ($)'],
+            'Total Return (%)': metrics['ROI'],
+            'IRR': metrics['IRR'],
+            'Holding Period (Y)': metrics['Holding Period (Y)'],
+            'Wall (s)': sum(r.timings['Wall (s)'] for r in results),
+        })
+    return to_numeric_columns(pd.DataFrame(rows))
+
+
+def write_batch_summary(summary, output_dir, formats=('md', 'csv')):
+    """Write the summary as Batch_Summary_<today> in each format. Returns: list of paths written."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stem = f"Batch_Summary_{datetime.now().strftime('%Y-%m-%d')}"
+    paths = []
+    for fmt in formats:
+        path = output_dir / f"{stem}.{fmt}"
+        if fmt == 'md':
+            with open(path, 'w') as f:
+                f.write("# Batch Portfolio Summary\n")
+                f.write(f"**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M')}\n\n")
+                formatted = format_table(summary).astype(object)
+                formatted = formatted.where(formatted.notna(), None)  # blank, not "nan"
+                f.write(formatted.to_markdown(index=False, floatfmt=".2f", missingval=""))
+                f.write("\n")
+        else:
+            write_table(summary, path, fmt)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report every portfolio listed in a batch config")
+    parser.add_argument('config', help="Batch config file (TOML)")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    config = load_batch_config(args.config)
+    report_args = argparse.Namespace(
+        format=['md'], lot_method='FIFO', prices=None, benchmark=None, benchmark_prices=None
+    )
+    summary, _ = run_batch(config, report_args, workers=args.workers)
+    print(summary.to_string(index=False))
+    for path in write_batch_summary(summary, config.output_dir):
+        print(f"Summary saved to: {path}")
@@ -0,0 +1,290 @@
+import argparse
+from datetime import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from support_functions.analysis import (
+    analyze_account_performance, analyze_stock_performance, analyze_total_performance
+)
+from support_functions.data_loader import (
+    load_data, clean_currency, clean_currency_series, categorize_asset, categorize_assets
+)
+from support_functions.flow_builders import build_all_stock_cash_flows
+from support_functions.math_utils import xirr, xirr_batch
+from support_functions.rollup import merge_cash_flows
+from support_functions.metrics_cache import MetricsCache
+from support_functions.report_generator import generate_markdown_report
+from support_functions.synthetic_data import generate_portfolio
+
+
+NUMERIC_COLS = [
+    'Amount ($)', 'Price ($)', 'Quantity',
+    'Commission ($)', 'Fees ($)', 'Accrued Interest ($)'
+]
+
+
+def synthetic_history_frame(n_rows, seed=0):
+    """
+    Raw (uncleaned) history columns as pd.read_csv would return them:
+    strings with '$', ',', '(...)' negatives, '--' and blanks mixed in.
+    """
+    rng = np.random.default_rng(seed)
+    symbols = np.array(['AAPL', 'MSFT', 'FXAIX', 'SPAXX', 'FDRXX', '912797SG3', 'NVDA', ''])
+    descriptions = np.array([
+        'APPLE INC', 'MICROSOFT CORP', 'FIDELITY 500 INDEX FUND',
+        'FIDELITY GOVERNMENT MONEY MARKET', 'FIDELITY GOVERNMENT CASH RESERVES',
+        'UNITED STATES TREAS BILLS ZERO CPN', 'NVIDIA CORP', 'No Description'
+    ])
+    picks = rng.integers(0, len(symbols), n_rows)
+
+    def money_column():
+        values = rng.normal(0, 5000, n_rows).round(2)
+        text = np.char.mod('%.2f', values).astype(object)
+        style = rng.integers(0, 10, n_rows)
+        text[style == 0] = np.char.mod('$%.2f', np.abs(values[style == 0]))
+        text[style == 1] = np.char.mod('(%.2f)', np.abs(values[style == 1]))
+        text[style == 2] = '--'
+        text[style == 3] = np.nan
+        return text
+
+    df = pd.DataFrame({col: money_column() for col in NUMERIC_COLS})
+    df['Symbol'] = symbols[picks]
+    df['Description'] = descriptions[picks]
+    return df
+
+
+def clean_rowwise(df):
+    """The original Series.apply / DataFrame.apply(axis=1) cleaning."""
+    out = pd.DataFrame(index=df.index)
+    for col in NUMERIC_COLS:
+        out[col] = df[col].apply(clean_currency)
+    out['Asset Type'] = df.apply(categorize_asset, axis=1)
+    return out
+
+
+def clean_vectorized(df):
+    out = pd.DataFrame(index=df.index)
+    for col in NUMERIC_COLS:
+        out[col] = clean_currency_series(df[col])
+    out['Asset Type'] = categorize_assets(df)
+    return out
+
+
+def bench_cleaning(n_rows=1_000_000, seed=0):
+    df = synthetic_history_frame(n_rows, seed)
+
+    start = time.perf_counter()
+    expected = clean_rowwise(df)
+    rowwise_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = clean_vectorized(df)
+    vectorized_s = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_exact=True)
+    print(f"Cleaning {n_rows:,} rows: row-wise {rowwise_s:.2f}s, "
+          f"vectorized {vectorized_s:.2f}s ({rowwise_s / vectorized_s:.1f}x)")
+    return {'rows': n_rows, 'rowwise_s': rowwise_s, 'vectorized_s': vectorized_s}
+
+
+## Pipeline Benchmarks
+# asv-style suite: setup() builds a synthetic portfolio once per scale and
+# every time_* method is one timed stage. run_benchmarks() is a minimal
+# runner that writes JSON results which compare_benchmarks() can diff.
+
+BENCH_SCALES = {
+    'small': dict(n_accounts=3, n_symbols=10, years=2, trades_per_day=2),
+    'medium': dict(n_accounts=6, n_symbols=40, years=5, trades_per_day=10),
+    'large': dict(n_accounts=12, n_symbols=150, years=10, trades_per_day=40),
+}
+
+
+class PipelineSuite:
+    params = list(BENCH_SCALES)
+    param_names = ['scale']
+
+    def setup(self, scale):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.data_dir = Path(self._tmp.name) / 'data'
+        generate_portfolio(self.data_dir, **BENCH_SCALES[scale])
+        self.data = load_data(self.data_dir)
+        self.stock_flows = list(build_all_stock_cash_flows(self.data).values())
+        self.total_flows = merge_cash_flows(self.stock_flows)
+        self.results = [f(self.data) for f in (
+            analyze_total_performance, analyze_account_performance, analyze_stock_performance
+        )]
+
+    def teardown(self, scale):
+        self._tmp.cleanup()
+
+    def _fresh_data(self):
+        """Drop memoized flows and metrics so every timing does the full work."""
+        self.data.derived.clear()
+        self.data.metrics_cache = MetricsCache()
+        return self.data
+
+    def time_load_data(self, scale):
+        load_data(self.data_dir)
+
+    def time_analyze_total_performance(self, scale):
+        analyze_total_performance(self._fresh_data())
+
+    def time_analyze_account_performance(self, scale):
+        analyze_account_performance(self._fresh_data())
+
+    def time_analyze_stock_performance(self, scale):
+        analyze_stock_performance(self._fresh_data())
+
+    def time_xirr(self, scale):
+        xirr(self.total_flows)
+
+    def time_xirr_batch(self, scale):
+        xirr_batch(self.stock_flows)
+
+    def time_generate_markdown_report(self, scale):
+        generate_markdown_report(*self.results, self.data.latest_date)
+
+
+## Cold-Start Benchmarks
+# Wall time of fresh `python -m support_functions.cli` processes, so import
+# cost and the unchanged-input fast path are tracked next to the stages.
+
+COLD_START_COMMANDS = {
+    'help': ['--help'],
+    'cached_report': ['report'],
+    'load': ['load'],
+    'report': ['report', '--force'],
+}
+
+
+def run_cold_start(repeat=3, scale='small'):
+    """
+    Time each COLD_START_COMMANDS entry as a new interpreter process on a
+    synthetic project, after one warm-up report so the caches are populated.
+    Returns: dict of results keyed like run_benchmarks' entries.
+    """
+    src_dir = Path(__file__).resolve().parents[1]
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [str(src_dir), os.environ.get('PYTHONPATH')]))}
+    results = {}
+    with tempfile.TemporaryDirectory() as project_dir:
+        generate_portfolio(Path(project_dir) / 'data', **BENCH_SCALES[scale])
+
+        def run_cli(args):
+            subprocess.run(
+                [sys.executable, '-m', 'support_functions.cli', '--project', project_dir, *args],
+                env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+
+        run_cli(['report'])
+        for name, args in COLD_START_COMMANDS.items():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run_cli(args)
+                timings.append(time.perf_counter() - start)
+            key = f"cold_start_{name}[{scale}]"
+            results[key] = {
+                'scale': scale, 'rows': None,
+                'min_s': min(timings), 'median_s': statistics.median(timings)
+            }
+            print(f"{key:<48} {min(timings) * 1e3:10.1f} ms")
+    return results
+
+
+def run_benchmarks(scales=None, repeat=3, output_path=None, cold_start=True):
+    """
+    Run every time_* benchmark of PipelineSuite at each scale, and the
+    cold-start benchmarks unless cold_start is False.
+    Returns: dict of results, also written as JSON to output_path if given.
+    """
+    scales = scales or PipelineSuite.params
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'repeat': repeat,
+        'benchmarks': {},
+    }
+    names = sorted(n for n in dir(PipelineSuite) if n.startswith('time_'))
+    for scale in scales:
+        suite = PipelineSuite()
+        suite.setup(scale)
+        try:
+            rows = len(suite.data.transactions)
+            for name in names:
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    getattr(suite, name)(scale)
+                    timings.append(time.perf_counter() - start)
+                key = f"{name}[{scale}]"
+                results['benchmarks'][key] = {
+                    'scale': scale, 'rows': rows,
+                    'min_s': min(timings), 'median_s': statistics.median(timings)
+                }
+                print(f"{key:<48} {min(timings) * 1e3:10.1f} ms  ({rows:,} rows)")
+        finally:
+            suite.teardown(scale)
+    if cold_start:
+        results['benchmarks'].update(run_cold_start(repeat))
+
+    if output_path:
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Benchmark results saved to: {output_path}")
+    return results
+
+
+def compare_benchmarks(baseline_path, current_path, threshold=1.2):
+    """
+    Print the current/baseline ratio of every benchmark present in both
+    result files and flag those slower than threshold.
+    Returns: list of regressed benchmark names.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)['benchmarks']
+    with open(current_path) as f:
+        current = json.load(f)['benchmarks']
+
+    regressed = []
+    for key in sorted(baseline.keys() & current.keys()):
+        ratio = current[key]['min_s'] / baseline[key]['min_s']
+        flag = 'REGRESSION' if ratio > threshold else ''
+        print(f"{key:<48} {ratio:6.2f}x {flag}")
+        if ratio > threshold:
+            regressed.append(key)
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run pipeline benchmarks on synthetic data")
+    parser.add_argument('--scales', nargs='+', choices=list(BENCH_SCALES), default=['small', 'medium'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=None, help="Write JSON results to this path")
+    parser.add_argument('--compare', default=None, help="Baseline JSON to compare the new results against")
+    parser.add_argument('--cleaning', action='store_true', help="Also run the row-wise vs vectorized cleaning benchmark")
+    parser.add_argument('--no-cold-start', action='store_true', help="Skip the CLI cold-start benchmarks")
+    args = parser.parse_args(argv)
+
+    if args.cleaning:
+        bench_cleaning()
+    output = args.output or (f'output/benchmarks_{datetime.now():%Y%m%d_%H%M%S}.json' if args.compare else None)
+    run_benchmarks(args.scales, repeat=args.repeat, output_path=output, cold_start=not args.no_cold_start)
+    if args.compare:
+        return 1 if compare_benchmarks(args.compare, output) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
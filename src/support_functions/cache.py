@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+import pandas as pd
+
+
+# Bump when cleaning logic changes so stale parsed frames are not reused.
+CACHE_VERSION = 1
+
+
+def file_fingerprint(path, content_hash=True):
+    """Identity of an export file: absolute path, size, mtime and (optionally) SHA-256 of its bytes."""
+    stat = os.stat(path)
+    fingerprint = {
+        'path': str(Path(path).resolve()),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+    }
+    if content_hash:
+        fingerprint['sha256'] = hash_file(path)
+    return fingerprint
+
+
+def hash_file(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParsedFileCache:
+    """
+    On-disk Parquet cache of cleaned Fidelity export files.
+
+    Entries are keyed by file path, size, mtime and content hash. A file whose
+    size and mtime are unchanged is served without reading it; a file that was
+    touched but not modified is recognised by its hash.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.cache_dir / 'manifest.json'
+        self.manifest = self._read_manifest()
+
+    def load(self, path, kind):
+        """Return the cached cleaned frame for path, or None on a miss."""
+        entry = self.manifest.get(self._key(path, kind))
+        if entry is None:
+            return None
+        parquet_path = self.cache_dir / entry['parquet']
+        if not parquet_path.exists():
+            return None
+
+        current = file_fingerprint(path, content_hash=False)
+        if current['size'] != entry['size']:
+            return None
+        if current['mtime_ns'] != entry['mtime_ns']:
+            if hash_file(path) != entry['sha256']:
+                return None
+            entry['mtime_ns'] = current['mtime_ns']
+            self._write_manifest()
+        return pd.read_parquet(parquet_path)
+
+    def store(self, path, kind, df):
+        fingerprint = file_fingerprint(path)
+        parquet_name = f"{kind}_{fingerprint['sha256'][:16]}_v{CACHE_VERSION}.parquet"
+        df.to_parquet(self.cache_dir / parquet_name, index=False)
+
+        key = self._key(path, kind)
+        previous = self.manifest.get(key)
+        self.manifest[key] = {**fingerprint, 'parquet': parquet_name}
+        if previous and previous['parquet'] != parquet_name:
+            self._remove_unreferenced(previous['parquet'])
+        self._write_manifest()
+
+    def _key(self, path, kind):
+        return f"{kind}:{Path(path).resolve()}"
+
+    def _remove_unreferenced(self, parquet_name):
+        if all(e['parquet'] != parquet_name for e in self.manifest.values()):
+            (self.cache_dir / parquet_name).unlink(missing_ok=True)
+
+    def _read_manifest(self):
+        if not self.manifest_path.exists():
+            return {}
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('version') != CACHE_VERSION:
+            return {}
+        return manifest.get('entries', {})
+
+    def _write_manifest(self):
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': CACHE_VERSION, 'entries': self.manifest}, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+
+## Cash-Flow Arrays
+# An entity's flows are two parallel arrays, int32 days since 1970-01-01 and
+# float64 amounts (negative = money in, the last flow is normally the current
+# value). Builders fill them straight from DataFrame columns and the metric
+# functions read them without unpacking tuples.
+
+DAY_DTYPE = np.int32
+
+
+def to_days(dates):
+    """Dates (anything DatetimeIndex accepts) as int32 days since the epoch."""
+    return pd.DatetimeIndex(dates).values.astype('datetime64[D]').astype(DAY_DTYPE)
+
+
+def from_days(days):
+    return pd.DatetimeIndex(np.asarray(days).astype('datetime64[D]'))
+
+
+class EntityCashFlows:
+    """
+    Cash flows of one entity (an account, a holding or a roll-up of them),
+    with its total invested, current value and valuation date.
+
+    The arrays are backed by buffers with spare capacity, so append() and
+    extend() grow in amortized O(1) per flow. days and amounts are views of
+    the filled part.
+    """
+    __slots__ = ('_days', '_amounts', '_size', 'total_invested', 'current_value', 'latest_date')
+
+    def __init__(self, days=None, amounts=None, total_invested=0.0, current_value=0.0, latest_date=None):
+        self._days = np.ascontiguousarray(days if days is not None else [], dtype=DAY_DTYPE)
+        self._amounts = np.ascontiguousarray(amounts if amounts is not None else [], dtype=np.float64)
+        if len(self._days) != len(self._amounts):
+            raise ValueError("days and amounts must have the same length")
+        self._size = len(self._days)
+        self.total_invested = total_invested
+        self.current_value = current_value
+        self.latest_date = latest_date
+
+    @classmethod
+    def from_tuples(cls, cash_flows, total_invested=0.0, current_value=0.0, latest_date=None):
+        """Build from a list of (date, amount) tuples."""
+        dates = [date for date, _ in cash_flows]
+        amounts = np.array([amount for _, amount in cash_flows], dtype=np.float64)
+        return cls(to_days(dates), amounts, total_invested, current_value, latest_date)
+
+    @property
+    def days(self):
+        return self._days[:self._size]
+
+    @property
+    def amounts(self):
+        return self._amounts[:self._size]
+
+    @property
+    def dates(self):
+        return from_days(self.days)
+
+    @property
+    def cash_flows(self):
+        """
+        The flows as a tuple of (Timestamp, amount) pairs. Read-only: add
+        flows with append() or extend().
+        """
+        return tuple(zip(self.dates, self.amounts.tolist()))
+
+    def __len__(self):
+        return self._size
+
+    def __repr__(self):
+        return (
+            f"EntityCashFlows({self._size} flows, total_invested={self.total_invested!r}, "
+            f"current_value={self.current_value!r}, latest_date={self.latest_date!r})"
+        )
+
+    def append(self, date, amount):
+        self.extend(to_days([date]), [amount])
+
+    def extend(self, days, amounts):
+        """Append flows given as day numbers (see to_days) and amounts."""
+        days = np.asarray(days, dtype=DAY_DTYPE)
+        n = len(days)
+        self._reserve(self._size + n)
+        self._days[self._size:self._size + n] = days
+        self._amounts[self._size:self._size + n] = amounts
+        self._size += n
+
+    def _reserve(self, capacity):
+        if capacity <= len(self._days):
+            return
+        capacity = max(capacity, 2 * len(self._days), 8)
+        for name in ('_days', '_amounts'):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+
+def concat_cash_flows(children):
+    """
+    Flows of all children in one date-sorted pair of arrays. Ties keep the
+    order of children, then each child's own order.
+    Returns: (days, amounts)
+    """
+    children = list(children)
+    if not children:
+        return np.empty(0, dtype=DAY_DTYPE), np.empty(0, dtype=np.float64)
+    days = np.concatenate([c.days for c in children])
+    amounts = np.concatenate([c.amounts for c in children])
+    order = np.argsort(days, kind='stable')
+    return days[order], amounts[order]
@@ -0,0 +1,348 @@
+import argparse
+from contextlib import redirect_stdout
+from datetime import datetime
+import json
+import os
+from pathlib import Path
+import sys
+
+from support_functions.report_cache import cached_report, input_snapshot, save_report_manifest
+from support_functions.report_generator import REPORT_FORMATS
+
+
+## Command-Line Entry Point
+# Installed as the `fidelity-portfolio` console script. Only the standard
+# library is imported up front; each subcommand imports the pipeline modules
+# it needs, so --help and unchanged-input report runs never load pandas.
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='fidelity-portfolio', description="Fidelity portfolio analysis")
+    parser.add_argument(
+        '--project', default='.',
+        help="Project directory holding data/ and output/ (default: current directory)"
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    report = commands.add_parser('report', help="Analyse data/ and write the report to output/")
+    add_load_arguments(report)
+    add_report_arguments(report)
+    report.add_argument(
+        '--as-of', default=None,
+        help="Also report account metrics as of this date (YYYY-MM-DD), valued by the positions snapshot on or before it"
+    )
+    report.add_argument(
+        '--rolling', default=None, metavar='FREQ',
+        help="Write a rolling IRR series at this frequency (e.g. ME for month-ends), valued by the daily NAV"
+    )
+    report.add_argument(
+        '--watch', action='store_true',
+        help="Keep running: poll data/ for new exports and regenerate the report incrementally"
+    )
+    report.add_argument(
+        '--interval', type=float, default=0.5,
+        help="Polling interval in seconds for --watch (default: 0.5)"
+    )
+    report.add_argument(
+        '--profile', action='store_true',
+        help="Run under cProfile and tracemalloc; writes a .prof file to output/"
+    )
+    report.add_argument(
+        '--force', action='store_true',
+        help="Recompute even if no input file changed since the last report"
+    )
+
+    load = commands.add_parser('load', help="Parse data/ into the on-disk cache and print a summary")
+    add_load_arguments(load)
+
+    query = commands.add_parser('query', help="Query the portfolio through the JSON API routes")
+    query.add_argument('route', nargs='?', default='/', help="API route, e.g. /accounts or /symbols/AAPL (default: list routes)")
+    query.add_argument('params', nargs='*', metavar='KEY=VALUE', help="Query parameters, e.g. account=X123")
+    query.add_argument('--serve', action='store_true', help="Serve the API over HTTP instead of answering one query")
+    query.add_argument('--host', default='127.0.0.1')
+    query.add_argument('--port', type=int, default=8765)
+
+    simulate = commands.add_parser('simulate', help="Monte Carlo / scenario stress test of the current positions")
+    simulate.add_argument('returns', nargs='?', help="Historical price or return table (CSV or Parquet) to bootstrap from")
+    simulate.add_argument('--kind', choices=['prices', 'returns'], default='prices', help="What the table holds (default: prices)")
+    simulate.add_argument('--paths', type=int, default=10_000, help="Number of simulated paths (default: 10000)")
+    simulate.add_argument('--horizon', type=int, default=21, help="Trading days per path (default: 21)")
+    simulate.add_argument('--seed', type=int, default=0)
+    simulate.add_argument('--workers', type=int, default=1, help="Processes simulating path chunks (default: 1)")
+    simulate.add_argument(
+        '--proxy', nargs='*', default=[], metavar='ASSET_TYPE=SYMBOL',
+        help="Return series for holdings without their own history, e.g. Stock=SPY"
+    )
+    simulate.add_argument('--scenarios', default=None, help="CSV of fixed shocks (Scenario, Target, Shock)")
+
+    batch = commands.add_parser('batch', help="Report every portfolio listed in a batch config file (TOML)")
+    batch.add_argument('config', help="Batch config: portfolios with their data dirs, exclusions and cash-flow overrides")
+    batch.add_argument(
+        '--workers', type=int, default=None,
+        help="Portfolios processed at once (default: workers in the config, else 1)"
+    )
+    add_report_arguments(batch)
+
+    commands.add_parser(
+        'bench', add_help=False,
+        help="Run the pipeline and cold-start benchmarks (options as in benchmarks.py; bench --help)"
+    )
+    return parser
+
+
+def add_load_arguments(parser):
+    parser.add_argument(
+        '--workers', type=int, default=1,
+        help="Number of processes used to parse history files (default: 1)"
+    )
+    parser.add_argument(
+        '--chunksize', type=int, default=None,
+        help="Stream history files in blocks of this many rows to bound memory (default: read whole files)"
+    )
+
+
+def add_report_arguments(parser):
+    parser.add_argument(
+        '--lot-method', default='FIFO',
+        help="How sells are matched to tax lots: FIFO, LIFO or HIFO (default: FIFO)"
+    )
+    parser.add_argument(
+        '--prices', default=None,
+        help="Daily price table (CSV or Parquet) for the NAV / time-weighted return series"
+    )
+    parser.add_argument(
+        '--format', nargs='+', default=['md'], choices=REPORT_FORMATS,
+        help="Report output format(s) (default: md). csv / parquet / json also apply to the NAV and rolling tables"
+    )
+    parser.add_argument(
+        '--benchmark', default=None, metavar='SYMBOL',
+        help="Compare every entity against this index with matched cash flows (PME, excess IRR, direct alpha)"
+    )
+    parser.add_argument(
+        '--benchmark-prices', default=None,
+        help="Price table (CSV or Parquet) holding the --benchmark series (default: the --prices table)"
+    )
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if extra and args.command != 'bench':
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    project_path = Path(args.project).resolve()
+
+    if args.command == 'report':
+        return run_report(parser, args, project_path)
+    if args.command == 'load':
+        return run_load(args, project_path)
+    if args.command == 'query':
+        return run_query(parser, args, project_path)
+    if args.command == 'simulate':
+        return run_simulate(parser, args, project_path)
+    if args.command == 'batch':
+        return run_batch(parser, args)
+    if args.command == 'bench':
+        from support_functions.benchmarks import main as bench_main
+        return bench_main(extra)
+
+
+def run_report(parser, args, project_path):
+    data_dir = project_path / 'data'
+    output_dir = project_path / 'output'
+    options = report_options(args)
+    snapshot = input_snapshot(data_dir)
+
+    # Fast path: nothing that feeds the report changed, so serve the last one
+    if not (args.force or args.watch or args.profile or args.as_of):
+        outputs = cached_report(output_dir, snapshot, options)
+        if outputs is not None:
+            print("Inputs unchanged since the last report (use --force to recompute).")
+            for path in outputs:
+                if path.endswith('.md'):
+                    with open(path) as f:
+                        print(f.read())
+                print(f"Report saved to: {path}")
+            return 0
+
+    check_report_arguments(parser, args)
+    if args.as_of:
+        check_as_of_snapshot(parser, args.as_of, data_dir)
+    from support_functions import pipeline
+
+    if args.watch:
+        pipeline.watch_reports(args, project_path)
+        return 0
+    if args.profile:
+        from support_functions.instrumentation import profiled
+        profile_path = output_dir / f"Portfolio_Profile_{datetime.now().strftime('%Y-%m-%d_%H%M%S')}.prof"
+        with profiled(profile_path):
+            pipeline.run_analysis(args, project_path)
+        return 0
+
+    outputs = pipeline.run_analysis(args, project_path)
+    save_report_manifest(output_dir, snapshot, options, outputs)
+    return 0
+
+
+def check_report_arguments(parser, args):
+    from support_functions.tax_lots import LOT_METHODS
+    if args.lot_method not in LOT_METHODS:
+        parser.error(f"--lot-method must be one of {', '.join(LOT_METHODS)}")
+    if args.benchmark and not (args.benchmark_prices or args.prices):
+        parser.error("--benchmark needs a price table (--benchmark-prices or --prices)")
+    for option, path in (('--prices', args.prices), ('--benchmark-prices', args.benchmark_prices)):
+        if path and not os.path.isfile(path):
+            parser.error(f"{option}: no such file: {path}")
+    if getattr(args, 'as_of', None):
+        try:
+            args.as_of = datetime.strptime(args.as_of, '%Y-%m-%d').strftime('%Y-%m-%d')
+        except ValueError:
+            parser.error(f"--as-of must be a date as YYYY-MM-DD, got {args.as_of!r}")
+
+
+def check_as_of_snapshot(parser, as_of, data_dir):
+    """Reject an --as-of date before the first positions snapshot in data_dir."""
+    from support_functions.data_loader import get_position_files
+    try:
+        first_date, _ = get_position_files(data_dir)[0]
+    except FileNotFoundError as e:
+        parser.error(str(e))
+    if first_date > datetime.strptime(as_of, '%Y-%m-%d'):
+        parser.error(
+            f"--as-of {as_of} is before the first positions snapshot ({first_date:%Y-%m-%d}); "
+            "there is no valuation to report"
+        )
+
+
+def report_options(args):
+    """Options that change report contents, with the price table's identity."""
+    options = {
+        'format': sorted(args.format),
+        'lot_method': args.lot_method,
+        'rolling': args.rolling,
+        'benchmark': args.benchmark,
+        'prices': file_identity(args.prices),
+        'benchmark_prices': file_identity(args.benchmark_prices),
+    }
+    return options
+
+
+def file_identity(path):
+    """
+    [resolved path, size, mtime] of an optional input file, so edits
+    invalidate the cache. A missing file has no size or mtime; it is
+    reported by check_report_arguments.
+    """
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return [str(Path(path).resolve()), None, None]
+    return [str(Path(path).resolve()), stat.st_size, stat.st_mtime_ns]
+
+
+def run_load(args, project_path):
+    from support_functions.data_loader import load_data
+    from support_functions.instrumentation import reset_trace, stage
+
+    data_dir = project_path / 'data'
+    trace = reset_trace()
+    with stage('load'):
+        data = load_data(data_dir, cache_dir=data_dir / '.cache', workers=args.workers, chunksize=args.chunksize)
+    print(
+        f"Loaded {len(data.transactions):,} transactions and {len(data.positions):,} positions "
+        f"across {len(data.unique_accounts)} accounts (positions as of {data.latest_date:%Y-%m-%d})"
+    )
+    print(trace.summary())
+    return 0
+
+
+def run_query(parser, args, project_path):
+    params = {}
+    for param in args.params:
+        key, sep, value = param.partition('=')
+        if not sep:
+            parser.error(f"query parameters must be KEY=VALUE, got {param!r}")
+        params[key] = [value]
+
+    from support_functions.api_server import APIError, PortfolioAPI, serve
+    from support_functions.data_loader import load_data
+
+    data_dir = project_path / 'data'
+    # Keep stdout clean for the JSON answer
+    with redirect_stdout(sys.stderr):
+        data = load_data(data_dir, cache_dir=data_dir / '.cache')
+    if args.serve:
+        serve(data, args.host, args.port)
+        return 0
+    try:
+        result = PortfolioAPI(data).handle(args.route, params)
+    except APIError as e:
+        print(json.dumps({'error': str(e)}), file=sys.stderr)
+        return 1
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+def run_simulate(parser, args, project_path):
+    if not (args.returns or args.scenarios):
+        parser.error("simulate needs a returns table, --scenarios, or both")
+    proxies = {}
+    for proxy in args.proxy:
+        asset_type, sep, symbol = proxy.partition('=')
+        if not sep:
+            parser.error(f"--proxy entries must be ASSET_TYPE=SYMBOL, got {proxy!r}")
+        proxies[asset_type] = symbol
+
+    from support_functions.data_loader import load_data
+    from support_functions.scenarios import analyze_scenarios, load_return_table, load_scenarios, stress_test
+
+    data_dir = project_path / 'data'
+    output_dir = project_path / 'output'
+    output_dir.mkdir(exist_ok=True)
+    data = load_data(data_dir, cache_dir=data_dir / '.cache')
+    date = data.latest_date.strftime('%Y-%m-%d')
+
+    if args.returns:
+        summary, _, _ = analyze_scenarios(
+            data, load_return_table(args.returns, kind=args.kind), n_paths=args.paths,
+            horizon=args.horizon, seed=args.seed, proxies=proxies, workers=args.workers
+        )
+        print(f"\n{args.paths:,} paths over {args.horizon} trading days:")
+        print(summary.to_string(index=False, float_format='{:,.2f}'.format))
+        summary_path = output_dir / f"Portfolio_Simulation_{date}.csv"
+        summary.to_csv(summary_path, index=False)
+        print(f"Simulation summary saved to: {summary_path}")
+
+    if args.scenarios:
+        pnl = stress_test(data.positions, load_scenarios(args.scenarios))
+        print("\nScenario P&L:")
+        print(pnl.to_string(float_format='{:,.2f}'.format))
+        scenario_path = output_dir / f"Portfolio_Scenarios_{date}.csv"
+        pnl.to_csv(scenario_path)
+        print(f"Scenario P&L saved to: {scenario_path}")
+    return 0
+
+
+def run_batch(parser, args):
+    check_report_arguments(parser, args)
+    from support_functions.batch import run_batch as run_portfolios, write_batch_summary
+    from support_functions.config import load_batch_config
+
+    try:
+        config = load_batch_config(args.config)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    summary, results = run_portfolios(config, args, workers=args.workers)
+    print(summary.to_string(index=False, float_format='{:,.2f}'.format))
+    for path in write_batch_summary(summary, config.output_dir):
+        print(f"Summary saved to: {path}")
+    failed = [r.name for r in results if r.error]
+    if failed:
+        print(f"Failed: {', '.join(failed)} (see batch.log in their output directories)", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+import tomllib
+import pandas as pd
+
+
+## Portfolio Configuration
+# Per-portfolio rules (which accounts the stock table leaves out, and
+# accounts whose funding history is replaced by manual flows) travel with the
+# loaded PortfolioData. A batch config file lists many portfolios with their
+# own data/output directories and rules, on top of shared defaults.
+
+DEFAULT_EXCLUDED_ACCOUNTS = ['ERNST & YOUNG 401(K)', 'Cash Management (Individual)', 'Health Savings Account']
+
+
+@dataclass
+class CashFlowOverride:
+    """
+    Manual funding flows replacing an account's history. current_value is a
+    fixed value, 'first' for its first position row only (e.g. the core cash
+    line), or None for the sum of its positions.
+    """
+    flows: list  # (Timestamp, amount), money in negative
+    current_value: object = None
+
+
+def default_cash_flow_overrides():
+    return {'Z06872898': CashFlowOverride(flows=[(pd.Timestamp('2022-07-26'), -100.0)], current_value='first')}
+
+
+@dataclass
+class PortfolioRules:
+    excluded_accounts: list = field(default_factory=lambda: list(DEFAULT_EXCLUDED_ACCOUNTS))
+    cash_flow_overrides: dict = field(default_factory=default_cash_flow_overrides)
+
+
+EMPTY_RULES = PortfolioRules(excluded_accounts=[], cash_flow_overrides={})
+
+
+@dataclass
+class PortfolioConfig:
+    name: str
+    data_dir: Path
+    output_dir: Path
+    rules: PortfolioRules = field(default_factory=PortfolioRules)
+
+
+@dataclass
+class BatchConfig:
+    portfolios: list
+    output_dir: Path           # consolidated summary
+    cache_dir: Path = None     # shared cache root; None keeps each portfolio's data/.cache
+    workers: int = 1
+
+
+def parse_rules(table, base=None):
+    """
+    PortfolioRules from a config table. Keys left out keep base's value;
+    cash_flow_overrides entries are added to (or replace) base's per account.
+    """
+    base = base or PortfolioRules()
+    overrides = dict(base.cash_flow_overrides)
+    for account_num, override in table.get('cash_flow_overrides', {}).items():
+        try:
+            flows = [(pd.Timestamp(date), float(amount)) for date, amount in override['flows']]
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"cash_flow_overrides.{account_num}: flows must be [date, amount] pairs ({e})")
+        current_value = override.get('current_value')
+        if current_value not in (None, 'first'):
+            current_value = float(current_value)
+        overrides[str(account_num)] = CashFlowOverride(
+            flows=sorted(flows, key=lambda flow: flow[0]), current_value=current_value
+        )
+    return PortfolioRules(
+        excluded_accounts=list(table.get('excluded_accounts', base.excluded_accounts)),
+        cash_flow_overrides=overrides
+    )
+
+
+def load_batch_config(path):
+    """
+    Read a batch config (TOML). Relative paths are resolved against the
+    config file's directory:
+
+        workers = 4
+        cache_dir = "cache"
+        output_dir = "summary"
+
+        [defaults]
+        excluded_accounts = ["ERNST & YOUNG 401(K)"]
+
+        [[portfolio]]
+        name = "smith"
+        data_dir = "smith/data"          # output_dir defaults to smith/output
+        [portfolio.cash_flow_overrides.X1234]
+        flows = [["2022-07-26", -100]]
+        current_value = "first"          # or a number; default: all positions
+
+    [defaults] is applied on top of the built-in rules and each portfolio on
+    top of [defaults]: excluded_accounts replaces the inherited list and
+    cash_flow_overrides are added per account. use_defaults = false in
+    either table starts from no exclusions and no overrides instead.
+    Returns: BatchConfig
+    """
+    path = Path(path)
+    with open(path, 'rb') as f:
+        config = tomllib.load(f)
+    root = path.resolve().parent
+
+    def resolve(value):
+        return (root / value).resolve()
+
+    defaults_table = config.get('defaults', {})
+    builtin = PortfolioRules() if defaults_table.get('use_defaults', True) else EMPTY_RULES
+    defaults = parse_rules(defaults_table, builtin)
+    portfolios = []
+    for i, table in enumerate(config.get('portfolio', [])):
+        if 'data_dir' not in table:
+            raise ValueError(f"{path}: portfolio #{i + 1} has no data_dir")
+        data_dir = resolve(table['data_dir'])
+        name = table.get('name', data_dir.parent.name)
+        base = defaults if table.get('use_defaults', True) else EMPTY_RULES
+        portfolios.append(PortfolioConfig(
+            name=name,
+            data_dir=data_dir,
+            output_dir=resolve(table['output_dir']) if 'output_dir' in table else data_dir.parent / 'output',
+            rules=parse_rules(table, base)
+        ))
+    if not portfolios:
+        raise ValueError(f"{path}: no [[portfolio]] entries")
+    names = [p.name for p in portfolios]
+    duplicates = sorted({n for n in names if names.count(n) > 1})
+    if duplicates:
+        raise ValueError(f"{path}: duplicate portfolio names {duplicates}")
+
+    return BatchConfig(
+        portfolios=portfolios,
+        output_dir=resolve(config.get('output_dir', 'output')),
+        cache_dir=resolve(config['cache_dir']) if 'cache_dir' in config else None,
+        workers=int(config.get('workers', 1))
+    )
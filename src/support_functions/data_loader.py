@@ -1,16 +1,108 @@
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import glob
+from itertools import repeat
 import os
 from pathlib import Path
+import re
+import threading
+import numpy as np
 import pandas as pd
 from dataclasses import dataclass, field
 
+from support_functions.cache import ParsedFileCache
+from support_functions.config import PortfolioRules
+from support_functions.instrumentation import count
+from support_functions.ingestion import TransactionStore, concat_frames, deduplicate_transactions
+from support_functions.metrics_cache import MetricsCache
+
+
+MMF_SYMBOLS = ['FZFXX', 'FDRXX', 'SPAXX', 'QUSBQ'] # QUSBQ is bank sweep
+CASH_DESCRIPTIONS = ['MONEY MARKET', 'CASH RESERVES', 'FDIC INSURED DEPOSIT']
+BOND_DESCRIPTIONS = ['TREAS BILL', 'TREASURY BILL']
+
+FUNDING_PATTERNS = [
+    'ELECTRONIC FUNDS TRANSFER', 'CHECK RECEIVED', 'DEPOSIT', 'WIRE',
+    'BILL PAY', 'CONTRIB', 'PARTIC CONTR'
+]
+
+# Action categories in precedence order: a row gets the first category any
+# of whose patterns appears in its Action (case-insensitive), else 'Other'.
+# Interest comes first so 'INTEREST EARNED ... DEPOSIT' is income, not funding.
+ACTION_CATEGORIES = {
+    'Interest': ['INTEREST'],
+    'Funding': FUNDING_PATTERNS,
+    'Buy': ['YOU BOUGHT'],
+    'Sell': ['YOU SOLD'],
+    'Reinvestment': ['REINVESTMENT'],
+    'Dividend': ['DIVIDEND'],
+    'Fee': ['FEE'],
+    'Transfer': ['TRANSFER', 'JOURNALED', 'EXCHANGE'],
+}
+OTHER_ACTION = 'Other'
+ACTION_CATEGORY_NAMES = list(ACTION_CATEGORIES) + [OTHER_ACTION]
+
+# One compiled matcher: ordered lookahead alternatives, each ending in an empty
+# named group, so match.lastgroup is the highest-precedence category present.
+ACTION_CLASSIFIER = re.compile(
+    '|'.join(
+        f"(?=.*?(?:{'|'.join(re.escape(p) for p in patterns)}))(?P<{name}>)"
+        for name, patterns in ACTION_CATEGORIES.items()
+    ),
+    re.IGNORECASE | re.DOTALL
+)
+
+# Action-category bits, one uint8 per transaction row in PortfolioData.action_flags
+ACTION_FLAGS = {name: 1 << i for i, name in enumerate(ACTION_CATEGORIES)}
+ACTION_FUNDING = ACTION_FLAGS['Funding']
+ACTION_BUY = ACTION_FLAGS['Buy']
+ACTION_SELL = ACTION_FLAGS['Sell']
+ACTION_REINVESTMENT = ACTION_FLAGS['Reinvestment']
+ACTION_DIVIDEND = ACTION_FLAGS['Dividend']
+ACTION_FEE = ACTION_FLAGS['Fee']
+ACTION_INTEREST = ACTION_FLAGS['Interest']
+ACTION_TRANSFER = ACTION_FLAGS['Transfer']
+
+EMPTY_ROWS = slice(0, 0)
+
+TRANSACTION_NUMERIC_COLS = [
+    'Amount ($)', 'Price ($)', 'Quantity',
+    'Commission ($)', 'Fees ($)', 'Accrued Interest ($)'
+]
+# Low-cardinality text columns stored as categoricals by the streaming loader
+CATEGORICAL_COLS = ['Account', 'Account Number', 'Action', 'Symbol', 'Description', 'Type', 'Asset Type']
+
+
 @dataclass
 class PortfolioData:
+    """
+    Positions and transaction history, indexed once at load time.
+
+    Both frames are stored grouped by account and then symbol (transactions
+    stay date-sorted within each group), so every account and every
+    (account, symbol) is one contiguous row slice. The *_rows dicts map keys
+    to those slices, and the lookup methods return slice views instead of
+    copying and masking the whole frame.
+
+    Tables derived from the data (e.g. grouped cash flows) are memoized with
+    cached(), and metrics_cache holds solved metrics across analysis levels.
+    Both are safe to share between request threads.
+    rules holds the portfolio's exclusions and cash-flow overrides.
+    """
     positions: pd.DataFrame
     transactions: pd.DataFrame
     latest_date: pd.Timestamp
+    metrics_cache: MetricsCache = field(default_factory=MetricsCache, repr=False)
+    rules: PortfolioRules = field(default_factory=PortfolioRules, repr=False)
     unique_accounts: pd.DataFrame = field(init=False)
+    account_rows: dict = field(init=False, default_factory=dict, repr=False)
+    entity_rows: dict = field(init=False, default_factory=dict, repr=False)
+    position_account_rows: dict = field(init=False, default_factory=dict, repr=False)
+    position_entity_rows: dict = field(init=False, default_factory=dict, repr=False)
+    action_flags: np.ndarray = field(init=False, default=None, repr=False)
+    derived: dict = field(init=False, default_factory=dict, repr=False)
+    _derived_locks: dict = field(init=False, default_factory=dict, repr=False, compare=False)
+    _locks_lock: threading.Lock = field(init=False, default_factory=threading.Lock, repr=False, compare=False)
 
     def __post_init__(self):
         if self.positions is not None:
@@ -19,48 +111,179 @@ class PortfolioData:
                 .drop_duplicates()
                 .reset_index(drop=True)
             )
+            self.positions = group_rows(self.positions)
+            self.position_account_rows, self.position_entity_rows = row_slices(self.positions)
+        if self.transactions is not None:
+            self.transactions = group_rows(self.transactions)
+            self.account_rows, self.entity_rows = row_slices(self.transactions)
+            self.transactions['Action'] = self.transactions['Action'].astype('category')
+            self.transactions['Action Category'] = classify_actions(self.transactions['Action'])
+            self.action_flags = action_flags(self.transactions['Action Category'])
+
+    def account_transactions(self, account_num):
+        return self.transactions.iloc[self.account_rows.get(account_num, EMPTY_ROWS)]
+
+    def stock_transactions(self, account_num, symbol):
+        return self.transactions.iloc[self.entity_rows.get((account_num, symbol), EMPTY_ROWS)]
+
+    def account_positions(self, account_num):
+        return self.positions.iloc[self.position_account_rows.get(account_num, EMPTY_ROWS)]
+
+    def stock_positions(self, account_num, symbol):
+        return self.positions.iloc[self.position_entity_rows.get((account_num, symbol), EMPTY_ROWS)]
+
+    def action_mask(self, flags, rows=slice(None)):
+        """Boolean mask of transaction rows (optionally within a slice) having any of flags."""
+        return (self.action_flags[rows] & flags) != 0
+
+    def cached(self, name, build):
+        """
+        Return build(self), computed once per PortfolioData and then reused.
+        Each name has its own lock, so concurrent first calls build it once
+        while other tables can be built at the same time.
+        """
+        if name in self.derived:
+            return self.derived[name]
+        with self._locks_lock:
+            lock = self._derived_locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self.derived:
+                self.derived[name] = build(self)
+        return self.derived[name]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_derived_locks'], state['_locks_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._derived_locks = {}
+        self._locks_lock = threading.Lock()
+
 
-def load_data(data_dir):
+def group_rows(df):
+    """
+    Stable reorder so rows of each account, and of each (account, symbol)
+    within it, are contiguous. Groups keep first-appearance order and rows
+    keep their relative order.
+    """
+    account_codes = pd.factorize(df['Account Number'])[0]
+    entity_codes = (
+        df.groupby(['Account Number', 'Symbol'], sort=False, dropna=False, observed=True)
+        .ngroup().to_numpy()
+    )
+    order = np.lexsort((entity_codes, account_codes))
+    return df.iloc[order].reset_index(drop=True)
+
+
+def row_slices(df):
+    """Row slices per account and per (account, symbol) of a frame ordered by group_rows."""
+    def to_slices(indices):
+        return {key: slice(int(rows[0]), int(rows[-1]) + 1) for key, rows in indices.items()}
+    account_rows = to_slices(df.groupby('Account Number', sort=False, observed=True).indices)
+    entity_rows = to_slices(df.groupby(['Account Number', 'Symbol'], sort=False, observed=True).indices)
+    return account_rows, entity_rows
+
+
+def classify_actions(actions):
+    """
+    Action Category of every row. The compiled classifier runs once per
+    distinct Action string and the result is broadcast by category codes.
+    Returns: pd.Categorical over ACTION_CATEGORY_NAMES.
+    """
+    actions = actions.astype('category')
+    labels = [_classify_action(str(a)) for a in actions.cat.categories] + [OTHER_ACTION]
+    label_codes = np.array([ACTION_CATEGORY_NAMES.index(label) for label in labels])
+    # Missing actions have code -1, which picks the trailing 'Other'
+    return pd.Categorical.from_codes(
+        label_codes[actions.cat.codes.to_numpy()], categories=ACTION_CATEGORY_NAMES
+    )
+
+
+def action_flags(action_categories):
+    """uint8 ACTION_* bitmask per row from an Action Category column; 'Other' is 0."""
+    category_flags = np.array([ACTION_FLAGS.get(name, 0) for name in ACTION_CATEGORY_NAMES], dtype=np.uint8)
+    return category_flags[pd.Categorical(action_categories, categories=ACTION_CATEGORY_NAMES).codes]
+
+
+def _classify_action(action):
+    match = ACTION_CLASSIFIER.match(action)
+    return match.lastgroup if match else OTHER_ACTION
+
+
+def load_data(data_dir, cache_dir=None, workers=1, chunksize=None, metrics_cache=None, rules=None):
     """
     Load the latest position file and all history files.
-    Returns: positions_df, history_df
+    If cache_dir is given, files parsed on a previous run are read back from
+    the on-disk cache, and history exports are ingested incrementally into a
+    deduplicated TransactionStore so only new or changed exports are parsed.
+    Solved metrics are also kept there (metrics.json) between runs.
+    workers > 1 parses history files on a process pool.
+    chunksize streams each history file in blocks of that many rows (see
+    load_history_file).
+    metrics_cache carries an existing MetricsCache over to the new data (e.g.
+    when reloading), instead of opening one from cache_dir.
+    rules: PortfolioRules for the portfolio (default: the built-in rules).
+    Returns: PortfolioData
     """
+    cache = ParsedFileCache(cache_dir) if cache_dir else None
+    store = TransactionStore(Path(cache_dir) / 'transactions') if cache_dir else None
+    if metrics_cache is None:
+        metrics_cache = MetricsCache(Path(cache_dir) / 'metrics.json') if cache_dir else MetricsCache()
+
     # 1. Load Positions
     pos_file, pos_date = get_latest_position_file(data_dir)
     print(f"Loading positions from: {pos_file} (Date: {pos_date.strftime('%Y-%m-%d')})")
-    positions_df = pd.read_csv(pos_file, index_col=False)
-
-    positions_df = clean_positions(positions_df)
+    positions_df = load_position_file(pos_file, cache=cache)
 
     # 2. Load History
-    transactions_df = load_transactions(data_dir)
-    
-    transactions_df = clean_transactions(transactions_df)
+    transactions_df = load_transactions(data_dir, store=store, workers=workers, chunksize=chunksize)
     
-    return PortfolioData(positions_df, transactions_df, pos_date)
+    count('position_rows', len(positions_df))
+    count('transaction_rows', len(transactions_df))
+    return PortfolioData(
+        positions_df, transactions_df, pos_date, metrics_cache=metrics_cache, rules=rules or PortfolioRules()
+    )
+
+
+def load_position_file(pos_file, cache=None):
+    if cache is not None:
+        positions_df = cache.load(pos_file, 'positions')
+        if positions_df is not None:
+            return positions_df
+
+    positions_df = pd.read_csv(pos_file, index_col=False)
+    positions_df = clean_positions(positions_df)
+
+    if cache is not None:
+        cache.store(pos_file, 'positions', positions_df)
+    return positions_df
 
 
 def get_latest_position_file(data_dir):
     """Find the latest Portfolio_Positions file based on the date in filename."""
+    latest_date, latest_file = get_position_files(data_dir)[-1]
+    return latest_file, latest_date
+
+
+def get_position_files(data_dir):
+    """
+    Every Portfolio_Positions file with the date in its filename.
+    Returns: list of (date, path), oldest first.
+    """
     files = glob.glob(os.path.join(data_dir, 'Portfolio_Positions_*.csv'))
-    if not files:
-        raise FileNotFoundError("No Portfolio_Positions files found.")
-    
-    latest_file = None
-    latest_date = None
-    
+    dated = []
     for f in files:
         basename = os.path.basename(f)
         date_part = basename.replace('Portfolio_Positions_', '').replace('.csv', '')
         try:
-            date_obj = datetime.strptime(date_part, '%b-%d-%Y')
-            if latest_date is None or date_obj > latest_date:
-                latest_date = date_obj
-                latest_file = f
+            dated.append((pd.to_datetime(datetime.strptime(date_part, '%b-%d-%Y')), f))
         except ValueError:
             continue
-    latest_date = pd.to_datetime(latest_date)
-    return latest_file, latest_date
+    if not dated:
+        raise FileNotFoundError("No Portfolio_Positions files found.")
+    return sorted(dated)
 
 def clean_positions(positions_df):
     # Clean Position Columns
@@ -71,12 +294,12 @@ def clean_positions(positions_df):
     ]
     for col in cols_to_clean:
         if col in positions_df.columns:
-            positions_df[col] = positions_df[col].apply(clean_currency)
+            positions_df[col] = clean_currency_series(positions_df[col])
     
     # Clean Quantity (remove match for formatting issues if any)
     if 'Quantity' in positions_df.columns:
          positions_df['Quantity'] = pd.to_numeric(positions_df['Quantity'], errors='coerce').fillna(0)
-    positions_df['Asset Type'] = positions_df.apply(categorize_asset, axis=1) 
+    positions_df['Asset Type'] = categorize_assets(positions_df)
     return positions_df
 
 
@@ -97,17 +320,116 @@ def clean_currency(x):
     return float(x)
 
 
-def load_transactions(data_dir, max_cols=14):
-    hist_files = glob.glob(os.path.join(data_dir, 'Accounts_History_*.csv'))
-    transactions_dfs = []
+def clean_currency_series(series):
+    """
+    Vectorized clean_currency over a whole column.
+    Returns a float64 Series with the same values clean_currency would produce.
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype('float64').fillna(0.0)
+
+    missing = series.isna() | series.isin(['--', ''])
+    # Plain numbers parse in C; only '$1,234', '(5.00)', '12%' etc. need string cleanup
+    values = pd.to_numeric(series, errors='coerce').astype('float64')
+    unparsed = values.isna() & ~missing
+    if unparsed.any():
+        text = series[unparsed].astype(str).str.replace(r'[$,%]', '', regex=True)
+        # Negative values represented as ($100)
+        parens = text.str.contains('(', regex=False) & text.str.contains(')', regex=False)
+        text = text.where(~parens, text.str.replace('(', '-', regex=False).str.replace(')', '', regex=False))
+        values[unparsed] = pd.to_numeric(text).astype('float64')
+    values[missing] = 0.0
+    return values
+
+
+def load_transactions(data_dir, max_cols=14, cache=None, store=None, workers=1, chunksize=None):
+    """
+    Load and clean every Accounts_History file, merged in date order.
+    Rows repeated across overlapping exports are kept only once.
+    With a TransactionStore, only exports not yet ingested are parsed and
+    the full history is read back from the store, after taking back the rows
+    of exports that were deleted or changed since they were ingested.
+    With workers > 1, files that need parsing are read and cleaned on a
+    process pool; results are merged in file order so the output does not
+    depend on the worker count.
+    """
+    hist_files = sorted(glob.glob(os.path.join(data_dir, 'Accounts_History_*.csv')))
     print(f"Found {len(hist_files)} history files.")
-    
-    for f in hist_files:
-        df = pd.read_csv(f, header=0, usecols=range(max_cols))
-        transactions_dfs.append(df)
 
-    transactions_df = pd.concat(transactions_dfs, ignore_index=True)
+    if store is not None:
+        for f in store.prune(hist_files):
+            print(f"Dropped transactions of removed or changed export: {f}")
+        to_parse = [f for f in hist_files if not store.is_ingested(f)]
+        for f, df in zip(to_parse, parse_history_files(to_parse, max_cols, workers, chunksize)):
+            count('history_files_parsed')
+            count('history_rows_parsed', len(df))
+            new_rows = store.ingest(f, df)
+            print(f"Ingested {len(new_rows)} new transactions from: {f}")
+        return store.load()
+
+    parsed = {}
+    if cache is not None:
+        for f in hist_files:
+            df = cache.load(f, 'history')
+            if df is not None:
+                parsed[f] = df
+    to_parse = [f for f in hist_files if f not in parsed]
+    for f, df in zip(to_parse, parse_history_files(to_parse, max_cols, workers, chunksize)):
+        count('history_files_parsed')
+        count('history_rows_parsed', len(df))
+        parsed[f] = df
+        if cache is not None:
+            cache.store(f, 'history', df)
+
+    transactions_df = deduplicate_transactions([parsed[f] for f in hist_files])
+    return transactions_df.sort_values('Run Date', kind='stable')
+
+
+def parse_history_files(hist_files, max_cols=14, workers=1, chunksize=None):
+    """Read and clean history files, in parallel when workers > 1. Order matches hist_files."""
+    if workers <= 1 or len(hist_files) <= 1:
+        return [load_history_file(f, max_cols, chunksize) for f in hist_files]
+    with ProcessPoolExecutor(max_workers=min(workers, len(hist_files))) as pool:
+        return list(pool.map(load_history_file, hist_files, repeat(max_cols), repeat(chunksize)))
+
+
+def load_history_file(hist_file, max_cols=14, chunksize=None):
+    """
+    Read and clean one history export.
+    With chunksize, the file is streamed in blocks of that many rows; each
+    block is cleaned and downcast before the next is read, so the raw
+    object-dtype text never exists for the whole file at once.
+    """
+    if chunksize is None:
+        df = pd.read_csv(hist_file, header=0, usecols=range(max_cols))
+        return clean_transactions(df)
+
+    reader = pd.read_csv(hist_file, header=0, usecols=range(max_cols), chunksize=chunksize)
+    chunks = [downcast_transactions(clean_transactions(chunk)) for chunk in reader]
+    return concat_frames(chunks).sort_values('Run Date', kind='stable')
+
+
+def downcast_transactions(transactions_df):
+    """
+    Shrink a cleaned history frame: low-cardinality text columns become
+    categoricals, and numeric columns become float32 when every value
+    converts back to the identical float64.
+    """
+    for col in CATEGORICAL_COLS:
+        if col in transactions_df.columns:
+            values = transactions_df[col]
+            # All-empty columns are read as float NaN; keep them text-typed
+            if not (pd.api.types.is_string_dtype(values) or values.dtype == 'object'):
+                values = values.astype(object)
+            transactions_df[col] = values.astype('category')
+    for col in TRANSACTION_NUMERIC_COLS:
+        if col in transactions_df.columns:
+            values = transactions_df[col].to_numpy(dtype=np.float64)
+            narrowed = values.astype(np.float32)
+            if np.array_equal(narrowed.astype(np.float64), values, equal_nan=True):
+                transactions_df[col] = narrowed
     return transactions_df
+
     
 def clean_transactions(transactions_df):
     for col in transactions_df.columns:
@@ -122,16 +444,12 @@ def clean_transactions(transactions_df):
     
 
     # Clean numeric columns
-    transactions_numeric_cols = [
-    'Amount ($)', 'Price ($)', 'Quantity', 
-        'Commission ($)', 'Fees ($)', 'Accrued Interest ($)'
-    ]
-    for col in transactions_numeric_cols:
+    for col in TRANSACTION_NUMERIC_COLS:
         if col in transactions_df.columns:
-            transactions_df[col] = transactions_df[col].apply(clean_currency)
-    transactions_df['Asset Type'] = transactions_df.apply(categorize_asset, axis=1) 
+            transactions_df[col] = clean_currency_series(transactions_df[col])
+    transactions_df['Asset Type'] = categorize_assets(transactions_df)
     # Sort by date
-    transactions_df = transactions_df.sort_values('Run Date')
+    transactions_df = transactions_df.sort_values('Run Date', kind='stable')
     return transactions_df
 
 def categorize_asset(row):
@@ -142,20 +460,46 @@ def categorize_asset(row):
     desc = str(row.get('Description', '')).upper()
     
     # Money Market Funds
-    mmf_symbols = ['FZFXX', 'FDRXX', 'SPAXX', 'QUSBQ'] # QUSBQ is bank sweep
-    if symbol in mmf_symbols or 'MONEY MARKET' in desc or 'CASH RESERVES' in desc or 'FDIC INSURED DEPOSIT' in desc:
+    if symbol in MMF_SYMBOLS or any(p in desc for p in CASH_DESCRIPTIONS):
         return 'Cash'
     
     # US Treasury Bills/Notes
     # CUSIPs usually 9 digits, often starting with 912...
     # Or description contains TREAS BILL
-    if (len(symbol) >= 8 and symbol.startswith('912')) or 'TREAS BILL' in desc or 'TREASURY BILL' in desc:
+    if (len(symbol) >= 8 and symbol.startswith('912')) or any(p in desc for p in BOND_DESCRIPTIONS):
         return 'Bond'
         
     # Default to Stock/ETF
     return 'Stock'
 
 
+def categorize_assets(df):
+    """
+    Vectorized categorize_asset over a whole DataFrame.
+    Rules are evaluated once per distinct (Symbol, Description) pair.
+    Returns: np.ndarray of 'Cash', 'Bond' or 'Stock' per row.
+    """
+    symbol_codes, symbols = pd.factorize(df['Symbol'].fillna('').astype(str))
+    if 'Description' in df.columns:
+        desc_codes, descs = pd.factorize(df['Description'].fillna('').astype(str))
+    else:
+        desc_codes, descs = np.zeros(len(df), dtype=np.intp), pd.Index([''])
+    pair_codes, pairs = pd.factorize(symbol_codes * len(descs) + desc_codes)
+
+    symbol = pd.Series(symbols[pairs // len(descs)])
+    desc = pd.Series(descs[pairs % len(descs)]).str.upper()
+    is_cash = (
+        symbol.isin(MMF_SYMBOLS) |
+        desc.str.contains('|'.join(CASH_DESCRIPTIONS), regex=True)
+    )
+    is_bond = (
+        ((symbol.str.len() >= 8) & symbol.str.startswith('912')) |
+        desc.str.contains('|'.join(BOND_DESCRIPTIONS), regex=True)
+    )
+    categories = np.select([is_cash, is_bond], ['Cash', 'Bond'], default='Stock')
+    return categories[pair_codes]
+
+
 if __name__ == "__main__":
     project_path= Path.cwd()
     data_dir = f'{project_path}/data'
@@ -1,18 +1,12 @@
-import datetime
 from pathlib import Path
-from dataclasses import dataclass, field
-from typing import List, Tuple
+import numpy as np
 import pandas as pd
 
-from support_functions.data_loader import load_data
-
-
-@dataclass
-class EntityCashFlows:
-    cash_flows: List[Tuple[datetime.datetime, float]] = field(default_factory=list)
-    total_invested: float = 0
-    current_value: float = 0
-    latest_date: datetime.datetime = None
+from support_functions.cash_flows import EntityCashFlows, to_days
+from support_functions.instrumentation import count
+from support_functions.data_loader import (
+    load_data, classify_actions, ACTION_FUNDING, EMPTY_ROWS
+)
 
 
 def filter_stock_transactions(transactions_df, account_num, symbol):
@@ -25,16 +19,20 @@ def filter_stock_transactions(transactions_df, account_num, symbol):
     
 def filter_account_transactions(transactions_df, account_num):
     df = transactions_df.copy()
-    funding_patterns = [
-        'ELECTRONIC FUNDS TRANSFER', 'CHECK RECEIVED', 'DEPOSIT', 'WIRE', 
-        'BILL PAY', 'CONTRIB', 'PARTIC CONTR'
-    ]
     mask_account = (df['Account Number'] == account_num)
-    mask_pattern = df['Action'].str.upper().apply(lambda x: any(p in str(x) for p in funding_patterns))
+    mask_pattern = funding_mask(df)
     
     df = df[mask_account & mask_pattern]
     return df
 
+
+def funding_mask(transactions_df):
+    """Boolean mask of rows whose Action is an external funding transfer."""
+    if 'Action Category' in transactions_df.columns:
+        return transactions_df['Action Category'] == 'Funding'
+    categories = classify_actions(transactions_df['Action'])
+    return pd.Series(categories == 'Funding', index=transactions_df.index)
+
 def filter_stock_positions(positions_df, account_num, symbol):
     df = positions_df.copy()
     df = df[
@@ -50,29 +48,18 @@ def filter_account_positions(positions_df, account_num):
 
 
 def build_stock_cash_flows(data, account_num, symbol):
-    transactions_df = data.transactions
-    positions_df = data.positions
     latest_date = data.latest_date
     
-    filtered_hist = filter_stock_transactions(transactions_df, account_num, symbol)
-    filtered_posi = filter_stock_positions(positions_df, account_num, symbol)
+    filtered_hist = data.stock_transactions(account_num, symbol)
+    filtered_posi = data.stock_positions(account_num, symbol)
 
-    cash_flows = []
-    total_invested = 0.0
+    flows = filtered_hist['Amount ($)'].to_numpy(dtype=float)
     current_val = filtered_posi['Current Value'].iloc[0]
-    for _, row in filtered_hist.iterrows():
-        date = row['Run Date']
-        amount = row['Amount ($)']
-        flow = amount
-        cash_flows.append((date, flow))
-        
-        # Track Invested Capital (Sum of negative flows)
-        if flow < 0:
-            total_invested += abs(flow)
-
-    cash_flows.append((latest_date, current_val))
+    # Track Invested Capital (Sum of negative flows)
+    total_invested = float(-flows[flows < 0].sum())
     return EntityCashFlows(
-        cash_flows=cash_flows, 
+        days=np.append(to_days(filtered_hist['Run Date']), to_days([latest_date])),
+        amounts=np.append(flows, current_val),
         total_invested=total_invested, 
         current_value=current_val,
         latest_date=latest_date
@@ -80,46 +67,151 @@ def build_stock_cash_flows(data, account_num, symbol):
     
     
 def build_account_cash_flows(data, account_num):
-    transactions_df = data.transactions
-    positions_df = data.positions
     latest_date = data.latest_date
     
-    if account_num == 'Z06872898':
-        cash_flows = []
-        filtered_posi = filter_account_positions(positions_df, account_num)
-        initial_date = pd.to_datetime('2022-07-26')
-        current_val = filtered_posi['Current Value'].iloc[0]
-        cash_flows.append((initial_date, -100))
-        cash_flows.append((latest_date, current_val))
-        return EntityCashFlows(
-            cash_flows=cash_flows, 
-            total_invested=100, 
-            current_value=current_val,
-            latest_date=latest_date
-        )
-    filtered_hist = filter_account_transactions(transactions_df, account_num)
-    filtered_posi = filter_account_positions(positions_df, account_num)
-
-    cash_flows = []
-    total_invested = 0.0
+    override = data.rules.cash_flow_overrides.get(account_num)
+    if override is not None:
+        return override_cash_flows(data, account_num, override)
+    rows = data.account_rows.get(account_num, EMPTY_ROWS)
+    filtered_hist = data.account_transactions(account_num)[data.action_mask(ACTION_FUNDING, rows)]
+    filtered_posi = data.account_positions(account_num)
+
+    flows = -filtered_hist['Amount ($)'].to_numpy(dtype=float)
     current_val = filtered_posi['Current Value'].sum()
-    for _, row in filtered_hist.iterrows():
-        date = row['Run Date']
-        amount = row['Amount ($)']
-        flow = -amount
-        cash_flows.append((date, flow))
-        
-        # Track Invested Capital (Sum of negative flows)
-        total_invested -= (flow)
-
-    cash_flows.append((latest_date, current_val))
+    # Track Invested Capital (Sum of negative flows)
+    total_invested = float(-flows.sum())
     return EntityCashFlows(
-        cash_flows=cash_flows, 
+        days=np.append(to_days(filtered_hist['Run Date']), to_days([latest_date])),
+        amounts=np.append(flows, current_val),
         total_invested=total_invested, 
         current_value=current_val,
         latest_date=latest_date
     )
-    
+
+
+def override_cash_flows(data, account_num, override):
+    """Account flows from a manual CashFlowOverride instead of its funding history."""
+    latest_date = data.latest_date
+    position_values = data.account_positions(account_num)['Current Value']
+    if override.current_value is None:
+        current_val = position_values.sum()
+    elif override.current_value == 'first':
+        current_val = position_values.iloc[0] if len(position_values) else 0.0
+    else:
+        current_val = override.current_value
+    dates = [date for date, _ in override.flows]
+    flows = np.array([amount for _, amount in override.flows], dtype=float)
+    return EntityCashFlows(
+        days=np.append(to_days(dates), to_days([latest_date])),
+        amounts=np.append(flows, current_val),
+        total_invested=float(-flows.sum()),
+        current_value=current_val,
+        latest_date=latest_date
+    )
+
+
+## Grouped Engine
+# PortfolioData keeps every account and (account, symbol) as a contiguous row
+# slice, so each entity's flows are array slices of columns converted once,
+# instead of copying and masking the full history per entity.
+
+def build_all_stock_cash_flows(data):
+    """
+    Build EntityCashFlows for every (account, symbol) pair held in positions.
+    Built once per PortfolioData; later calls return the same dict.
+    Returns: dict keyed by (account_num, symbol).
+    """
+    return data.cached('stock_cash_flows', _build_all_stock_cash_flows)
+
+
+def build_all_account_cash_flows(data):
+    """
+    Build EntityCashFlows for every account held in positions.
+    Built once per PortfolioData; later calls return the same dict.
+    Returns: dict keyed by account_num.
+    """
+    return data.cached('account_cash_flows', _build_all_account_cash_flows)
+
+
+def carry_over_cash_flows(old_data, new_data, accounts, symbols):
+    """
+    Memoize new_data's account and stock flows, reusing old_data's for every
+    entity not listed in accounts / symbols (those whose inputs changed, see
+    watch.affected_entities) and building only the others. Nothing is reused
+    across a change of valuation date or of the portfolio rules.
+    """
+    if old_data.latest_date != new_data.latest_date or old_data.rules != new_data.rules:
+        return
+    for name, build, changed, current in (
+        ('account_cash_flows', _build_all_account_cash_flows, set(accounts), new_data.position_account_rows),
+        ('stock_cash_flows', _build_all_stock_cash_flows, set(symbols), new_data.position_entity_rows),
+    ):
+        old = old_data.derived.get(name)
+        if old is None or name in new_data.derived:
+            continue
+        built = build(new_data, [key for key in current if key in changed or key not in old])
+        new_data.derived[name] = {key: built[key] if key in built else old[key] for key in current}
+
+
+def _build_all_stock_cash_flows(data, keys=None):
+    latest_date = data.latest_date
+    latest_day = to_days([latest_date])[0]
+    run_days = to_days(data.transactions['Run Date'])
+    amounts = data.transactions['Amount ($)'].to_numpy(dtype=float)
+    position_values = data.positions['Current Value'].to_numpy()
+
+    results = {}
+    for key in data.position_entity_rows if keys is None else keys:
+        position_rows = data.position_entity_rows[key]
+        rows = data.entity_rows.get(key, EMPTY_ROWS)
+        flows = amounts[rows]
+        total_invested = float(-flows[flows < 0].sum())
+        current_val = position_values[position_rows.start]
+
+        results[key] = EntityCashFlows(
+            days=np.append(run_days[rows], latest_day),
+            amounts=np.append(flows, current_val),
+            total_invested=total_invested,
+            current_value=current_val,
+            latest_date=latest_date
+        )
+    count('stock_entities_built', len(results))
+    return results
+
+
+def _build_all_account_cash_flows(data, keys=None):
+    latest_date = data.latest_date
+    latest_day = to_days([latest_date])[0]
+    run_days = to_days(data.transactions['Run Date'])
+    amounts = data.transactions['Amount ($)'].to_numpy(dtype=float)
+    position_values = data.positions['Current Value'].to_numpy()
+
+    results = {}
+    for account_num in data.position_account_rows if keys is None else keys:
+        position_rows = data.position_account_rows[account_num]
+        override = data.rules.cash_flow_overrides.get(account_num)
+        if override is not None:
+            results[account_num] = override_cash_flows(data, account_num, override)
+            continue
+        rows = data.account_rows.get(account_num, EMPTY_ROWS)
+        funding = data.action_mask(ACTION_FUNDING, rows)
+        # Account rows are grouped by symbol; restore date order across symbols
+        days = run_days[rows][funding]
+        order = np.argsort(days, kind='stable')
+        flows = -amounts[rows][funding][order]
+        total_invested = float(-flows.sum())
+        current_val = position_values[position_rows].sum()
+
+        results[account_num] = EntityCashFlows(
+            days=np.append(days[order], latest_day),
+            amounts=np.append(flows, current_val),
+            total_invested=total_invested,
+            current_value=current_val,
+            latest_date=latest_date
+        )
+    count('account_entities_built', len(results))
+    return results
+
 
 if __name__ == "__main__":
     project_path= Path.cwd()
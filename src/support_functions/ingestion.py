@@ -0,0 +1,246 @@
+import json
+import os
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from support_functions.cache import CACHE_VERSION, file_fingerprint, hash_file
+
+
+# Store layout version; bump with CACHE_VERSION or when the manifest changes.
+STORE_VERSION = f"{CACHE_VERSION}.2"
+
+FINGERPRINT_COLS = ['Run Date', 'Account Number', 'Action', 'Symbol', 'Quantity', 'Amount ($)']
+
+
+def transaction_fingerprints(transactions_df):
+    """
+    Stable uint64 fingerprint per row over date, account, action, symbol,
+    quantity and amount.
+
+    Identical rows inside one export (e.g. two equal buys on the same day) are
+    genuine, so the n-th repeat of a row is fingerprinted with its occurrence
+    number. The same row seen again in an overlapping export then gets the same
+    fingerprint and is dropped, while both genuine repeats are kept.
+    """
+    cols = [c for c in FINGERPRINT_COLS if c in transactions_df.columns]
+    # Hash numbers as float64 so downcast (float32) frames fingerprint the same
+    keyed_cols = transactions_df[cols].astype({
+        c: 'float64' for c in cols if pd.api.types.is_float_dtype(transactions_df[c])
+    })
+    row_hash = pd.util.hash_pandas_object(keyed_cols, index=False).to_numpy()
+    occurrence = pd.Series(row_hash).groupby(row_hash).cumcount().to_numpy()
+    keyed = pd.DataFrame({'row': row_hash, 'occurrence': occurrence})
+    return pd.util.hash_pandas_object(keyed, index=False).to_numpy()
+
+
+def deduplicate_transactions(transactions_dfs):
+    """
+    Concatenate cleaned history frames, dropping rows already seen in an
+    earlier frame. Adds a 'Fingerprint' column.
+    """
+    keyed_dfs = [df.assign(Fingerprint=transaction_fingerprints(df)) for df in transactions_dfs]
+    transactions_df = concat_frames(keyed_dfs, ignore_index=True)
+    return transactions_df.drop_duplicates('Fingerprint', keep='first').reset_index(drop=True)
+
+
+def concat_frames(dfs, **kwargs):
+    """
+    pd.concat that keeps categorical columns categorical: their categories
+    are unioned first, so frames cleaned in separate chunks or files combine
+    without falling back to object dtype.
+    """
+    dfs = list(dfs)
+    categorical_cols = {
+        col for df in dfs for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)
+    }
+    for col in categorical_cols:
+        values = [
+            df[col].cat.categories if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].dropna().unique()
+            for df in dfs if col in df.columns
+        ]
+        categories = pd.unique(np.concatenate([np.asarray(v, dtype=object) for v in values]))
+        dtype = pd.CategoricalDtype(pd.Index(categories))
+        dfs = [df.astype({col: dtype}) if col in df.columns else df for df in dfs]
+    return pd.concat(dfs, **kwargs)
+
+
+class TransactionStore:
+    """
+    Incremental on-disk transaction history.
+
+    Each ingest appends only rows whose fingerprint has not been seen as a new
+    date-sorted Parquet segment, and merges their fingerprints into a sorted
+    index. Ingesting an export costs time proportional to its rows, not to
+    the stored history. Segments are compacted once there are too many.
+
+    The manifest records every ingested export (path, size, mtime, hash), the
+    segment holding its new rows and the order it was ingested in, so prune()
+    can take back what came from exports that were since deleted or changed.
+    """
+
+    def __init__(self, store_dir, max_segments=16):
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.max_segments = max_segments
+        self.manifest_path = self.store_dir / 'manifest.json'
+        self.manifest = self._read_manifest()
+        self.fingerprints = self._read_fingerprints()
+
+    def is_ingested(self, path):
+        """True if this exact export (path, size, mtime or content hash) was already ingested."""
+        entry = self.manifest['files'].get(str(Path(path).resolve()))
+        if entry is None or not os.path.exists(path):
+            return False
+        current = file_fingerprint(path, content_hash=False)
+        if current['size'] != entry['size']:
+            return False
+        if current['mtime_ns'] == entry['mtime_ns']:
+            return True
+        return hash_file(path) == entry['sha256']
+
+    def ingest(self, path, transactions_df):
+        """
+        Append the rows of a cleaned export that are not in the store yet.
+        Returns: the newly added rows.
+        """
+        fingerprints = transaction_fingerprints(transactions_df)
+        is_new = ~self._contains(fingerprints)
+        new_rows = (
+            transactions_df[is_new]
+            .assign(Fingerprint=fingerprints[is_new])
+            .sort_values('Run Date', kind='stable')
+            .reset_index(drop=True)
+        )
+
+        segment_name = None
+        if len(new_rows):
+            segment_name = f"segment_{self.manifest['next_segment']:06d}.parquet"
+            new_rows.to_parquet(self.store_dir / segment_name, index=False)
+            self.manifest['segments'].append(segment_name)
+            self.manifest['next_segment'] += 1
+            self._merge_fingerprints(new_rows['Fingerprint'].to_numpy())
+
+        self.manifest['files'][str(Path(path).resolve())] = {
+            **file_fingerprint(path), 'segment': segment_name, 'order': self.manifest['next_order']
+        }
+        self.manifest['next_order'] += 1
+        self._commit()
+
+        if len(self.manifest['segments']) > self.max_segments:
+            self.compact()
+        return new_rows
+
+    def prune(self, paths):
+        """
+        Forget exports that are no longer among paths or have changed since
+        they were ingested, so the store matches the exports on disk.
+
+        Segments holding rows of such an export are dropped. Rows of a later
+        export that were skipped as already stored may have lived in those
+        segments, so every export ingested after the first stale one, and
+        every export whose segment was dropped, is forgotten too and will be
+        re-ingested; only its rows that are missing now are added back.
+        Returns: list of the stale export paths.
+        """
+        files = self.manifest['files']
+        current = {str(Path(p).resolve()) for p in paths}
+        stale = [key for key in files if key not in current or not self.is_ingested(key)]
+        if not stale:
+            return []
+
+        first_stale = min(files[key]['order'] for key in stale)
+        dropped = {files[key]['segment'] for key in stale} - {None}
+        forget = [
+            key for key, entry in files.items()
+            if key in stale or entry['order'] > first_stale or entry['segment'] in dropped
+        ]
+        for key in forget:
+            dropped.add(files.pop(key)['segment'])
+        dropped.discard(None)
+
+        self.manifest['segments'] = [name for name in self.manifest['segments'] if name not in dropped]
+        kept = [
+            pd.read_parquet(self.store_dir / name, columns=['Fingerprint'])['Fingerprint'].to_numpy(dtype=np.uint64)
+            for name in self.manifest['segments']
+        ]
+        self.fingerprints = np.sort(np.concatenate(kept)) if kept else np.array([], dtype=np.uint64)
+        self.manifest['next_segment'] += 1  # new fingerprint index name
+        self._commit()
+        for name in dropped:
+            (self.store_dir / name).unlink(missing_ok=True)
+        return stale
+
+    def load(self):
+        """
+        Full stored history, sorted by Run Date. Call prune() with the current
+        exports first (load_transactions does) so deleted or changed exports
+        are not reported.
+        """
+        segments = [pd.read_parquet(self.store_dir / name) for name in self.manifest['segments']]
+        if not segments:
+            return pd.DataFrame(columns=FINGERPRINT_COLS + ['Fingerprint'])
+        transactions_df = concat_frames(segments, ignore_index=True)
+        return transactions_df.sort_values('Run Date', kind='stable').reset_index(drop=True)
+
+    def compact(self):
+        """Rewrite all segments as one date-sorted segment."""
+        old_segments = list(self.manifest['segments'])
+        if len(old_segments) <= 1:
+            return
+        transactions_df = self.load()
+        segment_name = f"segment_{self.manifest['next_segment']:06d}.parquet"
+        transactions_df.to_parquet(self.store_dir / segment_name, index=False)
+        self.manifest['segments'] = [segment_name]
+        self.manifest['next_segment'] += 1
+        for entry in self.manifest['files'].values():
+            if entry['segment'] is not None:
+                entry['segment'] = segment_name
+        self._commit()
+        for name in old_segments:
+            (self.store_dir / name).unlink(missing_ok=True)
+
+    def _contains(self, fingerprints):
+        if len(self.fingerprints) == 0:
+            return np.zeros(len(fingerprints), dtype=bool)
+        idx = np.searchsorted(self.fingerprints, fingerprints)
+        idx[idx == len(self.fingerprints)] = 0
+        return self.fingerprints[idx] == fingerprints
+
+    def _merge_fingerprints(self, new_fingerprints):
+        new_fingerprints = np.sort(new_fingerprints)
+        positions = np.searchsorted(self.fingerprints, new_fingerprints)
+        self.fingerprints = np.insert(self.fingerprints, positions, new_fingerprints)
+
+    def _commit(self):
+        # Fingerprint index is written under a new name first; the manifest
+        # replace is the commit point, so a crash never leaves orphaned keys.
+        old_index = self.manifest.get('index')
+        index_name = f"fingerprints_{self.manifest['next_segment']:06d}.npy"
+        if index_name != old_index:
+            np.save(self.store_dir / index_name, self.fingerprints)
+            self.manifest['index'] = index_name
+
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': STORE_VERSION, **self.manifest}, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+        if old_index and old_index != index_name:
+            (self.store_dir / old_index).unlink(missing_ok=True)
+
+    def _read_manifest(self):
+        empty = {'files': {}, 'segments': [], 'next_segment': 1, 'next_order': 1, 'index': None}
+        if not self.manifest_path.exists():
+            return empty
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.pop('version', None) != STORE_VERSION:
+            return empty
+        return manifest
+
+    def _read_fingerprints(self):
+        index_name = self.manifest.get('index')
+        if not index_name:
+            return np.array([], dtype=np.uint64)
+        return np.load(self.store_dir / index_name)
@@ -0,0 +1,141 @@
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+import json
+from pathlib import Path
+import platform
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+## Run Instrumentation
+# One process-wide Trace collects stage timings, peak memory and counters.
+# Pipeline code records into it with stage() / count(); main writes it out
+# as JSON next to the report.
+
+class Trace:
+    """Stage timers, peak RSS per stage and named counters for one run."""
+
+    def __init__(self):
+        self.started = datetime.now()
+        self.stages = []
+        self.counters = Counter()
+        self._depth = 0
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time a block. Records wall and CPU seconds, the process peak RSS
+        after the block and how much the block raised it, and, while
+        tracemalloc is tracing, the peak Python allocation inside the block.
+        """
+        rss_before = peak_rss_mb()
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            record = {
+                'stage': name,
+                'depth': self._depth,
+                'wall_s': time.perf_counter() - wall_start,
+                'cpu_s': time.process_time() - cpu_start,
+                'peak_rss_mb': peak_rss_mb(),
+            }
+            if record['peak_rss_mb'] is not None:
+                record['peak_rss_growth_mb'] = record['peak_rss_mb'] - rss_before
+            if tracing:
+                record['traced_peak_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+            self.stages.append(record)
+
+    def count(self, name, n=1):
+        self.counters[name] += int(n)
+
+    def to_dict(self):
+        return {
+            'started': self.started.isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'total_wall_s': sum(s['wall_s'] for s in self.stages if s['depth'] == 0),
+            'peak_rss_mb': peak_rss_mb(),
+            'stages': self.stages,
+            'counters': dict(self.counters),
+        }
+
+    def save(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        print(f"Trace saved to: {path}")
+
+    def summary(self):
+        lines = [f"{'Stage':<24}{'Wall (s)':>10}{'CPU (s)':>10}{'Peak RSS (MB)':>15}"]
+        for s in self.stages:
+            rss = f"{s['peak_rss_mb']:.1f}" if s['peak_rss_mb'] is not None else 'n/a'
+            name = '  ' * s['depth'] + s['stage']
+            lines.append(f"{name:<24}{s['wall_s']:>10.3f}{s['cpu_s']:>10.3f}{rss:>15}")
+        lines += [f"{name}: {value:,}" for name, value in sorted(self.counters.items())]
+        return '\n'.join(lines)
+
+
+TRACE = Trace()
+
+
+def stage(name):
+    return TRACE.stage(name)
+
+
+def count(name, n=1):
+    TRACE.count(name, n)
+
+
+def reset_trace():
+    """Start a fresh process-wide trace (e.g. between runs in one process)."""
+    global TRACE
+    TRACE = Trace()
+    return TRACE
+
+
+def current_trace():
+    return TRACE
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / 2**20 if platform.system() == 'Darwin' else peak / 2**10
+
+
+@contextmanager
+def profiled(profile_path, top=25):
+    """
+    Run a block under cProfile and tracemalloc. The cProfile stats are
+    dumped to profile_path (open with pstats or snakeviz) and the top
+    functions by cumulative time are printed.
+    """
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        tracemalloc.stop()
+        Path(profile_path).parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(profile_path)
+        print(f"Profile saved to: {profile_path}")
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(top)
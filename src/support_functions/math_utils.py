@@ -1,71 +1,247 @@
 import numpy as np
-import pandas as pd
 from pathlib import Path
-from scipy import optimize
 
+from support_functions.cash_flows import EntityCashFlows, to_days
+from support_functions.instrumentation import count
+from support_functions.metrics_cache import entity_keys
 
 
 ## Math Core Layer
 
-def calculate_metrics(entity_cash_flows):
-    cash_flows = entity_cash_flows.cash_flows
-    total_invested = entity_cash_flows.total_invested
-    current_value = entity_cash_flows.current_value
-    latest_date = entity_cash_flows.latest_date
-
-    irr_val = xirr(cash_flows)
-    total_return_dollar = current_value - total_invested
-    roi = total_return_dollar / total_invested if total_invested != 0 else 0
-    weighted_average_holding_period = get_weighted_average_holding_period(cash_flows, latest_date)
-    
-    return {
-        'IRR': irr_val,
-        'Total Return ($)': total_return_dollar,
-        'ROI': roi,
-        'Holding Period (Y)': weighted_average_holding_period
-    }
+def calculate_metrics(entity_cash_flows, cache=None):
+    return calculate_metrics_batch([entity_cash_flows], cache=cache)[0]
+
+
+def calculate_metrics_batch(entities, cache=None):
+    """
+    Calculate metrics for many EntityCashFlows at once.
+    IRR and holding period are solved for all entities together. With a
+    MetricsCache, entities seen before are served from it and only the
+    remaining ones are solved.
+    Returns: list of metric dicts, in the order of entities.
+    """
+    rows, day_numbers, amounts, lengths = flatten_cash_flows(entities)
+    return metrics_from_arrays(
+        rows, day_numbers, amounts, lengths,
+        to_days([e.latest_date for e in entities]),
+        np.array([e.total_invested for e in entities], dtype=float),
+        np.array([e.current_value for e in entities], dtype=float),
+        cache=cache
+    )
+
+
+def metrics_from_arrays(rows, day_numbers, amounts, lengths, latest_days, total_invested, current_values, cache=None):
+    """
+    calculate_metrics_batch on already flattened flows: entity index, day
+    number and amount per flow (each entity's flows contiguous, lengths[i]
+    long), plus one latest day, total invested and current value per entity.
+    Returns: list of metric dicts, in entity order.
+    """
+    n = len(lengths)
+    results = [None] * n
+    if cache is not None:
+        keys = entity_keys(day_numbers, amounts, lengths, latest_days, total_invested, current_values)
+        results = [cache.get(key) for key in keys]
+
+    missing = np.array([i for i, metrics in enumerate(results) if metrics is None], dtype=np.int64)
+    count('metrics_cached', n - missing.size)
+    count('metrics_solved', missing.size)
+    if missing.size == 0:
+        return results
+
+    # Solve only the missing entities, renumbered 0..len(missing)-1
+    renumber = np.full(n, -1)
+    renumber[missing] = np.arange(len(missing))
+    sub_rows = renumber[rows]
+    keep = sub_rows >= 0
+    sub_rows, sub_days, sub_amounts = sub_rows[keep], day_numbers[keep], amounts[keep]
+    irr_vals = xirr_from_arrays(sub_rows, sub_days, sub_amounts, len(missing))
+    holding_periods = _holding_periods(sub_rows, sub_days, sub_amounts, latest_days[missing])
+
+    for i, irr_val, holding_period in zip(missing, irr_vals, holding_periods):
+        total_return_dollar = current_values[i] - total_invested[i]
+        roi = total_return_dollar / total_invested[i] if total_invested[i] != 0 else 0
+        metrics = {
+            'IRR': None if np.isnan(irr_val) else float(irr_val),
+            'Total Return ($)': float(total_return_dollar),
+            'ROI': float(roi),
+            'Holding Period (Y)': float(holding_period)
+        }
+        results[i] = metrics
+        if cache is not None:
+            cache.put(keys[i], metrics)
+    return results
+
 
 def get_weighted_average_holding_period(cash_flows, latest_date):
-    invested_cash_flows = [flow for flow in cash_flows if flow[1] < 0]
-    dates, amounts = zip(*invested_cash_flows)
-    amounts = pd.Series(amounts)
-    amounts_ratio = amounts/amounts.sum()
-    holding_period = pd.Series([(latest_date - d).days for d in dates])
-    return (amounts_ratio*holding_period).sum()/365.0
-    
+    return get_weighted_average_holding_period_batch([cash_flows], [latest_date])[0]
+
+
+def get_weighted_average_holding_period_batch(cash_flow_series, latest_dates):
+    """
+    Investment-weighted average age (in years) of the negative flows of each series.
+    Returns: np.ndarray, NaN where a series has no negative flows.
+    """
+    rows, day_numbers, amounts, _ = flatten_cash_flows(cash_flow_series)
+    return _holding_periods(rows, day_numbers, amounts, to_days(latest_dates))
+
+
+def _holding_periods(rows, day_numbers, amounts, latest_days):
+    n = len(latest_days)
+    invested = amounts < 0
+    rows = rows[invested]
+    weights = amounts[invested]
+    ages = latest_days[rows] - day_numbers[invested]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weighted_age = (
+            np.bincount(rows, weights=weights * ages, minlength=n) /
+            np.bincount(rows, weights=weights, minlength=n)
+        )
+    return weighted_age / 365.0
 
 
 def xirr(cash_flows):
     """
     Calculate Internal Rate of Return (XIRR).
-    cash_flows: List of (date, amount) tuples.
-    """
-    if not cash_flows or len(cash_flows) < 2:
-        return None
-        
-    dates, amounts = zip(*cash_flows)
-    
-    # Convert dates to days from start
-    min_date = min(dates)
-    days = [(d - min_date).days for d in dates]
-    
-    # Optimization function
-    def npv(r):
-        arr = np.array(days)
-        vals = np.array(amounts)
-        return np.sum(vals / (1 + r)**(arr / 365.0))
-        
-    # Check signs
-    pos = any(a > 0 for a in amounts)
-    neg = any(a < 0 for a in amounts)
-    if not (pos and neg):
-        return None # Can't calculate IRR without both inflows and outflows
-        
-    try:
-        res = optimize.newton(npv, 0.1, maxiter=50) # start guess at 10%
-        return res
-    except RuntimeError:
-        return None
+    cash_flows: EntityCashFlows or a list of (date, amount) tuples.
+    """
+    irr_val = xirr_batch([cash_flows])[0]
+    return None if np.isnan(irr_val) else float(irr_val)
+
+
+def xirr_batch(cash_flow_series, guess=0.1, tol=1.48e-8, maxiter=50):
+    """
+    Calculate XIRR for many cash-flow series at once.
+    cash_flow_series: List of cash_flows, each an EntityCashFlows or a list of (date, amount) tuples.
+    Returns: np.ndarray of rates, NaN where no IRR exists.
+    """
+    rows, day_numbers, amounts, _ = flatten_cash_flows(cash_flow_series)
+    return xirr_from_arrays(rows, day_numbers, amounts, len(cash_flow_series), guess, tol, maxiter)
+
+
+def xirr_from_arrays(series_idx, day_numbers, amounts, n_series, guess=0.1, tol=1.48e-8, maxiter=50):
+    """
+    XIRR for flat flow arrays: the series index, day number and amount of every flow.
+    Returns: np.ndarray of n_series rates, NaN where no IRR exists.
+
+    All series are padded into one (entities x flows) matrix and solved with
+    vectorized Newton steps using the analytic derivative. Series that fail to
+    converge fall back to a vectorized bracket scan plus bisection.
+    """
+    years, amounts = _pad_cash_flows(series_idx, day_numbers, amounts, n_series)
+    n = n_series
+    rates = np.full(n, np.nan)
+    if n == 0:
+        return rates
+
+    # Can't calculate IRR without both inflows and outflows
+    solvable = (amounts > 0).any(axis=1) & (amounts < 0).any(axis=1)
+
+    converged = np.zeros(n, dtype=bool)
+    guesses = np.full(n, guess)
+    active = np.flatnonzero(solvable)
+    with np.errstate(all='ignore'):
+        for _ in range(maxiter):
+            if active.size == 0:
+                break
+            count('xirr_newton_steps')
+            count('xirr_series_iterations', active.size)
+            r = guesses[active]
+            step = _npv(r, years[active], amounts[active]) / _npv_derivative(r, years[active], amounts[active])
+            r_new = r - step
+            valid = np.isfinite(r_new) & (r_new > -1)
+            done = valid & (np.abs(step) < tol)
+            guesses[active] = r_new
+            converged[active[done]] = True
+            active = active[valid & ~done]
+
+    rates[converged] = guesses[converged]
+
+    fallback = np.flatnonzero(solvable & ~converged)
+    if fallback.size:
+        rates[fallback] = _bisect_irr(years[fallback], amounts[fallback])
+    count('xirr_series', n)
+    count('xirr_fallbacks', fallback.size)
+    count('xirr_failures', np.isnan(rates).sum())
+    return rates
+
+
+def _npv(rates, years, amounts):
+    return np.sum(amounts * (1.0 + rates[:, None]) ** -years, axis=1)
+
+
+def _npv_derivative(rates, years, amounts):
+    return np.sum(-years * amounts * (1.0 + rates[:, None]) ** (-years - 1.0), axis=1)
+
+
+def _bisect_irr(years, amounts, iterations=100):
+    """
+    Scan a grid of rates for the first NPV sign change of each series,
+    then bisect every bracket together. NaN where no bracket exists.
+    """
+    grid = np.logspace(-4, 4, 161) - 1.0  # rates from -99.99% to 999,900%
+    n = len(years)
+    with np.errstate(all='ignore'):
+        npv_grid = np.column_stack([_npv(np.full(n, r), years, amounts) for r in grid])
+        signs = np.sign(npv_grid)
+        crossing = (signs[:, :-1] * signs[:, 1:]) <= 0
+        has_bracket = crossing.any(axis=1)
+        first = crossing.argmax(axis=1)
+
+        lo = grid[first]
+        hi = grid[first + 1]
+        f_lo = npv_grid[np.arange(n), first]
+        for _ in range(iterations):
+            mid = (lo + hi) / 2
+            f_mid = _npv(mid, years, amounts)
+            same_side = np.sign(f_mid) == np.sign(f_lo)
+            lo = np.where(same_side, mid, lo)
+            f_lo = np.where(same_side, f_mid, f_lo)
+            hi = np.where(same_side, hi, mid)
+    return np.where(has_bracket, (lo + hi) / 2, np.nan)
+
+
+def flatten_cash_flows(cash_flow_series):
+    """
+    Flatten a ragged list of cash-flow series, each an EntityCashFlows or a
+    list of (date, amount) tuples.
+    Returns: (series index, day number, amount) per flow, and series lengths.
+    """
+    series = [
+        cf if isinstance(cf, EntityCashFlows) else EntityCashFlows.from_tuples(cf)
+        for cf in cash_flow_series
+    ]
+    lengths = np.array([len(cf) for cf in series], dtype=np.int64)
+    if lengths.sum() == 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([], dtype=float), lengths
+    rows = np.repeat(np.arange(len(series)), lengths)
+    day_numbers = np.concatenate([cf.days for cf in series]).astype(np.int64)
+    amounts = np.concatenate([cf.amounts for cf in series])
+    return rows, day_numbers, amounts, lengths
+
+
+def _pad_cash_flows(rows, day_numbers, amounts, n):
+    """
+    Pad flat flow arrays into (entities x flows) matrices of years since each
+    series' first flow and amounts. Padding is zero-valued.
+    """
+    order = np.argsort(rows, kind='stable')
+    rows, day_numbers, amounts = rows[order], day_numbers[order], amounts[order]
+    lengths = np.bincount(rows, minlength=n)
+    width = int(lengths.max()) if n else 0
+
+    cols = np.arange(len(rows)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    start = np.full(n, np.iinfo(np.int64).max)
+    np.minimum.at(start, rows, day_numbers)
+
+    years = np.zeros((n, width))
+    padded_amounts = np.zeros((n, width))
+    years[rows, cols] = (day_numbers - start[rows]) / 365.0
+    padded_amounts[rows, cols] = amounts
+    return years, padded_amounts
+
 
 if __name__ == "__main__":
     from support_functions.data_loader import load_data
@@ -0,0 +1,118 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+from pathlib import Path
+import threading
+import numpy as np
+
+
+# Bump when metric definitions or the solver change so stored results are not reused.
+METRICS_CACHE_VERSION = 1
+
+
+def entity_keys(day_numbers, amounts, lengths, latest_days, total_invested, current_values):
+    """
+    Content hash per entity over its cash flows (day number and amount of
+    each flow, in order), latest date, total invested and current value.
+    Flow arrays are flat with each entity's flows contiguous, lengths[i] long.
+    Returns: list of hex keys, in entity order.
+    """
+    day_numbers = np.ascontiguousarray(day_numbers, dtype=np.int64)
+    amounts = np.ascontiguousarray(amounts, dtype=np.float64)
+    header = np.column_stack([
+        np.asarray(latest_days, dtype=np.int64).astype(np.float64),
+        np.asarray(total_invested, dtype=np.float64),
+        np.asarray(current_values, dtype=np.float64),
+    ])
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+
+    keys = []
+    for i, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(METRICS_CACHE_VERSION.to_bytes(4, 'little'))
+        digest.update(header[i].tobytes())
+        digest.update(day_numbers[start:end].tobytes())
+        digest.update(amounts[start:end].tobytes())
+        keys.append(digest.hexdigest())
+    return keys
+
+
+class MetricsCache:
+    """
+    LRU cache of per-entity metrics keyed by entity_keys().
+
+    Within a run, the same accounts analysed at several levels are solved
+    once. With a path, entries are read from and saved to a JSON file, so
+    entities whose flows did not change since the last run skip the XIRR
+    solve entirely.
+
+    All methods hold a lock, so one cache can serve concurrent requests.
+    """
+
+    def __init__(self, path=None, max_entries=100_000):
+        self.path = Path(path) if path else None
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        if self.path is not None and self.path.exists():
+            self._read()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Copy of the cached metrics for key, or None on a miss."""
+        with self._lock:
+            metrics = self.entries.get(key)
+            if metrics is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return dict(metrics)
+
+    def put(self, key, metrics):
+        with self._lock:
+            self.entries[key] = dict(metrics)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self._dirty = True
+
+    def save(self):
+        """Write entries to the backing file, if any and if anything changed."""
+        if self.path is None or not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with self._lock:
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': METRICS_CACHE_VERSION, 'entries': self.entries}, f)
+            self._dirty = False
+        os.replace(tmp_path, self.path)
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        if stored.get('version') != METRICS_CACHE_VERSION:
+            return
+        # Most recently used entries were written last
+        for key, metrics in list(stored.get('entries', {}).items())[-self.max_entries:]:
+            self.entries[key] = metrics
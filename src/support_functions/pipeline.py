@@ -0,0 +1,169 @@
+from support_functions.analysis import (
+    analyze_account_performance,
+    analyze_group_performance,
+    analyze_stock_performance,
+    analyze_total_performance
+)
+from support_functions.as_of import as_of_metrics, load_position_history, rolling_metrics
+from support_functions.cache import ParsedFileCache
+from support_functions.data_loader import load_data
+from support_functions.instrumentation import current_trace, reset_trace, stage
+from support_functions.pme import analyze_benchmark_performance, load_benchmark
+from support_functions.report_generator import (
+    TABLE_FORMATS, generate_markdown_report, render_report, report_sections, write_table
+)
+from support_functions.tax_lots import analyze_tax_lots
+from support_functions.valuation import analyze_time_series, build_daily_valuation, load_price_table
+from support_functions.watch import watch_portfolio
+
+
+## Report Pipeline
+# The full load -> analyse -> render run behind `fidelity-portfolio report`
+# (and src/main.py). Imported by the CLI only when a report is actually
+# computed, so pandas and friends stay off the fast paths.
+
+def watch_reports(args, project_path):
+    """Report once, then regenerate quietly whenever data/ changes (--watch)."""
+    data_dir = f'{project_path}/data'
+    output_dir = project_path / 'output'
+
+    def report(data, changes):
+        quiet = changes is not None
+        return report_portfolio(data, args, output_dir, quiet=quiet) + [write_trace(data, output_dir, quiet=quiet)]
+
+    return watch_portfolio(
+        data_dir, report, cache_dir=f'{data_dir}/.cache', interval=args.interval,
+        workers=args.workers, chunksize=args.chunksize
+    )
+
+
+def run_analysis(args, project_path):
+    """Load data/ and write every report output. Returns: list of files written."""
+    reset_trace()
+    data_dir = f'{project_path}/data'
+    cache_dir = f'{data_dir}/.cache'
+    with stage('load'):
+        data = load_data(data_dir, cache_dir=cache_dir, workers=args.workers, chunksize=args.chunksize)
+    outputs = report_portfolio(data, args, project_path / 'output')
+    if args.as_of or args.rolling:
+        outputs += report_history(data, args, data_dir, cache_dir, project_path / 'output')
+    outputs.append(write_trace(data, project_path / 'output'))
+    return outputs
+
+
+def report_history(data, args, data_dir, cache_dir, output_dir):
+    """
+    Print metrics as of args.as_of and write the rolling series for args.rolling.
+    Returns: list of files written.
+    """
+    outputs = []
+    if args.as_of:
+        with stage('as_of'):
+            history = load_position_history(data_dir, cache=ParsedFileCache(cache_dir))
+            as_of_res = as_of_metrics(data, [args.as_of], history.values)
+        valued_on = as_of_res['Valued On'].iloc[0].strftime('%Y-%m-%d')
+        print(f"\nPerformance as of {args.as_of} (positions snapshot of {valued_on}):")
+        print(as_of_res.drop(columns=['Date', 'Valued On']).to_string(index=False))
+
+    if args.rolling:
+        with stage('rolling'):
+            nav, _ = build_daily_valuation(data, load_price_table(args.prices) if args.prices else None)
+            rolling_res = rolling_metrics(data, nav, freq=args.rolling)
+        for fmt in table_formats(args):
+            rolling_path = write_table(
+                rolling_res, output_dir / f"Portfolio_Rolling_{data.latest_date.strftime('%Y-%m-%d')}.{fmt}", fmt
+            )
+            print(f"Rolling metrics saved to: {rolling_path}")
+            outputs.append(rolling_path)
+    return outputs
+
+
+def write_trace(data, output_dir, quiet=False):
+    """Print (unless quiet) and save the stage timings, memory and counters. Returns: the trace file."""
+    trace = current_trace()
+    if not quiet:
+        print(trace.summary())
+    trace_path = output_dir / f"Portfolio_Trace_{data.latest_date.strftime('%Y-%m-%d')}.json"
+    trace.save(trace_path)
+    return trace_path
+
+
+def table_formats(args):
+    """Formats for standalone data tables: the typed formats among args.format, else CSV."""
+    return [fmt for fmt in args.format if fmt in TABLE_FORMATS] or ['csv']
+
+
+def report_portfolio(data, args, output_dir, quiet=False):
+    """
+    Run every analysis on loaded data and write the report and NAV to output_dir.
+    The trace is left to the caller (write_trace), so later stages are included.
+    Returns: list of files written.
+    """
+    trace = current_trace()
+    outputs = []
+    print("\n" + "="*50)
+    print("FIDELITY PORTFOLIO ANALYSIS")
+    print("="*50)
+    
+    # 1. Total Portfolio Performance
+    print("Calculating metrics...")
+    with stage('total'):
+        total_res = analyze_total_performance(data)
+    
+    # 2. Calculate performance for all positions
+    with stage('account'):
+        account_res = analyze_account_performance(data)
+    
+    # 3. Stock Level
+    with stage('stock'):
+        stock_res = analyze_stock_performance(data)
+
+    # 4. Tax Lots
+    with stage('tax_lots'):
+        lot_res = analyze_tax_lots(data, method=args.lot_method)
+
+    # 5. Groups (taxable vs retirement)
+    with stage('groups'):
+        group_res = analyze_group_performance(data, grouping='Tax Treatment')
+
+    # 6. Benchmark (public market equivalent)
+    benchmark_res = None
+    if args.benchmark:
+        with stage('benchmark'):
+            levels = load_benchmark(args.benchmark_prices or args.prices, args.benchmark)
+            benchmark_res = analyze_benchmark_performance(data, levels)
+
+    data.metrics_cache.save()
+    print(f"Metrics: {trace.counters['metrics_cached']} cached, {trace.counters['metrics_solved']} solved")
+
+    # Generate Report
+    output_dir.mkdir(exist_ok=True)
+    with stage('report'):
+        sections = report_sections(
+            total_res, account_res, stock_res, lot_df=lot_res, group_df=group_res, benchmark_df=benchmark_res
+        )
+        for fmt in args.format:
+            for report_path in render_report(sections, data.latest_date, output_dir, fmt):
+                print(f"Report saved to: {report_path}")
+                outputs.append(report_path)
+    
+    if not quiet:
+        report_str = generate_markdown_report(
+            total_res, account_res, stock_res, data.latest_date, lot_df=lot_res, group_df=group_res,
+            benchmark_df=benchmark_res
+        )
+        print("\n" + "="*50)
+        print(report_str)
+        print("="*50 + "\n")
+
+    # Daily NAV and time-weighted return
+    if args.prices:
+        with stage('nav'):
+            nav_res = analyze_time_series(data, load_price_table(args.prices))
+        total_twr = nav_res.loc[nav_res['Account Number'] == 'Total', 'TWR'].iloc[-1]
+        print(f"Time-weighted return: {total_twr:.2%}")
+        for fmt in table_formats(args):
+            nav_path = write_table(nav_res, output_dir / f"Portfolio_NAV_{data.latest_date.strftime('%Y-%m-%d')}.{fmt}", fmt)
+            print(f"Daily NAV saved to: {nav_path}")
+            outputs.append(nav_path)
+    return outputs
@@ -0,0 +1,164 @@
+import argparse
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from support_functions.analysis import report_stock_positions, to_numeric_columns
+from support_functions.cash_flows import EntityCashFlows, concat_cash_flows, to_days
+from support_functions.data_loader import load_data
+from support_functions.flow_builders import build_all_account_cash_flows, build_all_stock_cash_flows
+from support_functions.math_utils import calculate_metrics_batch, flatten_cash_flows, xirr_from_arrays
+from support_functions.valuation import load_price_table
+
+
+## Public Market Equivalent
+# Each entity's flows are replayed into a benchmark index: every contribution
+# buys index units at that day's level and every withdrawal sells them. The
+# benchmark levels for all flows of all entities come from one searchsorted
+# over the sorted index dates, and the PME and direct-alpha IRRs are solved
+# in one batch with the same solver as the absolute IRRs.
+
+PME_COLS = ['IRR', 'PME IRR', 'Excess IRR', 'KS-PME', 'Direct Alpha', 'PME Value']
+
+
+def load_benchmark(price_file, symbol=None):
+    """
+    Benchmark levels from a price table in the load_price_table formats.
+    symbol picks a column; it may be omitted if the table has only one.
+    Returns: Series of levels indexed by Date, gaps dropped.
+    """
+    table = load_price_table(price_file)
+    if symbol is None:
+        if table.shape[1] != 1:
+            raise ValueError(f"{price_file} has several symbols; choose one of {list(table.columns)}")
+        symbol = table.columns[0]
+    if symbol not in table.columns:
+        raise ValueError(f"No prices for benchmark {symbol!r} in {price_file}")
+    levels = table[symbol].dropna()
+    return levels[levels > 0].rename(symbol)
+
+
+def benchmark_levels(levels, day_numbers):
+    """
+    Level of the benchmark on each day number (days since 1970-01-01): the
+    last close on or before it, NaN before the first close.
+    """
+    index_days = to_days(levels.index)
+    index_levels = levels.to_numpy(dtype=float)
+    pos = np.searchsorted(index_days, day_numbers, side='right') - 1
+    return np.where(pos >= 0, index_levels[np.maximum(pos, 0)], np.nan)
+
+
+def pme_from_arrays(rows, day_numbers, amounts, lengths, levels):
+    """
+    PME measures for flat flow arrays (entity index, day number and amount
+    per flow, each entity's flows contiguous and ending with its current
+    value, as EntityCashFlows are built).
+
+    PME IRR: Long-Nickels IRR, with the current value replaced by the value
+    of the index units the flows bought and sold.
+    KS-PME: index-grown withdrawals plus current value over index-grown
+    contributions (Kaplan-Schoar); above 1 means the entity beat the index.
+    Direct Alpha: IRR of the flows carried to the valuation date at the
+    index return (Gredil, Griffiths and Stucke).
+    Entities with a flow before the first benchmark close get NaN.
+    Returns: dict of np.ndarray per measure, in entity order.
+    """
+    n = len(lengths)
+    ends = np.cumsum(lengths) - 1
+    terminal = np.zeros(len(rows), dtype=bool)
+    terminal[ends[lengths > 0]] = True
+
+    level = benchmark_levels(levels, day_numbers)
+    covered = np.ones(n, dtype=bool)
+    covered[rows[np.isnan(level)]] = False
+    with np.errstate(all='ignore'):
+        growth = level[ends][rows] / level  # index growth from each flow to the valuation date
+    growth[~covered[rows]] = 0.0
+    grown = amounts * growth
+
+    interim = ~terminal
+    pme_value = np.bincount(rows[interim], weights=-grown[interim], minlength=n)
+    pme_amounts = amounts.copy()
+    pme_amounts[ends] = pme_value
+    contributions = np.bincount(rows[interim & (amounts < 0)], weights=-grown[interim & (amounts < 0)], minlength=n)
+    withdrawals = np.bincount(rows[interim & (amounts > 0)], weights=grown[interim & (amounts > 0)], minlength=n)
+
+    pme_irr = xirr_from_arrays(rows, day_numbers, np.where(covered[rows], pme_amounts, 0.0), n)
+    direct_alpha = xirr_from_arrays(rows, day_numbers, grown, n)
+    with np.errstate(all='ignore'):
+        ks_pme = np.where(contributions > 0, (withdrawals + amounts[ends]) / contributions, np.nan)
+    for values in (pme_irr, direct_alpha, ks_pme, pme_value):
+        values[~covered] = np.nan
+    return {'PME IRR': pme_irr, 'KS-PME': ks_pme, 'Direct Alpha': direct_alpha, 'PME Value': pme_value}
+
+
+def combine_cash_flows(children, latest_date):
+    """
+    Children rolled up with one current-value flow at latest_date. Unlike
+    merge_cash_flows, which keeps each child's own current-value flow, this
+    keeps the single terminal flow pme_from_arrays expects.
+    """
+    funding = [EntityCashFlows(c.days[:-1], c.amounts[:-1]) for c in children]
+    combined = EntityCashFlows(
+        *concat_cash_flows(funding),
+        total_invested=sum(c.total_invested for c in children),
+        current_value=sum(c.current_value for c in children),
+        latest_date=latest_date
+    )
+    combined.append(latest_date, combined.current_value)
+    return combined
+
+
+def pme_batch(entities, levels, cache=None):
+    """
+    Absolute and benchmark-relative metrics for many EntityCashFlows at once.
+    Returns: DataFrame with PME_COLS, one row per entity.
+    """
+    rows, day_numbers, amounts, lengths = flatten_cash_flows(entities)
+    measures = pme_from_arrays(rows, day_numbers, amounts, lengths, levels)
+    irr = [m['IRR'] for m in calculate_metrics_batch(entities, cache=cache)]
+    results = pd.DataFrame({'IRR': [np.nan if r is None else r for r in irr], **measures})
+    results['Excess IRR'] = results['IRR'] - results['PME IRR']
+    return results[PME_COLS]
+
+
+def analyze_benchmark_performance(data, levels):
+    """
+    Total, every account and every reported stock against the benchmark.
+    Returns: DataFrame in the layout of the other analyses, with PME_COLS.
+    """
+    account_flows = build_all_account_cash_flows(data)
+    stock_flows = build_all_stock_cash_flows(data)
+    accounts = data.unique_accounts
+    stocks = report_stock_positions(data)
+    stock_keys = list(zip(stocks['Account Number'], stocks['Symbol']))
+
+    account_entities = [account_flows[num] for num in accounts['Account Number']]
+    entities = [combine_cash_flows(account_entities, data.latest_date)]
+    entities += account_entities
+    entities += [stock_flows[key] for key in stock_keys]
+
+    labels = pd.DataFrame({
+        'Account Name': [None] + list(accounts['Account Name']) + list(stocks['Account Name']),
+        'Account Number': [None] + list(accounts['Account Number']) + [num for num, _ in stock_keys],
+        'Symbol': [None] * (1 + len(accounts)) + [symbol for _, symbol in stock_keys],
+        'Asset Type': ['All'] + ['Account'] * len(accounts) + ['Stock'] * len(stock_keys),
+        'Benchmark': levels.name,
+        'Current Value': [e.current_value for e in entities],
+        'Total Invested': [e.total_invested for e in entities],
+    }, dtype=object)
+    results = pd.concat([labels, pme_batch(entities, levels, cache=data.metrics_cache)], axis=1)
+    return to_numeric_columns(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the portfolio against a benchmark index")
+    parser.add_argument('prices', help="Benchmark price table (CSV or Parquet)")
+    parser.add_argument('--symbol', default=None, help="Benchmark column in the table (default: its only column)")
+    args = parser.parse_args()
+
+    project_path= Path.cwd()
+    data = load_data(f'{project_path}/data')
+    levels = load_benchmark(args.prices, args.symbol)
+    print(analyze_benchmark_performance(data, levels).to_string(index=False))
@@ -0,0 +1,63 @@
+import glob
+import json
+import os
+from pathlib import Path
+
+
+## Cached Reports
+# Standard library only, so the CLI can decide whether the last report is
+# still current before importing pandas. A manifest in output/ records the
+# input snapshot, the options and the files of the last full report run.
+
+# Bump when report contents change so older manifests are not served.
+REPORT_CACHE_VERSION = 3
+REPORT_MANIFEST = '.report_manifest.json'
+INPUT_PATTERNS = ['Portfolio_Positions_*.csv', 'Accounts_History_*.csv']
+
+
+def input_snapshot(data_dir):
+    """(size, mtime) of every export in data_dir, keyed by path."""
+    snapshot = {}
+    for pattern in INPUT_PATTERNS:
+        for path in glob.glob(os.path.join(data_dir, pattern)):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:  # removed between glob and stat
+                continue
+            snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+def cached_report(output_dir, snapshot, options):
+    """
+    Output paths of the last report if it was built from the same input
+    snapshot and options and all of its files still exist, else None.
+    """
+    try:
+        with open(Path(output_dir) / REPORT_MANIFEST) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    current = _manifest_entry(snapshot, options, [])
+    if any(manifest.get(key) != current[key] for key in ('version', 'inputs', 'options')):
+        return None
+    outputs = manifest.get('outputs', [])
+    if not outputs or not all(os.path.exists(path) for path in outputs):
+        return None
+    return outputs
+
+
+def save_report_manifest(output_dir, snapshot, options, outputs):
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    with open(Path(output_dir) / REPORT_MANIFEST, 'w') as f:
+        json.dump(_manifest_entry(snapshot, options, outputs), f, indent=2)
+
+
+def _manifest_entry(snapshot, options, outputs):
+    # Round-trip through JSON so tuples compare equal to stored lists
+    return json.loads(json.dumps({
+        'version': REPORT_CACHE_VERSION,
+        'inputs': dict(sorted(snapshot.items())),
+        'options': options,
+        'outputs': [str(path) for path in outputs],
+    }))
@@ -1,39 +1,148 @@
 from datetime import datetime
-import pandas as pd
+from html import escape
+import io
+import json
+from pathlib import Path
 
-def generate_markdown_report(total_df, account_df, stock_df, report_date, output_dir=None):
+
+## Report Rendering
+# The analyses return numeric frames. Values are formatted here, only when a
+# human-readable format is written, and every renderer writes section by
+# section to its output file instead of building the whole report in memory.
+
+REPORT_FORMATS = ['md', 'csv', 'parquet', 'json', 'html']
+# Formats that store each table as typed columns (also used for NAV / rolling tables)
+TABLE_FORMATS = ['csv', 'parquet', 'json']
+
+PERCENT_COLS = [
+    'Total Return (%)', 'IRR', 'Investment Ratio', 'ROI', 'Daily Return', 'TWR',
+    'PME IRR', 'Excess IRR', 'Direct Alpha'
+]
+YEAR_COLS = ['Holding Period (Y)']
+
+HTML_STYLE = """
+body { font-family: -apple-system, 'Segoe UI', Helvetica, Arial, sans-serif; margin: 2em; color: #222; }
+table { border-collapse: collapse; margin-bottom: 2em; font-size: 0.9em; }
+th, td { border: 1px solid #ccc; padding: 4px 8px; }
+th { background: #f3f3f3; }
+td { text-align: right; }
+"""
+
+
+def report_sections(total_df, account_df, stock_df, lot_df=None, group_df=None, benchmark_df=None):
+    """Report tables as (title, DataFrame) pairs, in report order."""
+    sections = [
+        ("1. Total Portfolio Performance", total_df),
+        ("2. Performance by Account", account_df),
+        ("3. Performance by Stocks", stock_df),
+    ]
+    if lot_df is not None:
+        sections.append(("4. Realized vs Unrealized Gains", lot_df))
+    if group_df is not None:
+        sections.append(("5. Performance by Group", group_df))
+    if benchmark_df is not None:
+        sections.append(("6. Performance vs Benchmark", benchmark_df))
+    return sections
+
+
+def format_table(df):
+    """Copy of df with ratio columns as percentages and holding periods to 2 decimals."""
+    formatted = df.copy()
+    for col in PERCENT_COLS + YEAR_COLS:
+        if col in formatted.columns:
+            spec = '{:.2%}' if col in PERCENT_COLS else '{:.2f}'
+            values = formatted[col].astype(float)
+            formatted[col] = [spec.format(v) if v == v else "N/A" for v in values]
+    return formatted
+
+
+def write_markdown(sections, report_date, f):
+    f.write("# Fidelity Portfolio Analysis Report\n")
+    f.write(f"**Date:** {report_date.strftime('%Y-%m-%d')}\n\n")
+    for i, (title, df) in enumerate(sections):
+        if i:
+            f.write("\n")
+        f.write(f"## {title}\n")
+        f.write(format_table(df).to_markdown(index=False, floatfmt=".2f"))
+        f.write("\n\n")
+
+
+def write_html(sections, report_date, f):
+    """Single self-contained HTML page (inline CSS, no external assets)."""
+    f.write("<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n")
+    f.write("<title>Fidelity Portfolio Analysis Report</title>\n")
+    f.write(f"<style>{HTML_STYLE}</style>\n</head>\n<body>\n")
+    f.write("<h1>Fidelity Portfolio Analysis Report</h1>\n")
+    f.write(f"<p><strong>Date:</strong> {report_date.strftime('%Y-%m-%d')}</p>\n")
+    for title, df in sections:
+        f.write(f"<h2>{escape(title)}</h2>\n")
+        format_table(df).to_html(f, index=False, float_format='{:,.2f}'.format, na_rep='', border=0)
+        f.write("\n")
+    f.write("</body>\n</html>\n")
+
+
+def write_json(sections, report_date, f):
+    """{"date": ..., "sections": [{"title": ..., "rows": [...]}]} with numeric values."""
+    f.write(f'{{"date": "{report_date.strftime('%Y-%m-%d')}", "sections": [')
+    for i, (title, df) in enumerate(sections):
+        if i:
+            f.write(', ')
+        f.write(f'{{"title": {json.dumps(title)}, "rows": ')
+        df.to_json(f, orient='records', date_format='iso')
+        f.write('}')
+    f.write(']}\n')
+
+
+def write_table(df, path, fmt):
+    """Write one table with typed columns. CSV is written in row chunks."""
+    path = Path(path)
+    if fmt == 'csv':
+        df.to_csv(path, index=False, chunksize=100_000)
+    elif fmt == 'parquet':
+        df.to_parquet(path, index=False, row_group_size=100_000)
+    elif fmt == 'json':
+        df.to_json(path, orient='records', date_format='iso', lines=True)
+    else:
+        raise ValueError(f"Unknown table format: {fmt}")
+    return path
+
+
+def render_report(sections, report_date, output_dir, fmt='md'):
+    """
+    Write the report to output_dir in one format: md, json and html as a
+    single Portfolio_Report_<date> file, csv and parquet as one
+    Portfolio_Report_<date>_<section> file per table.
+    Returns: list of paths written.
+    """
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"format must be one of {REPORT_FORMATS}")
+    output_dir = Path(output_dir)
+    stem = f"Portfolio_Report_{report_date.strftime('%Y-%m-%d')}"
+
+    if fmt in ('csv', 'parquet'):
+        paths = []
+        for title, df in sections:
+            slug = title.split('. ', 1)[-1].replace(' ', '_')
+            paths.append(write_table(df, output_dir / f"{stem}_{slug}.{fmt}", fmt))
+        return paths
+
+    writer = {'md': write_markdown, 'json': write_json, 'html': write_html}[fmt]
+    path = output_dir / f"{stem}.{fmt}"
+    with open(path, 'w') as f:
+        writer(sections, report_date, f)
+    return [path]
+
+
+def generate_markdown_report(total_df, account_df, stock_df, report_date, output_dir=None, lot_df=None, group_df=None,
+                             benchmark_df=None):
     """
     Generates a Markdown formatted report string from the analysis DataFrames.
     """
-    
-    report = []
-    
-    # Title and Date
-    report.append(f"# Fidelity Portfolio Analysis Report")
-    report.append(f"**Date:** {report_date.strftime('%Y-%m-%d')}\n")
-    
-    # 1. Total Portfolio Performance
-    report.append("## 1. Total Portfolio Performance")
-    report.append(total_df.to_markdown(index=False, floatfmt=".2f"))
-    report.append("\n")
-    
-    # 2. Account Level Performance
-    report.append("## 2. Performance by Account")
-    report.append(account_df.to_markdown(index=False, floatfmt=".2f"))
-    report.append("\n")
-    
-    # 3. Position Details
-    report.append("## 3. Performance by Stocks")
-    report.append(stock_df.to_markdown(index=False, floatfmt=".2f"))
-    report.append("\n")
-
-    report_content = "\n".join(report)
-    
+    sections = report_sections(total_df, account_df, stock_df, lot_df, group_df, benchmark_df)
     if output_dir:
-        filename = f"Portfolio_Report_{report_date.strftime('%Y-%m-%d')}.md"
-        output_path = f"{output_dir}/{filename}"
-        with open(output_path, "w") as f:
-            f.write(report_content)
+        output_path, = render_report(sections, report_date, output_dir, 'md')
         print(f"Report saved to: {output_path}")
-        
-    return report_content
+
+    buffer = io.StringIO()
+    write_markdown(sections, report_date, buffer)
+    return buffer.getvalue()
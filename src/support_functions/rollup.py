@@ -0,0 +1,101 @@
+from pathlib import Path
+
+from support_functions.cash_flows import EntityCashFlows, concat_cash_flows
+from support_functions.data_loader import load_data
+from support_functions.flow_builders import build_all_stock_cash_flows, build_all_account_cash_flows
+
+
+## Hierarchical Roll-Up
+# Parents are built from their children instead of from the raw history:
+# a parent's flows are the children's flow arrays concatenated once and
+# stably sorted by day (cheap, as each child is already a sorted run), and
+# invested / current value are sums of the child totals.
+#
+#   (account, symbol) -> asset type             security flows (buys, sells, income)
+#   account -> account group -> total           external funding flows
+
+# Substrings of account names that mark tax-advantaged accounts
+RETIREMENT_PATTERNS = ['401(K)', '403(B)', 'IRA', 'ROTH', 'HEALTH SAVINGS', 'HSA', 'PENSION']
+
+
+def merge_cash_flows(children, latest_date=None):
+    """
+    Roll child EntityCashFlows up into one parent.
+    Child flows must each be sorted by date; the merged flows are too.
+    """
+    children = list(children)
+    if latest_date is None:
+        latest_date = max((c.latest_date for c in children if c.latest_date is not None), default=None)
+    days, amounts = concat_cash_flows(children)
+    return EntityCashFlows(
+        days=days,
+        amounts=amounts,
+        total_invested=sum(c.total_invested for c in children),
+        current_value=sum(c.current_value for c in children),
+        latest_date=latest_date
+    )
+
+
+def roll_up(children, group_of, latest_date=None):
+    """
+    Group children by group_of(key) and merge each group.
+    Returns: dict keyed by group, in order of first appearance.
+    """
+    members = {}
+    for key, child in children.items():
+        members.setdefault(group_of(key), []).append(child)
+    return {group: merge_cash_flows(kids, latest_date) for group, kids in members.items()}
+
+
+def tax_treatment(account_name):
+    """'Retirement' for 401(k), IRA, HSA and similar accounts, else 'Taxable'."""
+    name = str(account_name).upper()
+    return 'Retirement' if any(p in name for p in RETIREMENT_PATTERNS) else 'Taxable'
+
+
+def account_groups(data, grouping='Tax Treatment'):
+    """
+    Map every account number to its group.
+    grouping: 'Tax Treatment', or a dict mapping account number (or name) to a group name.
+    """
+    groups = {}
+    for account_num, account_name in zip(data.unique_accounts['Account Number'], data.unique_accounts['Account Name']):
+        if isinstance(grouping, dict):
+            groups[account_num] = grouping.get(account_num, grouping.get(account_name, 'Other'))
+        else:
+            groups[account_num] = tax_treatment(account_name)
+    return groups
+
+
+def build_rollup(data, grouping='Tax Treatment'):
+    """
+    Build every level of the hierarchy in one bottom-up pass.
+    Returns: dict of level name -> {key: EntityCashFlows} with levels
+    'Symbol', 'Asset Type', 'Account', 'Account Group' and 'Total'.
+    """
+    latest_date = data.latest_date
+    symbol_flows = build_all_stock_cash_flows(data)
+    account_flows = build_all_account_cash_flows(data)
+
+    asset_types = data.positions['Asset Type'].to_numpy()
+    asset_type_of = {key: asset_types[rows.start] for key, rows in data.position_entity_rows.items()}
+    group_of = account_groups(data, grouping)
+
+    group_flows = roll_up(account_flows, lambda num: group_of.get(num, 'Other'), latest_date)
+    return {
+        'Symbol': symbol_flows,
+        'Asset Type': roll_up(symbol_flows, asset_type_of.get, latest_date),
+        'Account': account_flows,
+        'Account Group': group_flows,
+        'Total': {'Total': merge_cash_flows(group_flows.values(), latest_date)},
+    }
+
+
+if __name__ == "__main__":
+    project_path= Path.cwd()
+    data_dir = f'{project_path}/data'
+
+    data = load_data(data_dir)
+    levels = build_rollup(data)
+    for level, entities in levels.items():
+        print(level, {key: round(e.current_value, 2) for key, e in entities.items()})
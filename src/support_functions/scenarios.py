@@ -0,0 +1,241 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from support_functions.data_loader import load_data
+from support_functions.valuation import load_price_table
+
+
+## Scenario Engine
+# Holdings in the current positions are mapped onto return factors (their own
+# symbol's history, else a proxy for their Asset Type; cash is not shocked)
+# and aggregated into a (factors x accounts) dollar-exposure matrix, so each
+# simulated path costs one row of factor returns times that matrix. Paths are
+# generated in fixed-size chunks, each with its own SeedSequence child, so
+# memory is bounded by the chunk size and results do not depend on how many
+# workers run the chunks.
+
+DEFAULT_CHUNK_PATHS = 10_000
+VAR_LEVELS = (0.95, 0.99)
+
+
+@dataclass
+class Exposures:
+    """Dollar exposure of each account to each return factor."""
+    factors: pd.Index
+    accounts: pd.Index
+    weights: np.ndarray          # (factors x accounts)
+    current_values: np.ndarray   # per account, including unshocked holdings
+    unshocked: pd.Series         # value per account with no factor (held flat)
+
+
+@dataclass
+class SimulationResult:
+    """Simulated change in value per path and account."""
+    accounts: pd.Index
+    current_values: np.ndarray
+    pnl: np.ndarray              # (paths x accounts)
+    horizon: int
+
+
+def load_return_table(path, kind='prices'):
+    """
+    Daily returns per symbol from a local CSV / Parquet table in the
+    load_price_table formats. kind='prices' converts closes to returns;
+    kind='returns' reads the values as simple returns already.
+    Returns: DataFrame indexed by Date, one column per symbol, gaps as 0.
+    """
+    table = load_price_table(path)
+    if kind == 'prices':
+        table = table.pct_change(fill_method=None).iloc[1:]
+    elif kind != 'returns':
+        raise ValueError("kind must be 'prices' or 'returns'")
+    return table.replace([np.inf, -np.inf], np.nan).fillna(0.0)
+
+
+def build_exposures(positions, factors, proxies=None):
+    """
+    Map each holding onto a factor: its Symbol if factors has it, else
+    proxies[Asset Type]. Cash (unless proxies has 'Cash') and holdings with
+    neither are held flat.
+    """
+    proxies = proxies or {}
+    holdings = _holdings(positions)
+    factors = pd.Index(factors)
+    has_history = factors.get_indexer(holdings['Symbol']) >= 0
+    factor = np.where(has_history, holdings['Symbol'], holdings['Asset Type'].map(proxies))
+    factor[(holdings['Asset Type'] == 'Cash').to_numpy() & ('Cash' not in proxies)] = None
+    factor_idx = factors.get_indexer(factor)
+
+    accounts, account_idx = _account_index(holdings)
+    values = holdings['Current Value'].to_numpy(dtype=float)
+    weights = np.zeros((len(factors), len(accounts)))
+    modelled = factor_idx >= 0
+    np.add.at(weights, (factor_idx[modelled], account_idx[modelled]), values[modelled])
+    current_values = np.bincount(account_idx, weights=values, minlength=len(accounts))
+    unshocked = pd.Series(
+        np.bincount(account_idx[~modelled], weights=values[~modelled], minlength=len(accounts)),
+        index=accounts
+    )
+    return Exposures(factors, accounts, weights, current_values, unshocked)
+
+
+def _holdings(positions):
+    held = positions[positions['Current Value'].notna() & positions['Account Number'].notna()]
+    return held[['Account Number', 'Symbol', 'Asset Type', 'Current Value']].astype(
+        {'Account Number': object, 'Symbol': object, 'Asset Type': object}
+    ).reset_index(drop=True)
+
+
+def _account_index(holdings):
+    accounts = pd.Index(holdings['Account Number'].unique())
+    return accounts, accounts.get_indexer(holdings['Account Number'])
+
+
+def simulate_bootstrap(exposures, returns, n_paths=10_000, horizon=21, seed=0,
+                       chunk_paths=DEFAULT_CHUNK_PATHS, workers=1):
+    """
+    Bootstrap horizon-day scenarios by resampling whole historical days (so
+    cross-asset correlation is kept) and compounding them.
+    returns: daily returns with a column for every exposures factor.
+    Returns: SimulationResult
+    """
+    log_returns = np.log1p(returns.reindex(columns=exposures.factors).fillna(0.0).to_numpy())
+    if len(log_returns) == 0:
+        raise ValueError("The return table has no rows to bootstrap from")
+
+    chunk_sizes = [min(chunk_paths, n_paths - start) for start in range(0, n_paths, chunk_paths)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    tasks = [(size, horizon, child) for size, child in zip(chunk_sizes, seeds)]
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(log_returns, exposures.weights)
+        ) as pool:
+            chunks = list(pool.map(_simulate_chunk, tasks))
+    else:
+        _init_worker(log_returns, exposures.weights)
+        chunks = [_simulate_chunk(task) for task in tasks]
+    return SimulationResult(
+        exposures.accounts, exposures.current_values,
+        np.concatenate(chunks) if chunks else np.zeros((0, len(exposures.accounts))), horizon
+    )
+
+
+_WORKER_STATE = {}
+
+
+def _init_worker(log_returns, weights):
+    _WORKER_STATE['log_returns'] = log_returns
+    _WORKER_STATE['weights'] = weights
+
+
+def _simulate_chunk(task):
+    """P&L per account for one chunk of paths: (paths x accounts)."""
+    n_paths, horizon, seed = task
+    log_returns, weights = _WORKER_STATE['log_returns'], _WORKER_STATE['weights']
+    rng = np.random.default_rng(seed)
+    days = rng.integers(0, len(log_returns), size=(horizon, n_paths))
+    cumulative = np.zeros((n_paths, log_returns.shape[1]))
+    for step in days:  # one (paths x factors) gather per day keeps memory at one chunk
+        cumulative += log_returns[step]
+    return np.expm1(cumulative) @ weights
+
+
+def stress_test(positions, scenarios):
+    """
+    Deterministic shocks. scenarios maps a scenario name to {target: return},
+    where a target is a Symbol or an Asset Type (a symbol entry wins).
+    Returns: DataFrame of P&L, one row per scenario, one column per account plus Total.
+    """
+    holdings = _holdings(positions)
+    accounts, account_idx = _account_index(holdings)
+    values = holdings['Current Value'].to_numpy(dtype=float)
+
+    names = list(scenarios)
+    shocks = np.zeros((len(names), len(holdings)))
+    for i, name in enumerate(names):
+        by_type = holdings['Asset Type'].map(scenarios[name]).fillna(0.0)
+        shocks[i] = holdings['Symbol'].map(scenarios[name]).fillna(by_type).to_numpy(dtype=float)
+
+    membership = np.zeros((len(holdings), len(accounts)))
+    membership[np.arange(len(holdings)), account_idx] = 1.0
+    pnl = pd.DataFrame((shocks * values) @ membership, index=pd.Index(names, name='Scenario'), columns=accounts)
+    pnl['Total'] = pnl.sum(axis=1)
+    return pnl
+
+
+def load_scenarios(path):
+    """Scenario CSV with columns Scenario, Target (Symbol or Asset Type) and Shock (return)."""
+    df = pd.read_csv(path)
+    return {
+        name: dict(zip(group['Target'], group['Shock'].astype(float)))
+        for name, group in df.groupby('Scenario', sort=False)
+    }
+
+
+def summarize_simulation(result, levels=VAR_LEVELS):
+    """
+    Distribution of the horizon P&L per account and in total: mean, spread,
+    percentiles, and VaR / CVaR (expected loss beyond VaR) at each level,
+    reported as positive losses.
+    """
+    pnl = np.column_stack([result.pnl, result.pnl.sum(axis=1)])
+    current = np.append(result.current_values, result.current_values.sum())
+    summary = pd.DataFrame({
+        'Account Number': list(result.accounts) + ['Total'],
+        'Current Value': current,
+        'Mean P&L': pnl.mean(axis=0),
+        'Std P&L': pnl.std(axis=0),
+        'P5 Value': current + np.percentile(pnl, 5, axis=0),
+        'P50 Value': current + np.percentile(pnl, 50, axis=0),
+        'P95 Value': current + np.percentile(pnl, 95, axis=0),
+    })
+    for level in levels:
+        cutoff = np.quantile(pnl, 1 - level, axis=0)
+        tail = np.where(pnl <= cutoff, pnl, np.nan)
+        label = f"{level:.0%}"
+        summary[f'VaR {label}'] = -cutoff
+        summary[f'CVaR {label}'] = -np.nanmean(tail, axis=0)
+    return summary
+
+
+def analyze_scenarios(data, returns, n_paths=10_000, horizon=21, seed=0, proxies=None, workers=1,
+                      chunk_paths=DEFAULT_CHUNK_PATHS):
+    """Bootstrap the current positions over returns. Returns: (summary, SimulationResult, Exposures)."""
+    exposures = build_exposures(data.positions, returns.columns, proxies)
+    result = simulate_bootstrap(
+        exposures, returns, n_paths=n_paths, horizon=horizon, seed=seed,
+        chunk_paths=chunk_paths, workers=workers
+    )
+    summary = summarize_simulation(result)
+    summary['Unshocked Value'] = np.append(exposures.unshocked.to_numpy(), exposures.unshocked.sum())
+    summary = summary.merge(data.unique_accounts, on='Account Number', how='left')
+    summary.insert(0, 'Account Name', summary.pop('Account Name'))
+    return summary, result, exposures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo stress test of the current positions")
+    parser.add_argument('returns', help="Historical price or return table (CSV or Parquet)")
+    parser.add_argument('--kind', choices=['prices', 'returns'], default='prices')
+    parser.add_argument('--paths', type=int, default=10_000)
+    parser.add_argument('--horizon', type=int, default=21, help="Trading days per path (default: 21)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--proxy', nargs='*', default=[], metavar='ASSET_TYPE=SYMBOL',
+                        help="Factor for holdings without their own history, e.g. Stock=SPY")
+    args = parser.parse_args()
+
+    project_path= Path.cwd()
+    data = load_data(f'{project_path}/data')
+    returns = load_return_table(args.returns, kind=args.kind)
+    proxies = dict(p.split('=', 1) for p in args.proxy)
+    summary, _, _ = analyze_scenarios(
+        data, returns, n_paths=args.paths, horizon=args.horizon, seed=args.seed,
+        proxies=proxies, workers=args.workers
+    )
+    print(summary.to_string(index=False))
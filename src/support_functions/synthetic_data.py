@@ -0,0 +1,258 @@
+import argparse
+import csv
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+
+## Synthetic Fidelity Exports
+# Writes Portfolio_Positions_<Mon-DD-YYYY>.csv and Accounts_History_*.csv
+# files in the column layout of Fidelity's downloads, so the whole pipeline
+# can be run and benchmarked without real account data.
+
+HISTORY_COLUMNS = [
+    'Run Date', 'Account', 'Account Number', 'Action', 'Symbol', 'Description', 'Type',
+    'Price ($)', 'Quantity', 'Commission ($)', 'Fees ($)', 'Accrued Interest ($)',
+    'Amount ($)', 'Settlement Date'
+]
+POSITION_COLUMNS = [
+    'Account Number', 'Account Name', 'Symbol', 'Description', 'Quantity', 'Last Price',
+    'Last Price Change', 'Current Value', "Today's Gain/Loss Dollar", "Today's Gain/Loss Percent",
+    'Total Gain/Loss Dollar', 'Total Gain/Loss Percent', 'Percent Of Account',
+    'Cost Basis Total', 'Average Cost Basis', 'Type'
+]
+DISCLAIMER = [
+    '"The data and information in this spreadsheet is provided to you solely for your use and is not for distribution. '
+    'The spreadsheet is provided for informational purposes only, and is not intended to provide advice."',
+    '"Brokerage services are provided by Fidelity Brokerage Services LLC (FBS), 900 Salem Street, Smithfield, RI 02917."',
+]
+
+ACCOUNT_NAMES = [
+    'Individual', 'ROTH IRA', 'Traditional IRA', 'Health Savings Account',
+    'Joint WROS', 'Rollover IRA', 'Cash Management (Individual)', 'BrokerageLink 401(K)'
+]
+TICKERS = [
+    ('AAPL', 'APPLE INC'), ('MSFT', 'MICROSOFT CORP'), ('NVDA', 'NVIDIA CORP'),
+    ('AMZN', 'AMAZON.COM INC'), ('GOOGL', 'ALPHABET INC CAP STK CL A'), ('META', 'META PLATFORMS INC CLASS A'),
+    ('FXAIX', 'FIDELITY 500 INDEX FUND'), ('FSKAX', 'FIDELITY TOTAL MARKET INDEX FUND'),
+    ('VOO', 'VANGUARD INDEX FDS S&P 500 ETF USD'), ('QQQ', 'INVESCO QQQ TR UNIT SER 1'),
+    ('TSLA', 'TESLA INC'), ('BRKB', 'BERKSHIRE HATHAWAY INC COM USD0.0033 CLASS B'),
+]
+CORE_SYMBOL = 'SPAXX**'
+CORE_DESCRIPTION = 'HELD IN MONEY MARKET'
+DEPOSIT_BLOCK = 1000.0
+
+# Share of trade events by kind: buy, sell, dividend, reinvestment, deposit
+EVENT_KINDS = ('buy', 'sell', 'dividend', 'reinvestment', 'deposit')
+EVENT_WEIGHTS = (0.45, 0.2, 0.15, 0.1, 0.1)
+
+
+def generate_portfolio(output_dir, n_accounts=4, n_symbols=12, years=3, trades_per_day=2.0,
+                       end_date='2025-12-31', overlap_days=0, seed=0):
+    """
+    Generate a consistent set of synthetic Fidelity exports.
+
+    Prices follow a random walk per symbol; each business day gets a
+    Poisson(trades_per_day) number of buys, sells, dividends, reinvestments
+    and deposits across random accounts. Deposits are added whenever an
+    account's core cash would go negative, and sells never exceed holdings,
+    so the final positions file matches the history.
+
+    History is written as one export per calendar year (newest rows first);
+    overlap_days repeats that many days from the neighbouring year in each
+    file, as overlapping manual downloads do.
+    Returns: dict with 'positions' path, 'history' paths and 'rows' count.
+    """
+    rng = np.random.default_rng(seed)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    end_date = pd.Timestamp(end_date)
+    days = pd.bdate_range(end_date - pd.DateOffset(years=years), end_date)
+    accounts = _synthetic_accounts(n_accounts, rng)
+    symbols, descriptions = _synthetic_symbols(n_symbols)
+    prices = _price_paths(len(days), len(symbols), rng)
+
+    rows, holdings, cost, cash = _simulate_history(days, accounts, symbols, descriptions, prices, trades_per_day, rng)
+    history_paths = _write_history(output_dir, rows, overlap_days)
+    positions_path = _write_positions(
+        output_dir, end_date, accounts, symbols, descriptions, prices[-1], holdings, cost, cash
+    )
+    return {'positions': positions_path, 'history': history_paths, 'rows': len(rows)}
+
+
+def _synthetic_accounts(n_accounts, rng):
+    numbers = rng.choice(90_000_000, size=n_accounts, replace=False) + 10_000_000
+    accounts = []
+    for i, number in enumerate(numbers):
+        name = ACCOUNT_NAMES[i % len(ACCOUNT_NAMES)]
+        if i >= len(ACCOUNT_NAMES):
+            name = f"{name} {i // len(ACCOUNT_NAMES) + 1}"
+        accounts.append((f"X{number}", name))
+    return accounts
+
+
+def _synthetic_symbols(n_symbols):
+    symbols = [t for t, _ in TICKERS[:n_symbols]]
+    descriptions = [d for _, d in TICKERS[:n_symbols]]
+    for i in range(len(symbols), n_symbols):
+        symbols.append(f"SYN{i:04d}")
+        descriptions.append(f"SYNTHETIC HOLDINGS {i:04d} INC")
+    return symbols, descriptions
+
+
+def _price_paths(n_days, n_symbols, rng):
+    start = rng.uniform(20, 400, n_symbols)
+    log_returns = rng.normal(0.0003, 0.018, (n_days, n_symbols))
+    log_returns[0] = 0.0
+    return np.round(start * np.exp(np.cumsum(log_returns, axis=0)), 2)
+
+
+def _simulate_history(days, accounts, symbols, descriptions, prices, trades_per_day, rng):
+    """
+    Event loop over trades in date order. Event days, accounts, symbols and
+    kinds are drawn up front; the loop only tracks holdings, cost and cash.
+    Returns: (history rows oldest first, holdings, cost basis, cash), the
+    last three per account (x symbol).
+    """
+    counts = rng.poisson(trades_per_day, len(days))
+    day_idx = np.repeat(np.arange(len(days)), counts)
+    n_events = len(day_idx)
+    event_account = rng.integers(0, len(accounts), n_events)
+    event_symbol = rng.integers(0, len(symbols), n_events)
+    event_kind = rng.choice(len(EVENT_KINDS), size=n_events, p=EVENT_WEIGHTS)
+    event_size = rng.uniform(0, 1, n_events)
+
+    holdings = np.zeros((len(accounts), len(symbols)))
+    cost_basis = np.zeros((len(accounts), len(symbols)))
+    cash = np.zeros(len(accounts))
+    rows = []
+
+    def add(d, a, action, symbol='', description='No Description', price='', quantity='', fees='', amount=0.0, settle=False):
+        date = days[d]
+        settlement = (date + pd.offsets.BDay(1)).strftime('%m/%d/%Y') if settle else ''
+        account_num, account_name = accounts[a]
+        rows.append([
+            date.strftime('%m/%d/%Y'), account_name, account_num, action, symbol, description, 'Cash',
+            price, quantity, '', fees, '', f"{amount:.2f}", settlement
+        ])
+        cash[a] += amount
+
+    def deposit(d, a, amount):
+        add(d, a, 'ELECTRONIC FUNDS TRANSFER RECEIVED (Cash)', amount=amount)
+
+    for a in range(len(accounts)):
+        deposit(0, a, DEPOSIT_BLOCK * 10)
+
+    for d, a, s, kind, size in zip(day_idx, event_account, event_symbol, event_kind, event_size):
+        symbol, description, price = symbols[s], descriptions[s], prices[d, s]
+        kind = EVENT_KINDS[kind]
+        if kind == 'sell' and holdings[a, s] < 1:
+            kind = 'buy'
+        if kind in ('dividend', 'reinvestment') and holdings[a, s] <= 0:
+            kind = 'deposit'
+
+        if kind == 'buy':
+            quantity = int(size * 50) + 1
+            cost = round(quantity * price, 2)
+            if cash[a] < cost:
+                deposit(d, a, DEPOSIT_BLOCK * np.ceil((cost - cash[a]) / DEPOSIT_BLOCK))
+            add(d, a, f"YOU BOUGHT {description} ({symbol}) (Cash)", symbol, description,
+                f"{price:.2f}", str(quantity), amount=-cost, settle=True)
+            holdings[a, s] += quantity
+            cost_basis[a, s] += cost
+        elif kind == 'sell':
+            quantity = max(1, int(holdings[a, s] * size))
+            proceeds = round(quantity * price, 2) - 0.02
+            add(d, a, f"YOU SOLD {description} ({symbol}) (Cash)", symbol, description,
+                f"{price:.2f}", str(-quantity), fees='0.02', amount=proceeds, settle=True)
+            cost_basis[a, s] *= (holdings[a, s] - quantity) / holdings[a, s]
+            holdings[a, s] -= quantity
+        elif kind == 'dividend':
+            amount = round(holdings[a, s] * price * 0.004, 2)
+            add(d, a, f"DIVIDEND RECEIVED {description} ({symbol}) (Cash)", symbol, description, amount=amount)
+        elif kind == 'reinvestment':
+            amount = round(holdings[a, s] * price * 0.004, 2)
+            quantity = round(amount / price, 3)
+            if quantity <= 0:
+                continue
+            add(d, a, f"DIVIDEND RECEIVED {description} ({symbol}) (Cash)", symbol, description, amount=amount)
+            add(d, a, f"REINVESTMENT {description} ({symbol}) (Cash)", symbol, description,
+                f"{price:.2f}", f"{quantity:.3f}", amount=-amount)
+            holdings[a, s] += quantity
+            cost_basis[a, s] += amount
+        else:
+            deposit(d, a, DEPOSIT_BLOCK * (int(size * 10) + 1))
+
+    return rows, holdings, cost_basis, cash
+
+
+def _write_history(output_dir, rows, overlap_days):
+    dates = pd.to_datetime([r[0] for r in rows], format='%m/%d/%Y')
+    paths = []
+    for year in sorted(dates.year.unique()):
+        start = pd.Timestamp(year=year, month=1, day=1) - pd.Timedelta(days=overlap_days)
+        end = pd.Timestamp(year=year, month=12, day=31) + pd.Timedelta(days=overlap_days)
+        selected = np.flatnonzero((dates >= start) & (dates <= end))[::-1]  # newest first
+        path = output_dir / f"Accounts_History_{year}.csv"
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(HISTORY_COLUMNS)
+            writer.writerows(rows[i] for i in selected)
+            f.write('\n' + '\n'.join(DISCLAIMER) + '\n')
+        paths.append(path)
+    return paths
+
+
+def _write_positions(output_dir, end_date, accounts, symbols, descriptions, last_prices, holdings, cost_basis, cash):
+    path = output_dir / f"Portfolio_Positions_{end_date.strftime('%b-%d-%Y')}.csv"
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(POSITION_COLUMNS)
+        for a, (account_num, account_name) in enumerate(accounts):
+            values = holdings[a] * last_prices
+            account_total = values.sum() + cash[a]
+            writer.writerow([
+                account_num, account_name, CORE_SYMBOL, CORE_DESCRIPTION, '', '', '',
+                _dollars(cash[a]), '', '', '', '', _percent(cash[a] / account_total), '', '', 'Cash'
+            ])
+            for s in np.flatnonzero(holdings[a] > 0):
+                quantity, price, value = holdings[a, s], last_prices[s], values[s]
+                cost = cost_basis[a, s]
+                gain = value - cost
+                writer.writerow([
+                    account_num, account_name, symbols[s], descriptions[s], f"{quantity:g}",
+                    _dollars(price), '+$0.00', _dollars(value), '+$0.00', '+0.00%',
+                    _dollars(gain, signed=True), _percent(gain / cost if cost else 0, signed=True),
+                    _percent(value / account_total), _dollars(cost), _dollars(cost / quantity), 'Cash'
+                ])
+        f.write('\n' + '\n'.join(DISCLAIMER) + '\n')
+    return path
+
+
+def _dollars(x, signed=False):
+    sign = '-' if x < 0 else ('+' if signed else '')
+    return f"{sign}${abs(x):,.2f}"
+
+
+def _percent(x, signed=False):
+    sign = '-' if x < 0 else ('+' if signed else '')
+    return f"{sign}{abs(x) * 100:.2f}%"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic Fidelity export files")
+    parser.add_argument('output_dir')
+    parser.add_argument('--accounts', type=int, default=4)
+    parser.add_argument('--symbols', type=int, default=12)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--trades-per-day', type=float, default=2.0)
+    parser.add_argument('--overlap-days', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    result = generate_portfolio(
+        args.output_dir, n_accounts=args.accounts, n_symbols=args.symbols, years=args.years,
+        trades_per_day=args.trades_per_day, overlap_days=args.overlap_days, seed=args.seed
+    )
+    print(f"Wrote {result['rows']:,} history rows to {len(result['history'])} files and {result['positions']}")
@@ -0,0 +1,262 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from support_functions.cash_flows import from_days, to_days
+from support_functions.data_loader import load_data
+from support_functions.math_utils import xirr_from_arrays
+from support_functions.valuation import price_scale
+
+
+LOT_METHODS = ('FIFO', 'LIFO', 'HIFO')
+LONG_TERM_DAYS = 365
+QUANTITY_EPS = 1e-9
+
+
+class LotBook:
+    """
+    Array-backed store of tax lots.
+
+    Every lot is one slot in parallel NumPy arrays that grow by doubling, so
+    appends are amortized O(1) and tens of thousands of lots take a few MB.
+    Lots of one (account, symbol) are appended together and occupy a
+    contiguous range, which is what match() works on. Unmatched lots stand in
+    for shares sold without an open lot to take them from.
+    """
+    __slots__ = ('size', 'entity', 'open_day', 'quantity', 'remaining', 'cost', 'unmatched')
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.entity = np.empty(capacity, dtype=np.int32)
+        self.open_day = np.empty(capacity, dtype=np.int32)
+        self.quantity = np.empty(capacity)
+        self.remaining = np.empty(capacity)
+        self.cost = np.empty(capacity)  # total cost of the original quantity
+        self.unmatched = np.empty(capacity, dtype=bool)
+
+    def append(self, entity, open_day, quantity, cost, unmatched=False):
+        if self.size == len(self.entity):
+            self._grow()
+        i = self.size
+        self.entity[i] = entity
+        self.open_day[i] = open_day
+        self.quantity[i] = quantity
+        self.remaining[i] = quantity
+        self.cost[i] = cost
+        self.unmatched[i] = unmatched
+        self.size += 1
+
+    def match(self, start, stop, quantity, method):
+        """
+        Close up to quantity shares from the open lots in [start, stop).
+        Returns: (lot ids, quantity taken from each).
+        """
+        remaining = self.remaining[start:stop]
+        open_idx = np.flatnonzero(remaining > QUANTITY_EPS)
+        if method == 'LIFO':
+            open_idx = open_idx[::-1]
+        elif method == 'HIFO':
+            unit_cost = self.cost[start:stop][open_idx] / self.quantity[start:stop][open_idx]
+            open_idx = open_idx[np.argsort(-unit_cost, kind='stable')]
+
+        available = remaining[open_idx]
+        taken_before = np.cumsum(available) - available
+        take = np.clip(quantity - taken_before, 0, available)
+        used = take > QUANTITY_EPS
+        lot_ids = open_idx[used] + start
+        take = take[used]
+        self.remaining[lot_ids] -= take
+        return lot_ids, take
+
+    def _grow(self):
+        for name in ('entity', 'open_day', 'quantity', 'remaining', 'cost', 'unmatched'):
+            old = getattr(self, name)
+            new = np.empty(len(old) * 2, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+
+def build_tax_lots(data, method='FIFO'):
+    """
+    Build tax lots from the transaction history, matching sells to buys
+    under FIFO, LIFO or HIFO. Shares sold beyond the open lots (an oversell,
+    or history that starts mid-position) close a zero-basis unmatched lot.
+    Returns: (lots_df, realized_df)
+    """
+    method = method.upper()
+    if method not in LOT_METHODS:
+        raise ValueError(f"Unknown lot method {method!r}, expected one of {LOT_METHODS}")
+
+    trades = _security_trades(data.transactions)
+    key_cols = ['Account Number', 'Symbol']
+    entities = pd.MultiIndex.from_frame(trades[key_cols].drop_duplicates())
+    entity_idx = entities.get_indexer(pd.MultiIndex.from_frame(trades[key_cols]))
+    day_numbers = to_days(trades['Run Date'])
+    quantities = trades['Quantity'].to_numpy(dtype=float)
+    amounts = trades['Amount ($)'].to_numpy(dtype=float)
+    prices = trades['Price ($)'].to_numpy(dtype=float)
+
+    book = LotBook()
+    realized = {'lot': [], 'close_day': [], 'quantity': [], 'proceeds': []}
+    entity_start = 0
+    for i in range(len(trades)):
+        if i > 0 and entity_idx[i] != entity_idx[i - 1]:
+            entity_start = book.size
+        if quantities[i] > 0:
+            # Buys (and reinvestments) cost their amount; transfers in carry the quoted price
+            cost = -amounts[i] if amounts[i] < 0 else prices[i] * quantities[i]
+            book.append(entity_idx[i], day_numbers[i], quantities[i], cost)
+        else:
+            sold = -quantities[i]
+            lot_ids, take = book.match(entity_start, book.size, sold, method)
+            shortfall = sold - take.sum()
+            if shortfall > QUANTITY_EPS:
+                book.append(entity_idx[i], day_numbers[i], shortfall, 0.0, unmatched=True)
+                book.remaining[book.size - 1] = 0.0
+                lot_ids = np.append(lot_ids, book.size - 1)
+                take = np.append(take, shortfall)
+            realized['lot'].append(lot_ids)
+            realized['close_day'].append(np.full(len(lot_ids), day_numbers[i], dtype=np.int32))
+            realized['quantity'].append(take)
+            realized['proceeds'].append(amounts[i] * take / sold)
+
+    realized = {k: np.concatenate(v) if v else np.array([]) for k, v in realized.items()}
+    realized['lot'] = realized['lot'].astype(np.intp)
+    realized['close_day'] = realized['close_day'].astype(np.int32)
+    return _lots_frame(data, book, entities, realized), _realized_frame(book, entities, realized)
+
+
+def analyze_tax_lots(data, method='FIFO'):
+    """
+    Realized and unrealized gains per (account, symbol), split into short-
+    and long-term. Sells not covered by the open lots are counted in
+    'Unmatched Quantity' and their zero-basis gain in 'Realized Unmatched'.
+    """
+    lots_df, realized_df = build_tax_lots(data, method)
+    key_cols = ['Account Number', 'Symbol']
+
+    unrealized = lots_df[lots_df['Remaining Quantity'] > QUANTITY_EPS].pivot_table(
+        index=key_cols, columns='Term', values='Unrealized Gain ($)', aggfunc='sum', fill_value=0
+    ).add_prefix('Unrealized ')
+    realized = realized_df.pivot_table(
+        index=key_cols, columns='Term', values='Realized Gain ($)', aggfunc='sum', fill_value=0
+    ).add_prefix('Realized ')
+    open_lots = (
+        lots_df[lots_df['Remaining Quantity'] > QUANTITY_EPS]
+        .groupby(key_cols, observed=True).size().rename('Open Lots')
+    )
+    unmatched = (
+        lots_df[lots_df['Term'] == 'Unmatched']
+        .groupby(key_cols, observed=True)['Quantity'].sum().rename('Unmatched Quantity')
+    )
+    if len(unmatched):
+        print(f"Warning: {len(unmatched)} holdings sold more shares than their open lots; "
+              "the excess is reported as unmatched with zero cost basis")
+
+    summary = pd.concat([realized, unrealized, open_lots, unmatched], axis=1).fillna(0)
+    for col in ['Realized Short-Term', 'Realized Long-Term', 'Realized Unmatched',
+                'Unrealized Short-Term', 'Unrealized Long-Term', 'Unmatched Quantity']:
+        if col not in summary.columns:
+            summary[col] = 0.0
+    summary['Open Lots'] = summary['Open Lots'].astype(int)
+    summary = summary.reset_index().merge(data.unique_accounts, on='Account Number', how='left')
+    return summary[[
+        'Account Name', 'Account Number', 'Symbol',
+        'Realized Short-Term', 'Realized Long-Term',
+        'Unrealized Short-Term', 'Unrealized Long-Term', 'Open Lots',
+        'Realized Unmatched', 'Unmatched Quantity'
+    ]].sort_values(['Account Name', 'Symbol'])
+
+
+def _security_trades(transactions_df):
+    """Share-changing rows of securities, grouped by (account, symbol), buys before sells on a day."""
+    trades = transactions_df[
+        transactions_df['Run Date'].notna() &
+        transactions_df['Account Number'].notna() &
+        transactions_df['Symbol'].notna() & (transactions_df['Symbol'] != '') &
+        (transactions_df['Asset Type'] != 'Cash') &
+        (transactions_df['Quantity'] != 0)
+    ]
+    return (
+        trades.assign(_is_sell=trades['Quantity'] < 0)
+        .sort_values(['Account Number', 'Symbol', 'Run Date', '_is_sell'], kind='stable')
+        .drop(columns='_is_sell')
+    )
+
+
+def _lots_frame(data, book, entities, realized):
+    n = book.size
+    entity = book.entity[:n]
+    quantity = book.quantity[:n]
+    remaining = np.where(book.remaining[:n] > QUANTITY_EPS, book.remaining[:n], 0.0)
+    cost = book.cost[:n]
+    remaining_cost = cost * remaining / quantity
+
+    positions = data.positions
+    key_cols = ['Account Number', 'Symbol']
+    last_price = positions.groupby(key_cols, observed=True)['Last Price'].first().reindex(entities).fillna(0).to_numpy()
+    asset_type = positions.groupby(key_cols, observed=True)['Asset Type'].first().reindex(entities).to_numpy()
+    current_value = remaining * (last_price * price_scale(asset_type))[entity]
+
+    latest_day = to_days([data.latest_date])[0]
+    realized_lots = realized['lot']
+    realized_gain = np.bincount(
+        realized_lots,
+        weights=realized['proceeds'] - cost[realized_lots] * realized['quantity'] / quantity[realized_lots],
+        minlength=n
+    )
+
+    # Per-lot IRR: purchase, every partial sale, and the open remainder valued today
+    is_open = remaining > 0
+    irr = xirr_from_arrays(
+        np.concatenate([np.arange(n), realized_lots, np.flatnonzero(is_open)]),
+        np.concatenate([book.open_day[:n], realized['close_day'], np.full(is_open.sum(), latest_day)]),
+        np.concatenate([-cost, realized['proceeds'], current_value[is_open]]),
+        n
+    )
+
+    return pd.DataFrame({
+        'Account Number': entities.get_level_values(0)[entity],
+        'Symbol': entities.get_level_values(1)[entity],
+        'Open Date': from_days(book.open_day[:n]),
+        'Quantity': quantity,
+        'Remaining Quantity': remaining,
+        'Cost Basis': remaining_cost,
+        'Current Value': current_value,
+        'Unrealized Gain ($)': current_value - remaining_cost,
+        'Realized Gain ($)': realized_gain,
+        'Term': _term(latest_day - book.open_day[:n], book.unmatched[:n]),
+        'IRR': irr,
+    })
+
+
+def _realized_frame(book, entities, realized):
+    realized_lots = realized['lot']
+    quantity = realized['quantity']
+    cost = book.cost[realized_lots] * quantity / book.quantity[realized_lots]
+    open_day = book.open_day[realized_lots]
+    entity = book.entity[realized_lots]
+    return pd.DataFrame({
+        'Account Number': entities.get_level_values(0)[entity],
+        'Symbol': entities.get_level_values(1)[entity],
+        'Open Date': from_days(open_day),
+        'Close Date': from_days(realized['close_day']),
+        'Quantity': quantity,
+        'Proceeds': realized['proceeds'],
+        'Cost Basis': cost,
+        'Realized Gain ($)': realized['proceeds'] - cost,
+        'Term': _term(realized['close_day'] - open_day, book.unmatched[realized_lots]),
+    })
+
+
+def _term(holding_days, unmatched):
+    term = np.where(holding_days > LONG_TERM_DAYS, 'Long-Term', 'Short-Term')
+    return np.where(unmatched, 'Unmatched', term)
+
+
+if __name__ == "__main__":
+    project_path= Path.cwd()
+    data_dir = f'{project_path}/data'
+
+    data = load_data(data_dir)
+    print(analyze_tax_lots(data, method='FIFO'))
@@ -0,0 +1,177 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from support_functions.data_loader import load_data
+from support_functions.flow_builders import funding_mask
+
+
+## Time-Series Valuation
+# Holdings, cash and external flows are scattered into (days x entities)
+# matrices and rebuilt with cumulative sums; prices are forward-filled once.
+# No step loops over days.
+
+def load_price_table(price_file):
+    """
+    Load a user-supplied daily price table (CSV or Parquet).
+    Accepts long format (Date, Symbol, Close) or wide format (Date plus one
+    column per symbol).
+    Returns: DataFrame indexed by Date with one float column per symbol.
+    """
+    path = Path(price_file)
+    df = pd.read_parquet(path) if path.suffix == '.parquet' else pd.read_csv(path)
+    df['Date'] = pd.to_datetime(df['Date'])
+    if 'Symbol' in df.columns:
+        value_col = 'Close' if 'Close' in df.columns else 'Price'
+        df = df.pivot_table(index='Date', columns='Symbol', values=value_col, aggfunc='last')
+    else:
+        df = df.set_index('Date')
+    return df.sort_index().astype(float)
+
+
+def build_daily_valuation(data, prices=None):
+    """
+    Rebuild daily holdings per (account, symbol) and daily cash per account
+    from the transaction history, anchored so the last day matches the
+    current positions, and value them.
+
+    Prices come from the optional price table, falling back to trade prices
+    seen in the history and to the positions' Last Price, forward-filled.
+    A holding is valued at zero before its first known price rather than at
+    a later one, so no future price leaks into earlier days.
+    Returns: (nav, net_flows) DataFrames indexed by day, one column per account.
+    """
+    positions = data.positions
+    accounts = pd.Index(data.unique_accounts['Account Number'].unique())
+
+    transactions = data.transactions
+    transactions = transactions[
+        transactions['Run Date'].notna() &
+        (transactions['Run Date'] <= data.latest_date) &
+        transactions['Account Number'].isin(accounts)
+    ]
+    dates = pd.date_range(transactions['Run Date'].min(), data.latest_date, freq='D')
+    day_idx = (transactions['Run Date'] - dates[0]).dt.days.to_numpy()
+    account_idx = accounts.get_indexer(transactions['Account Number'])
+
+    # Securities: quantity ledger per (account, symbol)
+    is_security = (transactions['Asset Type'] != 'Cash') & transactions['Symbol'].notna() & (transactions['Symbol'] != '')
+    security_tx = transactions[is_security]
+    held = positions[
+        (positions['Asset Type'] != 'Cash') &
+        positions['Symbol'].notna() &
+        (positions['Quantity'] != 0)
+    ]
+    key_cols = ['Account Number', 'Symbol']
+    entities = pd.MultiIndex.from_frame(
+        pd.concat([security_tx[key_cols], held[key_cols]]).drop_duplicates()
+    )
+    entity_idx = entities.get_indexer(pd.MultiIndex.from_frame(security_tx[key_cols]))
+
+    quantity_changes = np.zeros((len(dates), len(entities)))
+    np.add.at(quantity_changes, (day_idx[is_security.to_numpy()], entity_idx), security_tx['Quantity'].to_numpy())
+    current_quantity = held.groupby(key_cols, observed=True)['Quantity'].sum().reindex(entities, fill_value=0).to_numpy()
+    holdings = _anchor_to_current(quantity_changes.cumsum(axis=0), current_quantity)
+
+    prices_by_entity = _daily_prices(dates, entities, security_tx, held, prices)
+    asset_types = (
+        pd.concat([security_tx[key_cols + ['Asset Type']], held[key_cols + ['Asset Type']]])
+        .drop_duplicates(key_cols).set_index(key_cols)['Asset Type']
+        .reindex(entities).to_numpy()
+    )
+    entity_values = holdings * prices_by_entity * price_scale(asset_types)
+
+    entity_account = np.zeros((len(entities), len(accounts)))
+    entity_account[np.arange(len(entities)), accounts.get_indexer(entities.get_level_values(0))] = 1.0
+    security_value = entity_values @ entity_account
+
+    # Cash: every settled amount moves the core cash balance
+    cash_changes = np.zeros((len(dates), len(accounts)))
+    np.add.at(cash_changes, (day_idx, account_idx), transactions['Amount ($)'].to_numpy())
+    current_cash = (
+        positions[positions['Asset Type'] == 'Cash']
+        .groupby('Account Number', observed=True)['Current Value'].sum()
+        .reindex(accounts, fill_value=0).to_numpy()
+    )
+    cash = _anchor_to_current(cash_changes.cumsum(axis=0), current_cash)
+
+    # External flows: deposits into the account are positive
+    is_funding = funding_mask(transactions).to_numpy()
+    flows = np.zeros((len(dates), len(accounts)))
+    np.add.at(flows, (day_idx[is_funding], account_idx[is_funding]), transactions['Amount ($)'].to_numpy()[is_funding])
+
+    nav = pd.DataFrame(security_value + cash, index=dates, columns=accounts)
+    net_flows = pd.DataFrame(flows, index=dates, columns=accounts)
+    return nav, net_flows
+
+
+def time_weighted_returns(nav, net_flows):
+    """
+    Daily and cumulative time-weighted returns, treating each day's external
+    flow as arriving at the end of the day.
+    Returns: (daily_returns, twr) with the same shape as nav.
+    """
+    previous = nav.shift(1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        daily = (nav - net_flows) / previous - 1
+    daily = daily.where(previous > 0, 0.0)
+    twr = (1 + daily).cumprod() - 1
+    return daily, twr
+
+
+def analyze_time_series(data, prices=None):
+    """
+    Daily NAV, external flows and time-weighted return per account and in total.
+    Returns: long DataFrame with one row per (Date, Account Number).
+    """
+    nav, net_flows = build_daily_valuation(data, prices)
+    nav['Total'] = nav.sum(axis=1)
+    net_flows['Total'] = net_flows.sum(axis=1)
+    daily, twr = time_weighted_returns(nav, net_flows)
+
+    result = pd.concat({
+        'NAV': nav.stack(),
+        'Net Flow': net_flows.stack(),
+        'Daily Return': daily.stack(),
+        'TWR': twr.stack(),
+    }, axis=1)
+    result.index.names = ['Date', 'Account Number']
+    return result.reset_index()
+
+
+def price_scale(asset_types):
+    """Value per unit of price: Treasury quantities are face value, priced per 100."""
+    return np.where(np.asarray(asset_types) == 'Bond', 0.01, 1.0)
+
+
+def _anchor_to_current(cumulative, current):
+    """Shift cumulative ledgers so the final day equals the current balance."""
+    return current - (cumulative[-1] - cumulative)
+
+
+def _daily_prices(dates, entities, security_tx, held, prices):
+    symbols = pd.Index(entities.get_level_values(1).unique())
+    observed = (
+        security_tx[security_tx['Price ($)'] > 0]
+        .pivot_table(index='Run Date', columns='Symbol', values='Price ($)', aggfunc='last')
+        .reindex(index=dates, columns=symbols)
+    )
+    if prices is not None:
+        observed = prices.reindex(index=dates, columns=symbols).combine_first(observed)
+    # The positions export is authoritative on the anchor date
+    observed.loc[dates[-1]] = (
+        held.groupby('Symbol', observed=True)['Last Price'].last().reindex(symbols)
+        .fillna(observed.loc[dates[-1]])
+    )
+    # Forward-fill only: days before a symbol's first price stay unpriced
+    price_matrix = observed.ffill().fillna(0.0).to_numpy()
+    return price_matrix[:, symbols.get_indexer(entities.get_level_values(1))]
+
+
+if __name__ == "__main__":
+    project_path= Path.cwd()
+    data_dir = f'{project_path}/data'
+
+    data = load_data(data_dir)
+    result = analyze_time_series(data)
+    print(result[result['Account Number'] == 'Total'].tail())
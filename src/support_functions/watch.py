@@ -0,0 +1,131 @@
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from support_functions.data_loader import load_data
+from support_functions.flow_builders import carry_over_cash_flows
+from support_functions.instrumentation import reset_trace, stage
+from support_functions.report_cache import input_snapshot
+
+
+## Watch Mode
+# A long-running loop that keeps the portfolio in memory and polls data/
+# for new or changed exports. Reloads go through the parsed-file cache and
+# the TransactionStore, so only the changed exports are parsed. The cash flows
+# of accounts and symbols the change did not touch are carried over from the
+# previous load and only the affected ones are rebuilt; the in-memory metrics
+# cache is carried over too, so only entities whose flows changed are
+# re-solved. Tables spanning all entities (tax lots, NAV) are recomputed.
+
+def affected_entities(old_data, new_data):
+    """
+    Accounts and (account, symbol) pairs whose inputs differ between two loads:
+    transactions added or removed (by fingerprint) and positions whose
+    quantity or value changed. A new positions date affects everything.
+    Returns: dict with 'accounts', 'symbols' and 'new_transactions'.
+    """
+    key_cols = ['Account Number', 'Symbol']
+    if old_data.latest_date != new_data.latest_date:
+        keys = set(new_data.position_entity_rows) | set(old_data.position_entity_rows)
+        return {
+            'accounts': sorted({account for account, _ in keys}),
+            'symbols': sorted(keys),
+            'new_transactions': len(new_data.transactions) - len(old_data.transactions),
+        }
+
+    old_tx, new_tx = old_data.transactions, new_data.transactions
+    old_fp, new_fp = old_tx['Fingerprint'].to_numpy(), new_tx['Fingerprint'].to_numpy()
+    added = new_tx[~np.isin(new_fp, old_fp)]
+    removed = old_tx[~np.isin(old_fp, new_fp)]
+    changed_tx = pd.concat([added[key_cols].astype(object), removed[key_cols].astype(object)])
+
+    value_cols = ['Quantity', 'Current Value']
+    positions = old_data.positions[key_cols + value_cols].astype({c: object for c in key_cols}).merge(
+        new_data.positions[key_cols + value_cols].astype({c: object for c in key_cols}),
+        on=key_cols, how='outer', suffixes=('_old', '_new')
+    )
+    differs = np.zeros(len(positions), dtype=bool)
+    for col in value_cols:
+        differs |= ~np.isclose(
+            positions[f'{col}_old'].to_numpy(dtype=float),
+            positions[f'{col}_new'].to_numpy(dtype=float),
+            equal_nan=True
+        )
+    changed = pd.concat([changed_tx, positions.loc[differs, key_cols]])
+    changed = changed[changed['Account Number'].notna()]
+
+    symbols = {(a, s) for a, s in zip(changed['Account Number'], changed['Symbol']) if pd.notna(s) and s != ''}
+    return {
+        'accounts': sorted(set(changed['Account Number'])),
+        'symbols': sorted(symbols),
+        'new_transactions': len(added),
+    }
+
+
+def watch_portfolio(data_dir, on_update, cache_dir=None, interval=0.5, workers=1, chunksize=None, max_updates=None):
+    """
+    Load the portfolio, call on_update(data, None), then poll data_dir every
+    interval seconds. When the set of exports or their size / mtime change
+    and stay unchanged for one more poll (so half-written downloads are not
+    read), reload and call on_update(data, affected_entities(old, new)).
+    A reload that fails (e.g. on a malformed export) is reported and the
+    previous data is kept until the next change.
+    Runs until interrupted, or for max_updates reloads.
+    """
+    def load(metrics_cache=None):
+        reset_trace()
+        with stage('load'):
+            return load_data(
+                data_dir, cache_dir=cache_dir, workers=workers, chunksize=chunksize,
+                metrics_cache=metrics_cache
+            )
+
+    loaded = input_snapshot(data_dir)
+    data = load()
+    on_update(data, None)
+    print(f"Watching {data_dir} for new exports (Ctrl+C to stop)...")
+
+    pending = loaded
+    updates = 0
+    try:
+        while max_updates is None or updates < max_updates:
+            time.sleep(interval)
+            current = input_snapshot(data_dir)
+            if current == loaded:
+                pending = current
+                continue
+            if current != pending:
+                pending = current  # still changing; wait for it to settle
+                continue
+
+            start = time.perf_counter()
+            loaded = current
+            try:
+                new_data = load(metrics_cache=data.metrics_cache)
+                changes = affected_entities(data, new_data)
+                carry_over_cash_flows(data, new_data, changes['accounts'], changes['symbols'])
+                on_update(new_data, changes)
+            except Exception as e:
+                # e.g. a malformed export; keep serving the last good load
+                print(f"Reload failed, keeping the previous data until the next change: {type(e).__name__}: {e}")
+                continue
+            data = new_data
+            updates += 1
+            print(
+                f"Updated {len(changes['accounts'])} accounts, {len(changes['symbols'])} symbols "
+                f"({changes['new_transactions']} new transactions) in {time.perf_counter() - start:.2f}s"
+            )
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+    return data
+
+
+if __name__ == "__main__":
+    project_path= Path.cwd()
+    data_dir = f'{project_path}/data'
+
+    def show(data, changes):
+        print(changes if changes is not None else f"Loaded {len(data.transactions)} transactions")
+
+    watch_portfolio(data_dir, show, cache_dir=f'{data_dir}/.cache')
@@ -0,0 +1,11 @@
+import pytest
+
+from support_functions.synthetic_data import generate_portfolio
+
+
+@pytest.fixture
+def portfolio(tmp_path):
+    """Small synthetic portfolio: yearly history exports overlapping by a month."""
+    data_dir = tmp_path / 'data'
+    paths = generate_portfolio(data_dir, n_accounts=2, n_symbols=4, years=2, trades_per_day=1.0, overlap_days=30)
+    return data_dir, paths
@@ -0,0 +1,40 @@
+import pytest
+
+from support_functions.api_server import APIError, PortfolioAPI
+from support_functions.data_loader import load_data
+
+
+@pytest.fixture
+def api(portfolio):
+    data_dir, _ = portfolio
+    return PortfolioAPI(load_data(data_dir))
+
+
+def test_transactions_limit(api):
+    result = api.handle('/transactions', {'limit': ['5']})
+    assert len(result['transactions']) == 5
+    assert result['count'] > 5
+
+
+@pytest.mark.parametrize('limit', ['x', '-1', '2.5'])
+def test_transactions_rejects_bad_limit(api, limit):
+    with pytest.raises(APIError) as error:
+        api.handle('/transactions', {'limit': [limit]})
+    assert error.value.status == 400
+    assert 'limit' in str(error.value)
+
+
+@pytest.mark.parametrize('route, param', [('/as-of', 'date'), ('/transactions', 'start'), ('/transactions', 'end')])
+@pytest.mark.parametrize('value', ['', 'notadate'])
+def test_rejects_bad_dates(api, route, param, value):
+    with pytest.raises(APIError) as error:
+        api.handle(route, {param: [value]})
+    assert error.value.status == 400
+
+
+def test_groups(api):
+    assert {row['Group'] for row in api.handle('/groups', {'grouping': ['Asset Type']})}
+    with pytest.raises(APIError) as error:
+        api.handle('/groups', {'grouping': ['Nonsense']})
+    assert error.value.status == 400
+    assert 'api_groups_Nonsense' not in api.data.derived
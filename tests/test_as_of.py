@@ -0,0 +1,20 @@
+import numpy as np
+
+from support_functions.as_of import as_of_metrics, load_position_history
+from support_functions.data_loader import load_data
+
+
+def test_as_of_includes_accounts_closed_since(portfolio):
+    data_dir, paths = portfolio
+    data = load_data(data_dir)
+    closing = data.unique_accounts['Account Number'].iloc[0]
+
+    # An earlier snapshot in which one account still lived under another number
+    text = paths['positions'].read_text().replace(closing, 'Z99999999')
+    (data_dir / 'Portfolio_Positions_Jun-30-2025.csv').write_text(text)
+    history = load_position_history(data_dir)
+
+    result = as_of_metrics(data, ['2025-07-01'], history.values).set_index('Account Number')
+    snapshot_value = history.values.loc['2025-06-30'].sum()
+    assert 'Z99999999' in result.index
+    np.testing.assert_allclose(result.loc['Total', 'Current Value'], snapshot_value)
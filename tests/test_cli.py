@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+from support_functions.cli import main
+
+
+@pytest.mark.parametrize('as_of, message', [
+    ('notadate', "--as-of must be a date"),
+    ('2020-06-30', "before the first positions snapshot"),
+])
+def test_report_rejects_bad_as_of(portfolio, tmp_path, capsys, as_of, message):
+    with pytest.raises(SystemExit) as exit_info:
+        main(['--project', str(tmp_path), 'report', '--as-of', as_of, '--force'])
+    assert exit_info.value.code == 2
+    assert message in capsys.readouterr().err
+    assert not (tmp_path / 'output').exists()  # rejected before any analysis ran
+
+
+def test_report_trace_includes_history_stages(portfolio, tmp_path):
+    assert main(['--project', str(tmp_path), 'report', '--as-of', '2025-12-31', '--rolling', 'QE', '--force']) == 0
+    trace_path, = (tmp_path / 'output').glob('Portfolio_Trace_*.json')
+    stages = {s['stage'] for s in json.loads(trace_path.read_text())['stages']}
+    assert {'load', 'total', 'as_of', 'rolling'} <= stages
+
+
+@pytest.mark.parametrize('option', ['--prices', '--benchmark-prices'])
+def test_report_rejects_missing_price_table(portfolio, tmp_path, capsys, option):
+    assert main(['--project', str(tmp_path), 'report']) == 0  # a cached report exists for the fast path
+    args = ['--project', str(tmp_path), 'report', option, str(tmp_path / 'missing.csv')]
+    if option == '--benchmark-prices':
+        args += ['--benchmark', 'SPY']
+    with pytest.raises(SystemExit) as exit_info:
+        main(args)
+    assert exit_info.value.code == 2
+    assert f"{option}: no such file" in capsys.readouterr().err
@@ -0,0 +1,47 @@
+import pickle
+import threading
+import time
+import pandas as pd
+
+from support_functions.data_loader import classify_actions, load_data
+
+
+def test_cached_builds_once_across_threads(portfolio):
+    data_dir, _ = portfolio
+    data = load_data(data_dir)
+    builds = []
+
+    def build(data):
+        builds.append(1)
+        time.sleep(0.05)
+        return len(data.transactions)
+
+    threads = [threading.Thread(target=data.cached, args=('table', build)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1
+    assert data.cached('table', build) == len(data.transactions)
+    assert pickle.loads(pickle.dumps(data)).cached('table', build) == len(data.transactions)
+
+
+def test_classify_actions_precedence():
+    # Each pair of strings straddles a precedence boundary of ACTION_CATEGORIES
+    expected = {
+        'INTEREST EARNED FDIC INSURED DEPOSIT AT JP MORGAN BANK (QUSBQ) (Cash)': 'Interest',
+        'ELECTRONIC FUNDS TRANSFER RECEIVED (Cash)': 'Funding',
+        'CHECK RECEIVED (Cash)': 'Funding',
+        'PARTIC CONTR EMPLOYEE CONTRIB (Cash)': 'Funding',
+        'YOU BOUGHT VANGUARD TOTAL STOCK MARKET ETF (VTI) (Cash)': 'Buy',
+        'YOU SOLD VANGUARD TOTAL STOCK MARKET ETF (VTI) (Cash)': 'Sell',
+        'REINVESTMENT VANGUARD TOTAL STOCK MARKET ETF (VTI) (Cash)': 'Reinvestment',
+        'DIVIDEND RECEIVED VANGUARD TOTAL STOCK MARKET ETF (VTI) (Cash)': 'Dividend',
+        'FOREIGN TAX PAID ADR FEE (Cash)': 'Fee',
+        'TRANSFER OF ASSETS ACAT RECEIVE (Cash)': 'Transfer',
+        'JOURNALED SPP PURCHASE CREDIT (Cash)': 'Transfer',
+        'REDEMPTION PAYOUT UNITED STATES TREAS BILLS (Cash)': 'Other',
+    }
+    actions = pd.Series(list(expected) + [None, 'you bought lowercase (Cash)'])
+    categories = classify_actions(actions)
+    assert list(categories) == list(expected.values()) + ['Other', 'Buy']
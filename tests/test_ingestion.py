@@ -0,0 +1,36 @@
+import numpy as np
+
+from support_functions.data_loader import load_data
+
+
+def fingerprints(data):
+    return np.sort(data.transactions['Fingerprint'].to_numpy())
+
+
+def test_store_drops_deleted_export(portfolio, tmp_path):
+    data_dir, paths = portfolio
+    cache_dir = tmp_path / 'cache'
+    assert len(paths['history']) > 1
+    assert len(load_data(data_dir, cache_dir=cache_dir).transactions) == len(load_data(data_dir).transactions)
+
+    paths['history'][0].unlink()
+    expected = load_data(data_dir)
+    reloaded = load_data(data_dir, cache_dir=cache_dir)
+    assert len(reloaded.transactions) == len(expected.transactions)
+    np.testing.assert_array_equal(fingerprints(reloaded), fingerprints(expected))
+
+
+def test_store_reingests_changed_export(portfolio, tmp_path):
+    data_dir, paths = portfolio
+    cache_dir = tmp_path / 'cache'
+    load_data(data_dir, cache_dir=cache_dir)
+
+    # Keep the header and the newest half of the rows of the later export
+    path = paths['history'][-1]
+    lines = path.read_text().splitlines(keepends=True)
+    rows = [line for line in lines[1:] if line.count(',') > 5]
+    path.write_text(lines[0] + ''.join(rows[:len(rows) // 2]))
+
+    expected = load_data(data_dir)
+    reloaded = load_data(data_dir, cache_dir=cache_dir)
+    np.testing.assert_array_equal(fingerprints(reloaded), fingerprints(expected))
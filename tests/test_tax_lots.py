@@ -0,0 +1,31 @@
+import numpy as np
+
+from support_functions.data_loader import load_data
+from support_functions.tax_lots import analyze_tax_lots, build_tax_lots
+
+
+def test_sells_beyond_open_lots_are_reported(portfolio):
+    data_dir, paths = portfolio
+    full = analyze_tax_lots(load_data(data_dir))
+    assert (full['Unmatched Quantity'] == 0).all()
+
+    # History that starts mid-position: sells of shares bought in the dropped year
+    paths['history'][0].unlink()
+    data = load_data(data_dir)
+    lots_df, realized_df = build_tax_lots(data)
+    summary = analyze_tax_lots(data)
+
+    assert summary['Unmatched Quantity'].sum() > 0
+    unmatched = lots_df[lots_df['Term'] == 'Unmatched']
+    np.testing.assert_allclose(unmatched['Quantity'].sum(), summary['Unmatched Quantity'].sum())
+    np.testing.assert_allclose(
+        summary['Realized Unmatched'].sum(),
+        realized_df.loc[realized_df['Term'] == 'Unmatched', 'Proceeds'].sum()
+    )
+
+    # Every sale's proceeds end up in a realized row
+    sells = data.transactions[
+        (data.transactions['Quantity'] < 0) & (data.transactions['Asset Type'] != 'Cash') &
+        data.transactions['Symbol'].notna() & (data.transactions['Symbol'] != '')
+    ]
+    np.testing.assert_allclose(realized_df['Proceeds'].sum(), sells['Amount ($)'].sum())
@@ -0,0 +1,18 @@
+import numpy as np
+import pandas as pd
+
+from support_functions.data_loader import load_data
+from support_functions.valuation import build_daily_valuation
+
+
+def test_nav_does_not_use_later_prices(portfolio):
+    data_dir, paths = portfolio
+    paths['history'][0].unlink()  # holdings now predate the history, with no early price
+    data = load_data(data_dir)
+
+    nav, _ = build_daily_valuation(data)
+    symbols = data.positions['Symbol'].dropna().unique()
+    later = pd.DataFrame(1e6, index=nav.index[1:], columns=symbols)
+    nav_later_prices, _ = build_daily_valuation(data, later)
+
+    np.testing.assert_allclose(nav_later_prices.iloc[0], nav.iloc[0])
@@ -0,0 +1,64 @@
+import csv
+import threading
+import time
+
+import numpy as np
+
+from support_functions.data_loader import load_data
+from support_functions.flow_builders import (
+    build_all_account_cash_flows, build_all_stock_cash_flows, carry_over_cash_flows
+)
+from support_functions.watch import affected_entities, watch_portfolio
+
+
+def test_carry_over_rebuilds_only_affected_entities(portfolio):
+    data_dir, paths = portfolio
+    old_data = load_data(data_dir)
+    old_accounts = build_all_account_cash_flows(old_data)
+    old_stocks = build_all_stock_cash_flows(old_data)
+
+    # A new export with one extra trade of one holding
+    with open(paths['history'][-1], newline='') as f:
+        header, row = list(csv.reader(f))[:2]
+    row[header.index('Amount ($)')] = str(float(row[header.index('Amount ($)')]) - 1.0)
+    with open(data_dir / 'Accounts_History_extra.csv', 'w', newline='') as f:
+        csv.writer(f).writerows([header, row])
+
+    new_data = load_data(data_dir)
+    changes = affected_entities(old_data, new_data)
+    assert changes['accounts'] == [row[header.index('Account Number')]]
+    assert len(changes['symbols']) == 1
+    carry_over_cash_flows(old_data, new_data, changes['accounts'], changes['symbols'])
+    fresh = load_data(data_dir)
+
+    for carried, expected, old, changed in (
+        (build_all_account_cash_flows(new_data), build_all_account_cash_flows(fresh), old_accounts, changes['accounts']),
+        (build_all_stock_cash_flows(new_data), build_all_stock_cash_flows(fresh), old_stocks, changes['symbols']),
+    ):
+        assert list(carried) == list(expected)
+        for key, entity in carried.items():
+            np.testing.assert_array_equal(entity.days, expected[key].days)
+            np.testing.assert_array_equal(entity.amounts, expected[key].amounts)
+            assert (entity is old.get(key)) == (key not in changed and key in old)
+
+
+def test_watch_survives_malformed_export(portfolio, capsys):
+    data_dir, _ = portfolio
+    loads = []
+    watcher = threading.Thread(
+        target=watch_portfolio, args=(data_dir, lambda data, changes: loads.append(changes)),
+        kwargs={'interval': 0.02, 'max_updates': 1}
+    )
+    watcher.start()
+    while not loads:
+        time.sleep(0.02)
+
+    bad = data_dir / 'Accounts_History_bad.csv'
+    bad.write_text('Run Date,Account\n"unterminated\n')
+    time.sleep(0.5)
+    assert watcher.is_alive() and len(loads) == 1
+
+    bad.unlink()
+    watcher.join(timeout=10)
+    assert not watcher.is_alive() and len(loads) == 2
+    assert "Reload failed" in capsys.readouterr().out